@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+"""Benchmark AggregateFactory hour queries.
+
+Requests years of hourly data for synthetic minute data, first computing
+aggregates from minute data, then from stored aggregates.
+
+Usage:
+    python benchmarks/aggregate_factory.py [--years 5] [--channels H,E,Z,F]
+"""
+import argparse
+import sys
+import time
+from os import path
+
+import numpy as np
+from obspy.core import Stats, Stream, Trace, UTCDateTime
+
+try:
+    import geomagio  # noqa (tells linter to ignore this line.)
+except ImportError:
+    script_dir = path.dirname(path.abspath(__file__))
+    sys.path.append(path.normpath(path.join(script_dir, "..")))
+
+from geomagio.AggregateFactory import AggregateFactory
+from geomagio.edge import WaveformCache
+
+
+class SyntheticMinuteFactory(object):
+    """Random minute data, with gaps."""
+
+    def get_timeseries(self, starttime, endtime, observatory, channels, type, interval):
+        npts = int((endtime - starttime) // 60) + 1
+        rng = np.random.default_rng(int(starttime.timestamp))
+        stream = Stream()
+        for channel in channels:
+            data = 20000 + rng.standard_normal(npts)
+            data[rng.random(npts) < 0.001] = np.nan
+            stats = Stats()
+            stats.network = "NT"
+            stats.station = observatory
+            stats.location = "R0"
+            stats.channel = channel
+            stats.starttime = starttime
+            stats.delta = 60
+            stats.npts = npts
+            stream += Trace(data, stats)
+        return stream
+
+
+def time_query(factory, starttime, endtime, channels):
+    """Return the time in seconds, and result, of an hour query."""
+    start = time.perf_counter()
+    result = factory.get_timeseries(
+        starttime=starttime,
+        endtime=endtime,
+        observatory="BOU",
+        channels=channels,
+        type="variation",
+        interval="hour",
+    )
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--years", default=5, type=int, help="years requested")
+    parser.add_argument("--channels", default="H,E,Z,F", help="channels requested")
+    args = parser.parse_args()
+
+    channels = args.channels.split(",")
+    starttime = UTCDateTime("2015-01-01T00:00:00Z")
+    endtime = starttime + args.years * 365 * 86400 - 1
+    factory = AggregateFactory(
+        SyntheticMinuteFactory(), cache=WaveformCache(immutable_age=0)
+    )
+    computed_time, computed = time_query(factory, starttime, endtime, channels)
+    stored_time, stored = time_query(factory, starttime, endtime, channels)
+    for expected, actual in zip(computed, stored):
+        np.testing.assert_array_equal(actual.data, expected.data)
+    print("channels: %d, hours: %d" % (len(channels), computed[0].stats.npts))
+    print("computed: %.3fs" % computed_time)
+    print("stored: %.3fs" % stored_time)
+
+
+if __name__ == "__main__":
+    main()
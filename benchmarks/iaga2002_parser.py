@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+"""Benchmark IAGA2002Parser data parsing.
+
+Compares parsing data lines as one fixed width block with parsing each
+line, on a synthetic day file, and verifies both produce identical output.
+
+Usage:
+    python benchmarks/iaga2002_parser.py [--delta 1]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from os import path
+
+import numpy as np
+
+try:
+    import geomagio  # noqa (tells linter to ignore this line.)
+except ImportError:
+    script_dir = path.dirname(path.abspath(__file__))
+    sys.path.append(path.normpath(path.join(script_dir, "..")))
+
+from geomagio.iaga2002 import IAGA2002Parser
+
+
+HEADER = """ Format                 IAGA-2002                                    |
+ IAGA CODE              BOU                                          |
+DATE       TIME         DOY     BOUH      BOUE      BOUZ      BOUF   |
+"""
+
+
+class LineParser(IAGA2002Parser):
+    """Parser that always parses data lines individually."""
+
+    def _parse_data_block(self, lines):
+        return False
+
+
+def synthetic_file(delta):
+    """Generate a day of random data, with some missing values."""
+    np.random.seed(123456789)
+    npts = int(round(86400 / delta))
+    data = 20000 + np.random.randn(npts, 4)
+    data[np.random.rand(npts, 4) < 0.001] = 99999
+    start = datetime(2020, 1, 1)
+    lines = []
+    for i in range(npts):
+        time = start + timedelta(seconds=i * delta)
+        lines.append(
+            "{:%Y-%m-%d %H:%M:%S}.{:03d} {:03d}    {:10.2f}{:10.2f}{:10.2f}{:10.2f}".format(
+                time, time.microsecond // 1000, time.timetuple().tm_yday, *data[i]
+            )
+        )
+    return HEADER + "\n".join(lines) + "\n"
+
+
+def time_parser(parser_class, data, repeat):
+    """Return the best time in seconds, and last parser, for a parser class."""
+    best = None
+    parser = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser = parser_class()
+        parser.parse(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, parser
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--delta", default=1, type=float, help="sample period")
+    parser.add_argument("--repeat", default=3, type=int, help="runs per parser")
+    args = parser.parse_args()
+
+    data = synthetic_file(args.delta)
+    print("lines: %d" % (data.count("\n") - HEADER.count("\n")))
+
+    line_time, line_parser = time_parser(LineParser, data, args.repeat)
+    block_time, block_parser = time_parser(IAGA2002Parser, data, args.repeat)
+    assert line_parser.times == block_parser.times
+    for channel in line_parser.channels:
+        np.testing.assert_array_equal(
+            block_parser.data[channel], line_parser.data[channel]
+        )
+    print("line: %.3fs" % line_time)
+    print("block: %.3fs" % block_time)
+    print("speedup: %.1fx" % (line_time / block_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+"""Benchmark TimeseriesUtility.merge_streams.
+
+Merges new data into a synthetic day file, as file factories do when
+updating, using the aligned array overlay and the general obspy merge,
+and verifies both produce identical output.
+
+Usage:
+    python benchmarks/merge_streams.py [--delta 1] [--updates 10]
+"""
+import argparse
+import sys
+import time
+from os import path
+
+import numpy as np
+from obspy.core import Stats, Stream, Trace, UTCDateTime
+
+try:
+    import geomagio  # noqa (tells linter to ignore this line.)
+except ImportError:
+    script_dir = path.dirname(path.abspath(__file__))
+    sys.path.append(path.normpath(path.join(script_dir, "..")))
+
+from geomagio import TimeseriesUtility
+
+
+CHANNELS = ["H", "E", "Z", "F"]
+
+
+def synthetic_stream(starttime, npts, delta, gaps=True):
+    """Generate random data for each channel, with gaps."""
+    np.random.seed(123456789)
+    stream = Stream()
+    for channel in CHANNELS:
+        data = 20000 + np.random.randn(npts)
+        if gaps:
+            data[np.random.rand(npts) < 0.001] = np.nan
+            data[npts // 3 : npts // 3 + npts // 100] = np.nan
+        stats = Stats()
+        stats.network = "NT"
+        stats.station = "BOU"
+        stats.channel = channel
+        stats.starttime = starttime
+        stats.delta = delta
+        stats.npts = npts
+        stream += Trace(data, stats)
+    return stream
+
+
+def time_merge(merge, day, updates, repeat):
+    """Return the best time in seconds, and last result, for a merge function."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = day
+        for update in updates:
+            result = merge(result, update)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def general_merge(*streams):
+    """Merge using obspy, without the aligned array overlay."""
+    merged = Stream()
+    for stream in streams:
+        merged += stream
+    return TimeseriesUtility._merge_split_stream(merged)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--delta", default=1, type=float, help="sample period")
+    parser.add_argument("--updates", default=10, type=int, help="updates per day")
+    parser.add_argument("--repeat", default=3, type=int, help="runs per merge")
+    args = parser.parse_args()
+
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    npts = int(round(86400 / args.delta))
+    day = synthetic_stream(starttime, npts, args.delta)
+    # updates replace ten minutes of data each, spread through the day
+    update_npts = int(round(600 / args.delta))
+    updates = [
+        synthetic_stream(
+            starttime + i * (npts // args.updates) * args.delta,
+            update_npts,
+            args.delta,
+            gaps=False,
+        )
+        for i in range(args.updates)
+    ]
+    print(
+        "channels: %d, samples: %d, updates: %d" % (len(CHANNELS), npts, len(updates))
+    )
+
+    general_time, general_result = time_merge(general_merge, day, updates, args.repeat)
+    aligned_time, aligned_result = time_merge(
+        TimeseriesUtility.merge_streams, day, updates, args.repeat
+    )
+    assert len(general_result) == len(aligned_result)
+    for expected, actual in zip(general_result, aligned_result):
+        assert actual.id == expected.id
+        assert actual.stats.starttime == expected.stats.starttime
+        np.testing.assert_array_equal(actual.data, expected.data)
+    print("general: %.3fs" % general_time)
+    print("aligned: %.3fs" % aligned_time)
+    print("speedup: %.1fx" % (general_time / aligned_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+"""Benchmark SqDistAlgorithm.additive engines.
+
+Compares the "python" and "numba" engines on synthetic one-second data,
+and verifies both engines produce identical output.
+
+Usage:
+    python benchmarks/sqdist_additive.py [--days 1]
+"""
+import argparse
+import sys
+import time
+from os import path
+
+import numpy as np
+
+try:
+    import geomagio  # noqa (tells linter to ignore this line.)
+except ImportError:
+    script_dir = path.dirname(path.abspath(__file__))
+    sys.path.append(path.normpath(path.join(script_dir, "..")))
+
+from geomagio.algorithm import SqDistAlgorithm
+
+
+def synthetic_data(days, m):
+    """Generate a daily sinusoid with noise, spikes, and a gap."""
+    np.random.seed(123456789)
+    t = np.arange(days * m)
+    data = 20000 + 50 * np.sin(t * (2 * np.pi) / m) + np.random.randn(t.size)
+    data[np.random.rand(t.size) < 0.001] = 1e5
+    data[3600:7200] = np.nan
+    return data
+
+
+def time_engine(engine, yobs, m, repeat):
+    """Return the best time in seconds, and result, for an engine."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = SqDistAlgorithm.additive(
+            yobs,
+            m,
+            alpha=1.0 / m / 30,
+            beta=0,
+            gamma=1.0 / 30,
+            smooth=60,
+            engine=engine,
+        )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--days", default=1, type=int, help="days of data")
+    parser.add_argument("--repeat", default=3, type=int, help="runs per engine")
+    args = parser.parse_args()
+
+    m = 86400
+    yobs = synthetic_data(args.days, m)
+    print("samples: %d, m: %d" % (yobs.size, m))
+
+    # compile outside of timing
+    start = time.perf_counter()
+    SqDistAlgorithm.additive(yobs[:10], m, 0.1, 0, 0.1, engine="numba")
+    print("numba compile: %.3fs" % (time.perf_counter() - start))
+
+    python_time, python_result = time_engine("python", yobs, m, 1)
+    numba_time, numba_result = time_engine("numba", yobs, m, args.repeat)
+    for expected, actual in zip(python_result, numba_result):
+        np.testing.assert_array_equal(actual, expected)
+    print("python: %.3fs" % python_time)
+    print("numba: %.3fs" % numba_time)
+    print("speedup: %.1fx" % (python_time / numba_time))
+
+
+if __name__ == "__main__":
+    main()
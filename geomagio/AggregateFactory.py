@@ -0,0 +1,196 @@
+"""Hour and day aggregates of minute data."""
+from __future__ import absolute_import
+
+import math
+
+import numpy
+import obspy.core
+
+from . import TimeseriesUtility
+from .algorithm.FilterAlgorithm import STEPS, FilterAlgorithm
+from .ObservatoryMetadata import ObservatoryMetadata
+from .TimeseriesFactory import TimeseriesFactory
+from .TimeseriesFactoryException import TimeseriesFactoryException
+
+# filter steps used for each aggregate interval
+AGGREGATE_STEPS = {
+    step["data_interval"]: step
+    for step in STEPS
+    if step["type"] == "average" and step["input_sample_period"] == 60
+}
+
+
+class AggregateFactory(TimeseriesFactory):
+    """Serve hour and day data by averaging minute data.
+
+    Aggregates are computed using the FilterAlgorithm average steps, from
+    minute data read using factory, and kept in a WaveformCache. Only
+    aggregates older than the cache immutable_age are kept, so each request
+    only computes aggregates that are new, or may still change. Other
+    intervals are read from factory.
+
+    Parameters
+    ----------
+    factory: TimeseriesFactory
+        factory for minute data, and other intervals.
+    cache: geomagio.edge.WaveformCache
+        store for computed aggregates. immutable_age should be at least
+        one day longer than the age after which minute data does not change,
+        so incomplete days are not kept.
+    observatoryMetadata: ObservatoryMetadata
+        metadata for aggregated traces.
+    fetch_interval: int
+        maximum number of seconds of minute data read at once.
+    """
+
+    def __init__(
+        self,
+        factory,
+        cache,
+        observatoryMetadata=None,
+        fetch_interval=30 * 86400,
+    ):
+        TimeseriesFactory.__init__(self)
+        self.factory = factory
+        self.cache = cache
+        self.observatoryMetadata = observatoryMetadata or ObservatoryMetadata()
+        self.fetch_interval = fetch_interval
+
+    def get_timeseries(
+        self,
+        starttime,
+        endtime,
+        observatory=None,
+        channels=None,
+        type=None,
+        interval=None,
+    ):
+        """Get timeseries data
+
+        Parameters
+        ----------
+        starttime: obspy.core.UTCDateTime
+            time of first sample.
+        endtime: obspy.core.UTCDateTime
+            time of last sample.
+        observatory: str
+            observatory code.
+        channels: array_like
+            list of channels to load
+        type: {'variation', 'quasi-definitive', 'definitive'}
+            data type.
+        interval: {'day', 'hour', 'minute', 'second', 'tenhertz'}
+            data interval.
+
+        Returns
+        -------
+        obspy.core.Stream
+            timeseries object with requested data.
+        """
+        observatory = observatory or self.observatory
+        channels = channels or self.channels
+        type = type or self.type
+        interval = interval or self.interval
+        if interval not in AGGREGATE_STEPS:
+            return self.factory.get_timeseries(
+                starttime=starttime,
+                endtime=endtime,
+                observatory=observatory,
+                channels=channels,
+                type=type,
+                interval=interval,
+            )
+        if starttime > endtime:
+            raise TimeseriesFactoryException(
+                'Starttime before endtime "%s" "%s"' % (starttime, endtime)
+            )
+        timeseries = obspy.core.Stream()
+        for channel in channels:
+            timeseries += self._get_timeseries(
+                starttime, endtime, observatory, channel, type, interval
+            )
+        return timeseries
+
+    def _get_timeseries(self, starttime, endtime, observatory, channel, type, interval):
+        """Get aggregates for one channel.
+
+        Returns
+        -------
+        obspy.core.Stream
+            stream with one trace, padded to [starttime, endtime].
+        """
+        type = getattr(type, "value", type)
+        # cache key is (interval, observatory, type, channel)
+        data = self.cache.get_waveforms(
+            self._get_aggregates,
+            interval,
+            observatory,
+            type,
+            channel,
+            starttime,
+            endtime,
+        )
+        data.merge()
+        if data.count() == 0:
+            data += TimeseriesUtility.create_empty_trace(
+                starttime,
+                endtime,
+                observatory,
+                channel,
+                type,
+                interval,
+                "NT",
+                observatory,
+                "",
+            )
+        step = AGGREGATE_STEPS[interval]
+        for trace in data:
+            if numpy.ma.isMaskedArray(trace.data):
+                trace.data = trace.data.filled(numpy.nan)
+            trace.data = trace.data.astype(numpy.float64)
+            self.observatoryMetadata.set_metadata(
+                trace.stats, observatory, channel, type, interval
+            )
+            trace.stats.data_interval_type = step["data_interval_type"]
+            trace.stats.filter_comments = step["filter_comments"]
+        TimeseriesUtility.pad_timeseries(data, starttime, endtime)
+        return data
+
+    def _get_aggregates(self, interval, observatory, type, channel, starttime, endtime):
+        """Compute aggregates from minute data.
+
+        Called by the cache for aggregates that are not stored.
+
+        Returns
+        -------
+        obspy.core.Stream
+            aggregates with times in [starttime, endtime],
+            empty when no aggregates are in range.
+        """
+        step = AGGREGATE_STEPS[interval]
+        period = step["output_sample_period"]
+        # aggregates are centered on the minutes they average
+        offset = (period - step["input_sample_period"]) / 2
+        first = math.ceil((starttime.timestamp - offset) / period) * period
+        last = math.floor((endtime.timestamp - offset) / period) * period
+        # read whole periods, at most fetch_interval at a time
+        count = max(1, int(self.fetch_interval // period))
+        algorithm = FilterAlgorithm(
+            input_sample_period=step["input_sample_period"],
+            output_sample_period=period,
+            steps=[step],
+        )
+        aggregates = obspy.core.Stream()
+        for start in numpy.arange(first, last + 1, count * period):
+            end = min(start + count * period, last + period)
+            minutes = self.factory.get_timeseries(
+                starttime=obspy.core.UTCDateTime(start),
+                endtime=obspy.core.UTCDateTime(end - step["input_sample_period"]),
+                observatory=observatory,
+                channels=[channel],
+                type=type,
+                interval="minute",
+            )
+            aggregates += algorithm.process(minutes)
+        aggregates.merge()
+        return aggregates
@@ -1,10 +1,13 @@
 """Controller class for geomag algorithms"""
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import copy
 from io import BytesIO
 import sys
-from typing import List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
+import numpy
 from obspy.core import Stream, UTCDateTime
 
 from .algorithm import algorithms, AlgorithmException
@@ -13,6 +16,7 @@ from .StreamTimeseriesFactory import StreamTimeseriesFactory
 from . import TimeseriesUtility, Util
 
 # factory packages
+from . import binary
 from . import binlog
 from . import edge
 from . import iaga2002
@@ -24,6 +28,10 @@ from . import temperature
 from . import vbf
 
 
+# number of intervals checked at once by run_as_update
+UPDATE_BATCH_SIZE = 10
+
+
 class Controller(object):
     """Controller for geomag algorithms.
 
@@ -103,6 +111,50 @@ class Controller(object):
             )
         return timeseries
 
+    def _process(
+        self,
+        timeseries,
+        starttime,
+        endtime,
+        no_trim=False,
+        rename_input_channel=None,
+        rename_output_channel=None,
+    ):
+        """Rename channels, and process timeseries using algorithm.
+
+        Parameters
+        ----------
+        timeseries : obspy.core.Stream
+            input timeseries.
+        starttime : obspy.core.UTCDateTime
+            time of first output.
+        endtime : obspy.core.UTCDateTime
+            time of last output.
+        no_trim : bool
+            whether to skip trimming output to starttime/endtime.
+        rename_input_channel : array_like
+            list of input channel renames
+        rename_output_channel : array_like
+            list of output channel renames
+
+        Returns
+        -------
+        processed : obspy.core.Stream
+        """
+        if rename_input_channel:
+            timeseries = self._rename_channels(
+                timeseries=timeseries, renames=rename_input_channel
+            )
+        processed = self._algorithm.process(timeseries)
+        # trim if --no-trim is not set
+        if not no_trim:
+            processed.trim(starttime=starttime, endtime=endtime)
+        if rename_output_channel:
+            processed = self._rename_channels(
+                timeseries=processed, renames=rename_output_channel
+            )
+        return processed
+
     def _rename_channels(self, timeseries, renames):
         """Rename trace channel names.
 
@@ -177,6 +229,7 @@ class Controller(object):
             rename_input_channel=options.rename_input_channel,
             rename_output_channel=options.rename_output_channel,
             realtime=options.realtime,
+            chunk_size=options.chunk_size,
         )
 
     def _run_as_update(self, options, update_count=0):
@@ -210,6 +263,7 @@ class Controller(object):
             rename_input_channel=options.rename_input_channel,
             rename_output_channel=options.rename_output_channel,
             update_limit=options.update_limit,
+            workers=options.update_workers,
         )
 
     def run(
@@ -224,6 +278,7 @@ class Controller(object):
         realtime: Union[bool, int] = False,
         rename_input_channel: Optional[List[List[str]]] = None,
         rename_output_channel: Optional[List[List[str]]] = None,
+        chunk_size: Optional[int] = None,
     ):
         """Run algorithm for a specific time range.
 
@@ -239,7 +294,30 @@ class Controller(object):
         realtime: number of seconds in realtime interval
         rename_input_channel: list of input channel renames
         rename_output_channel: list of output channel renames
+        chunk_size: number of seconds of output to process at once,
+            only one chunk of input is held in memory at a time.
+            ignored when input_timeseries is set.
         """
+        if chunk_size and input_timeseries is None:
+            delta = TimeseriesUtility.get_delta_from_interval(self._outputInterval)
+            if delta is None:
+                raise ValueError("chunk_size requires a known output interval")
+            # intervals are [start, end), add delta to include endtime
+            for interval in Util.get_intervals(
+                starttime=starttime, endtime=endtime + delta, size=chunk_size, trim=True
+            ):
+                self.run(
+                    observatory=observatory,
+                    starttime=interval["start"],
+                    endtime=interval["end"] - delta,
+                    input_channels=input_channels,
+                    output_channels=output_channels,
+                    no_trim=no_trim,
+                    realtime=realtime,
+                    rename_input_channel=rename_input_channel,
+                    rename_output_channel=rename_output_channel,
+                )
+            return
         # ensure realtime is a valid value:
         if realtime <= 0:
             realtime = False
@@ -262,28 +340,30 @@ class Controller(object):
         if next_starttime and realtime:
             # when running a stateful algorithms with the realtime option
             # pad/trim timeseries to the interval:
-            # [next_starttime, max(timeseries.endtime, now-options.realtime)]
+            # [input start, max(timeseries.endtime, now-options.realtime)]
+            # where input start is the first input needed for next_starttime
             input_start, input_end = TimeseriesUtility.get_stream_start_end_times(
                 timeseries, without_gaps=True
             )
             realtime_gap = endtime - realtime
             if input_end < realtime_gap:
                 input_end = realtime_gap
-            # pad to the start of the "realtime gap"
-            TimeseriesUtility.pad_timeseries(timeseries, next_starttime, input_end)
-        # process
-        if rename_input_channel:
-            timeseries = self._rename_channels(
-                timeseries=timeseries, renames=rename_input_channel
-            )
-        processed = algorithm.process(timeseries)
-        # trim if --no-trim is not set
-        if not no_trim:
-            processed.trim(starttime=starttime, endtime=endtime)
-        if rename_output_channel:
-            processed = self._rename_channels(
-                timeseries=processed, renames=rename_output_channel
+            pad_start, _ = algorithm.get_input_interval(
+                start=next_starttime,
+                end=endtime,
+                observatory=observatory[0],
+                channels=input_channels,
             )
+            # pad to the start of the "realtime gap"
+            TimeseriesUtility.pad_timeseries(timeseries, pad_start, input_end)
+        processed = self._process(
+            timeseries=timeseries,
+            starttime=starttime,
+            endtime=endtime,
+            no_trim=no_trim,
+            rename_input_channel=rename_input_channel,
+            rename_output_channel=rename_output_channel,
+        )
         # output
         self._outputFactory.put_timeseries(
             timeseries=processed,
@@ -306,6 +386,8 @@ class Controller(object):
         rename_output_channel: Optional[List[List[str]]] = None,
         update_limit: int = 1,
         update_count: int = 0,
+        workers: int = 1,
+        channel_gaps: bool = False,
     ):
         """Try to fill gaps in output data.
 
@@ -322,17 +404,25 @@ class Controller(object):
         realtime: number of seconds in realtime interval
         rename_input_channel: list of input channel renames
         rename_output_channel: list of output channel renames
+        update_limit: maximum number of intervals to check, 0 for no limit
+        update_count: number of intervals already checked
+        workers: number of gaps to process concurrently,
+            output is written one gap at a time, oldest to newest.
+        channel_gaps: whether to write each output channel only where it
+            has gaps, instead of writing all channels where any channel
+            has gaps.
 
         Notes
         -----
         Finds gaps in the target data, and if there's new data in the input
-            source, calls run with the start/end time of a given gap to fill
+            source, processes the start/end time of a given gap to fill
             in.
-        It checks the start of the target data, and if it's missing, and
-            there's new data available, it backs up the starttime/endtime,
-            and recursively calls itself, to check the previous period, to see
-            if new data is available there as well. Calls run for each new
-            period, oldest to newest.
+        When the start of the target data is missing, and there's new data
+            available, the previous interval is also checked, until
+            update_limit intervals are checked.
+        Output for up to UPDATE_BATCH_SIZE intervals is read at once,
+            nearby gaps share one input request,
+            and gaps are filled oldest to newest.
         """
         # If an update_limit is set, make certain we don't step past it.
         if update_limit > 0 and update_count >= update_limit:
@@ -342,69 +432,30 @@ class Controller(object):
             raise AlgorithmException("Stateful algorithms cannot use run_as_update")
         input_channels = input_channels or algorithm.get_input_channels()
         output_channels = output_channels or algorithm.get_output_channels()
-        print(
-            "checking gaps",
-            starttime,
-            endtime,
-            output_observatory,
-            output_channels,
-            file=sys.stderr,
-        )
-        # request output to see what has already been generated
-        output_timeseries = self._get_output_timeseries(
-            observatory=output_observatory,
+        fills = self._get_update_fills(
+            observatory=observatory,
+            output_observatory=output_observatory,
             starttime=starttime,
             endtime=endtime,
-            channels=output_channels,
+            input_channels=input_channels,
+            output_channels=output_channels,
+            update_limit=update_limit - update_count if update_limit > 0 else None,
+            channel_gaps=channel_gaps,
         )
-        if len(output_timeseries) > 0:
-            # find gaps in output, so they can be updated
-            output_gaps = TimeseriesUtility.get_merged_gaps(
-                TimeseriesUtility.get_stream_gaps(output_timeseries)
-            )
-        else:
-            output_gaps = [
-                [
-                    starttime,
-                    endtime,
-                    # next sample time not used
-                    None,
-                ]
-            ]
-        for output_gap in output_gaps:
-            input_timeseries = self._get_input_timeseries(
-                observatory=observatory,
-                starttime=output_gap[0],
-                endtime=output_gap[1],
-                channels=input_channels,
-            )
-            if not algorithm.can_produce_data(
-                starttime=output_gap[0], endtime=output_gap[1], stream=input_timeseries
-            ):
-                continue
-            # check for fillable gap at start
-            if output_gap[0] == starttime:
-                # found fillable gap at start, recurse to previous interval
-                interval = endtime - starttime
-                recurse_starttime = starttime - interval
-                recurse_endtime = starttime - 1
-                self.run_as_update(
-                    observatory=observatory,
-                    output_observatory=output_observatory,
-                    starttime=recurse_starttime,
-                    endtime=recurse_endtime,
-                    input_channels=input_channels,
-                    output_channels=output_channels,
-                    no_trim=no_trim,
-                    realtime=realtime,
-                    rename_input_channel=rename_input_channel,
-                    rename_output_channel=rename_output_channel,
-                    update_limit=update_limit,
-                    update_count=update_count + 1,
-                )
-            # fill gap
-            gap_starttime = output_gap[0]
-            gap_endtime = output_gap[1]
+        # algorithm is stateless, so gaps can be processed independently
+        processed = Util.map_concurrent(
+            lambda fill: self._process(
+                timeseries=fill[2],
+                starttime=fill[0],
+                endtime=fill[1],
+                no_trim=no_trim,
+                rename_input_channel=rename_input_channel,
+                rename_output_channel=rename_output_channel,
+            ),
+            fills,
+            max_workers=workers,
+        )
+        for (gap_starttime, gap_endtime, _, gaps), timeseries in zip(fills, processed):
             print(
                 "processing",
                 gap_starttime,
@@ -413,18 +464,261 @@ class Controller(object):
                 output_channels,
                 file=sys.stderr,
             )
-            self.run(
+            if gaps is None:
+                self._outputFactory.put_timeseries(
+                    timeseries=timeseries,
+                    starttime=gap_starttime,
+                    endtime=gap_endtime,
+                    channels=output_channels,
+                )
+                continue
+            for channel in output_channels:
+                for channel_start, channel_end in gaps.get(channel, []):
+                    # channels without input have no values to write
+                    if not any(
+                        numpy.isfinite(trace.data).any()
+                        for trace in timeseries.select(channel=channel).slice(
+                            channel_start, channel_end
+                        )
+                    ):
+                        continue
+                    self._outputFactory.put_timeseries(
+                        timeseries=timeseries,
+                        starttime=channel_start,
+                        endtime=channel_end,
+                        channels=[channel],
+                    )
+
+    def _get_update_fills(
+        self,
+        observatory: List[str],
+        output_observatory: List[str],
+        starttime: UTCDateTime,
+        endtime: UTCDateTime,
+        input_channels: List[str],
+        output_channels: List[str],
+        update_limit: Optional[int],
+        channel_gaps: bool = False,
+    ) -> List[Tuple[UTCDateTime, UTCDateTime, Stream, Optional[Dict]]]:
+        """Find output gaps that can be filled.
+
+        Intervals are checked newest to oldest, and each interval is checked
+        only when the previous interval starts with a gap that can be filled.
+
+        Parameters
+        ----------
+        observatory: list of observatories for input
+        output_observatory: list of observatories for output
+        starttime: time of first data
+        endtime: time of last data
+        input_channels: list of channels to read
+        output_channels: list of channels to check
+        update_limit: maximum number of intervals to check, None for no limit
+        channel_gaps: whether to also return gaps of each output channel
+
+        Returns
+        -------
+        list of (gap start, gap end, input timeseries, channel gaps),
+            oldest to newest. channel gaps is None unless channel_gaps is set,
+            otherwise a dictionary of output channel to list of
+            [start, end] gaps within gap start and gap end.
+        """
+        algorithm = self._algorithm
+        fills = []
+        window = (starttime, endtime)
+        remaining = update_limit
+        while remaining is None or remaining > 0:
+            # intervals to check, newest to oldest
+            windows = []
+            while len(windows) < UPDATE_BATCH_SIZE and remaining != 0:
+                if window[0] > window[1]:
+                    # intervals shrink as they move back in time
+                    break
+                windows.append(window)
+                interval = window[1] - window[0]
+                window = (window[0] - interval, window[0] - 1)
+                if remaining is not None:
+                    remaining -= 1
+            if not windows:
+                break
+            span_start, span_end = windows[-1][0], windows[0][1]
+            print(
+                "checking gaps",
+                span_start,
+                span_end,
+                output_observatory,
+                output_channels,
+                file=sys.stderr,
+            )
+            # request output to see what has already been generated
+            output_timeseries = self._get_output_timeseries(
+                observatory=output_observatory,
+                starttime=span_start,
+                endtime=span_end,
+                channels=output_channels,
+            )
+            if len(output_timeseries) > 0:
+                # find gaps in output, so they can be updated
+                stream_gaps = TimeseriesUtility.get_stream_gaps(output_timeseries)
+                # merging modifies gaps, merge copies
+                output_gaps = TimeseriesUtility.get_merged_gaps(
+                    {
+                        channel: [list(gap) for gap in gaps]
+                        for channel, gaps in stream_gaps.items()
+                    }
+                )
+            else:
+                stream_gaps = {
+                    channel: [[span_start, span_end]] for channel in output_channels
+                }
+                output_gaps = [[span_start, span_end, None]]
+            input_timeseries = self._get_gap_input_timeseries(
                 observatory=observatory,
-                starttime=gap_starttime,
-                endtime=gap_endtime,
-                input_channels=input_channels,
-                input_timeseries=input_timeseries,
-                output_channels=output_channels,
-                no_trim=no_trim,
-                realtime=realtime,
-                rename_input_channel=rename_input_channel,
-                rename_output_channel=rename_output_channel,
+                channels=input_channels,
+                gaps=output_gaps,
+                coalesce=endtime - starttime,
+            )
+
+            def can_fill(gap_start, gap_end, gap_input):
+                return algorithm.can_produce_data(
+                    starttime=gap_start,
+                    endtime=gap_end,
+                    stream=self._slice_input_timeseries(
+                        observatory, input_channels, gap_input, gap_start, gap_end
+                    ),
+                )
+
+            # find oldest interval to fill, where previous interval
+            # does not start with a fillable gap
+            continues = False
+            for window_start, window_end in windows:
+                fill_start = window_start
+                continues = any(
+                    gap[0] <= window_start <= gap[1]
+                    and can_fill(window_start, min(gap[1], window_end), gap_input)
+                    for gap, gap_input in zip(output_gaps, input_timeseries)
+                )
+                if not continues:
+                    break
+            for gap, gap_input in zip(output_gaps, input_timeseries):
+                gap_start, gap_end = max(gap[0], fill_start), gap[1]
+                if gap_start > gap_end or not can_fill(gap_start, gap_end, gap_input):
+                    continue
+                fills.append(
+                    (
+                        gap_start,
+                        gap_end,
+                        self._slice_input_timeseries(
+                            observatory, input_channels, gap_input, gap_start, gap_end
+                        ),
+                        (
+                            _get_channel_gaps(stream_gaps, gap_start, gap_end)
+                            if channel_gaps
+                            else None
+                        ),
+                    )
+                )
+            if not continues:
+                break
+        return sorted(fills, key=lambda fill: fill[0])
+
+    def _get_gap_input_timeseries(self, observatory, channels, gaps, coalesce):
+        """Get input for gaps, using one request for nearby gaps.
+
+        Parameters
+        ----------
+        observatory : array_like
+            observatories to request.
+        channels : array_like
+            channels to request.
+        gaps : array_like
+            sorted list of gaps, each [gap start, gap end, ...].
+        coalesce : float
+            gaps separated by less than this number of seconds
+            share one request.
+
+        Returns
+        -------
+        list of obspy.core.Stream
+            input for each gap, may include input for other gaps.
+        """
+        inputs = []
+        group = []
+        for gap in gaps + [None]:
+            if group and (gap is None or gap[0] - group[-1][1] > coalesce):
+                timeseries = self._get_input_timeseries(
+                    observatory=observatory,
+                    starttime=group[0][0],
+                    endtime=group[-1][1],
+                    channels=channels,
+                )
+                inputs.extend([timeseries] * len(group))
+                group = []
+            if gap is not None:
+                group.append(gap)
+        return inputs
+
+    def _slice_input_timeseries(
+        self, observatory, channels, timeseries, starttime, endtime
+    ):
+        """Get input required to process an interval.
+
+        Parameters
+        ----------
+        observatory : array_like
+            observatories in timeseries.
+        channels : array_like
+            input channels.
+        timeseries : obspy.core.Stream
+            input timeseries.
+        starttime : obspy.core.UTCDateTime
+            time of first output.
+        endtime : obspy.core.UTCDateTime
+            time of last output.
+
+        Returns
+        -------
+        obspy.core.Stream
+            copy of input within algorithm input interval.
+        """
+        intervals = [
+            self._algorithm.get_input_interval(
+                start=starttime, end=endtime, observatory=obs, channels=channels
             )
+            for obs in observatory
+        ]
+        intervals = [interval for interval in intervals if None not in interval] or [
+            (starttime, endtime)
+        ]
+        return timeseries.slice(
+            starttime=min(interval[0] for interval in intervals),
+            endtime=max(interval[1] for interval in intervals),
+        ).copy()
+
+
+def _get_channel_gaps(
+    stream_gaps: Dict[str, List], starttime: UTCDateTime, endtime: UTCDateTime
+) -> Dict[str, List[List[UTCDateTime]]]:
+    """Get gaps of each channel within an interval.
+
+    Parameters
+    ----------
+    stream_gaps: dictionary of channel gaps, from get_stream_gaps
+    starttime: start of interval
+    endtime: end of interval
+
+    Returns
+    -------
+    dictionary of channel to list of [start, end] gaps within interval.
+    """
+    channel_gaps = {}
+    for channel, gaps in stream_gaps.items():
+        channel_gaps[channel] = [
+            [max(gap[0], starttime), min(gap[1], endtime)]
+            for gap in gaps
+            if gap[0] <= endtime and gap[1] >= starttime
+        ]
+    return channel_gaps
 
 
 def get_input_factory(args):
@@ -450,22 +744,24 @@ def get_input_factory(args):
     input_factory_args["observatory"] = args.observatory
     input_factory_args["type"] = args.type
     # stream/url arguments
+    binary_input = args.input == "binary"
     if args.input_file is not None:
-        input_stream = open(args.input_file, "r")
+        input_stream = open(args.input_file, "rb" if binary_input else "r")
     elif args.input_stdin:
-        input_stream = sys.stdin
+        input_stream = sys.stdin.buffer if binary_input else sys.stdin
     elif args.input_url is not None:
         if "{" in args.input_url:
             input_factory_args["urlInterval"] = args.input_url_interval
             input_factory_args["urlTemplate"] = args.input_url
         else:
-            input_stream = BytesIO(Util.read_url(args.input_url))
+            input_stream = BytesIO(Util.read_url(args.input_url, binary=binary_input))
     input_type = args.input
     if input_type == "edge":
         input_factory = edge.EdgeFactory(
             host=args.input_host,
             port=args.input_port,
             locationCode=args.locationcode,
+            cache=get_input_cache(args),
             **input_factory_args
         )
     elif input_type == "miniseed":
@@ -474,6 +770,7 @@ def get_input_factory(args):
             port=args.input_port,
             locationCode=args.locationcode,
             convert_channels=args.convert_voltbin,
+            cache=get_input_cache(args),
             **input_factory_args
         )
     elif input_type == "goes":
@@ -488,7 +785,9 @@ def get_input_factory(args):
         )
     else:
         # stream compatible factories
-        if input_type == "iaga2002":
+        if input_type == "binary":
+            input_factory = binary.BinaryFactory(**input_factory_args)
+        elif input_type == "iaga2002":
             input_factory = iaga2002.IAGA2002Factory(**input_factory_args)
         elif input_type == "imfv122":
             input_factory = imfv122.IMFV122Factory(**input_factory_args)
@@ -504,6 +803,28 @@ def get_input_factory(args):
     return input_factory
 
 
+def get_input_cache(args):
+    """Get cache for Edge and miniseed input.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        command line arguments
+
+    Returns
+    -------
+    WaveformCache
+        cache, or None when not enabled.
+    """
+    if args.input_cache_size is None and args.input_cache_directory is None:
+        return None
+    return edge.WaveformCache(
+        max_size=int((args.input_cache_size or 256) * 1024 * 1024),
+        directory=args.input_cache_directory,
+        immutable_age=args.input_cache_age,
+    )
+
+
 def get_output_factory(args):
     """Parse output factory arguments.
 
@@ -569,7 +890,9 @@ def get_output_factory(args):
         output_factory = PlotTimeseriesFactory()
     else:
         # stream compatible factories
-        if output_type == "binlog":
+        if output_type == "binary":
+            output_factory = binary.BinaryFactory(**output_factory_args)
+        elif output_type == "binlog":
             output_factory = binlog.BinLogFactory(**output_factory_args)
         elif output_type == "iaga2002":
             output_factory = iaga2002.IAGA2002Factory(**output_factory_args)
@@ -597,6 +920,68 @@ def get_realtime_interval(interval_seconds: int) -> Tuple[UTCDateTime, UTCDateTi
     return starttime, endtime
 
 
+def run_observatories(
+    observatories: List[str], function: Callable[[str], None], workers: int = 1
+) -> Dict[str, Exception]:
+    """Call a function for each observatory, using a pool of threads.
+
+    An exception for one observatory does not affect other observatories.
+
+    Parameters
+    ----------
+    observatories : list of str
+        observatories to process.
+    function : callable
+        called with each observatory,
+        should create its own factories and algorithm.
+    workers : int
+        maximum number of observatories to process at once.
+
+    Returns
+    -------
+    dict
+        exceptions raised, keyed by observatory.
+    """
+    exceptions = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [(obs, executor.submit(function, obs)) for obs in observatories]
+        for obs, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                exceptions[obs] = e
+    return exceptions
+
+
+def parse_duration(value: str) -> int:
+    """Parse a duration argument.
+
+    Parameters
+    ----------
+    value : str
+        number of seconds, or a number followed by one of
+        s (seconds), m (minutes), h (hours), or d (days).
+
+    Returns
+    -------
+    int
+        number of seconds.
+    """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    value = value.strip().lower()
+    multiplier = 1
+    if value and value[-1] in units:
+        multiplier = units[value[-1]]
+        value = value[:-1]
+    try:
+        seconds = int(float(value) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid duration")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError("duration must be positive")
+    return seconds
+
+
 def main(args):
     """command line factory for geomag algorithms
 
@@ -628,6 +1013,27 @@ def main(args):
     if args.output_stdout and args.update:
         raise Exception("Cannot combine" + " --output-stdout and --update")
 
+    if args.output_stdout and args.chunk_size:
+        raise Exception("Cannot combine" + " --output-stdout and --chunk-size")
+
+    if args.output_stdout and args.observatory_workers > 1:
+        raise Exception("Cannot combine" + " --output-stdout and --observatory-workers")
+
+    if args.observatory_workers > 1 and not args.observatory_foreach:
+        raise Exception(
+            "Cannot use" + " --observatory-workers without --observatory-foreach"
+        )
+
+    if args.observatory_workers > 1:
+        # observatories processed concurrently would share one statefile
+        for statefile in ["adjusted_statefile", "filter_statefile", "sqdist_statefile"]:
+            if getattr(args, statefile, None):
+                raise Exception(
+                    "Cannot combine"
+                    + " --observatory-workers and --"
+                    + statefile.replace("_", "-")
+                )
+
     # translate realtime into start/end times
     if args.realtime:
         if args.realtime is True:
@@ -644,20 +1050,25 @@ def main(args):
         args.starttime, args.endtime = get_realtime_interval(args.realtime)
 
     if args.observatory_foreach:
-        observatory = args.observatory
-        observatory_exception = None
-        for obs in observatory:
-            args.observatory = (obs,)
-            args.output_observatory = (obs,)
-            try:
-                _main(args)
-            except Exception as e:
-                print(
-                    "Exception processing observatory {}".format(obs),
-                    str(e),
-                    file=sys.stderr,
-                )
-        if observatory_exception:
+
+        def run_observatory(obs):
+            observatory_args = copy.copy(args)
+            observatory_args.observatory = (obs,)
+            observatory_args.output_observatory = (obs,)
+            _main(observatory_args)
+
+        exceptions = run_observatories(
+            observatories=args.observatory,
+            function=run_observatory,
+            workers=args.observatory_workers,
+        )
+        for obs, e in exceptions.items():
+            print(
+                "Exception processing observatory {}".format(obs),
+                str(e),
+                file=sys.stderr,
+            )
+        if exceptions:
             print("Exceptions occurred during processing", file=sys.stderr)
             sys.exit(1)
 
@@ -678,7 +1089,15 @@ def _main(args):
     output_factory = get_output_factory(args)
     algorithm = algorithms[args.algorithm]()
     algorithm.configure(args)
-    controller = Controller(input_factory, output_factory, algorithm)
+    controller = Controller(
+        input_factory,
+        output_factory,
+        algorithm,
+        # same intervals as the factories,
+        # run needs the output interval to split --chunk-size intervals
+        inputInterval=args.input_interval or args.interval,
+        outputInterval=args.output_interval or args.interval,
+    )
 
     if args.update:
         controller._run_as_update(args)
@@ -711,11 +1130,46 @@ def parse_args(args):
     input_type_group = input_group.add_mutually_exclusive_group(required=True)
     input_type_group.add_argument(
         "--input",
-        choices=("edge", "goes", "iaga2002", "imfv122", "imfv283", "miniseed", "pcdcp"),
+        choices=(
+            "binary",
+            "edge",
+            "goes",
+            "iaga2002",
+            "imfv122",
+            "imfv283",
+            "miniseed",
+            "pcdcp",
+        ),
         default="edge",
         help='Input format (Default "edge")',
     )
 
+    input_group.add_argument(
+        "--input-cache-age",
+        default=86400,
+        help="""
+                Edge and miniseed data older than this number of seconds is
+                cached (Default 86400)
+                """,
+        metavar="SECONDS",
+        type=float,
+    )
+    input_group.add_argument(
+        "--input-cache-directory",
+        default=None,
+        help="Cache Edge and miniseed data in directory, enables cache",
+        metavar="DIRECTORY",
+    )
+    input_group.add_argument(
+        "--input-cache-size",
+        default=None,
+        help="""
+                Cache up to this many megabytes of Edge and miniseed data,
+                enables cache (Default 256 when cache is enabled)
+                """,
+        metavar="MB",
+        type=float,
+    )
     input_group.add_argument(
         "--input-file", help="Read from specified file", metavar="FILE"
     )
@@ -800,6 +1254,14 @@ def parse_args(args):
         help="When specifying multiple observatories, process"
         " each observatory separately",
     )
+    input_group.add_argument(
+        "--observatory-workers",
+        type=int,
+        default=1,
+        help="Number of observatories to process concurrently"
+        " with --observatory-foreach",
+        metavar="N",
+    )
     input_group.add_argument(
         "--rename-input-channel",
         action="append",
@@ -880,6 +1342,7 @@ def parse_args(args):
     output_type_group.add_argument(
         "--output",
         choices=(
+            "binary",
             "binlog",
             "edge",
             "iaga2002",
@@ -1011,6 +1474,28 @@ def parse_args(args):
                 """,
         metavar="N",
     )
+    processing_group.add_argument(
+        "--chunk-size",
+        type=parse_duration,
+        default=None,
+        help="""
+                Process data in chunks of this duration, to limit memory use
+                for long intervals. Seconds, or a number followed by
+                s, m, h, or d (for example 1d).
+                Not used with --update.
+                """,
+        metavar="DURATION",
+    )
+    processing_group.add_argument(
+        "--update-workers",
+        type=int,
+        default=1,
+        help="""
+                Number of gaps processed concurrently in update mode.
+                Output is still written one gap at a time.
+                """,
+        metavar="N",
+    )
     processing_group.add_argument(
         "--no-trim",
         action="store_true",
@@ -2,14 +2,27 @@
 from __future__ import absolute_import
 
 from obspy.core import Stream
+from . import TimeseriesUtility
 from .TimeseriesFactory import TimeseriesFactory
 
 
 class PlotTimeseriesFactory(TimeseriesFactory):
-    """TimeseriesFactory that generates a plot."""
+    """TimeseriesFactory that generates a plot.
 
-    def __init__(self, *args, **kwargs):
+    Parameters
+    ----------
+    max_points: int
+        maximum number of samples plotted for each trace, or None to
+        plot all samples.
+    decimate: {'minmax', 'mean', 'lttb'}
+        method used to reduce traces with more than max_points samples,
+        see TimeseriesUtility.decimate_trace.
+    """
+
+    def __init__(self, *args, max_points=4000, decimate="minmax", **kwargs):
         TimeseriesFactory.__init__(self, *args, **kwargs)
+        self.max_points = max_points
+        self.decimate = decimate
 
     def get_timeseries(
         self,
@@ -66,4 +79,8 @@ class PlotTimeseriesFactory(TimeseriesFactory):
             for channel in channels:
                 filtered += timeseries.select(channel=channel)
             timeseries = filtered
+        if self.max_points:
+            timeseries = TimeseriesUtility.decimate_stream(
+                timeseries, self.max_points, self.decimate
+            )
         timeseries.plot()
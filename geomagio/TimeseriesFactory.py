@@ -122,7 +122,7 @@ class TimeseriesFactory(object):
                 channels=channels,
             )
             try:
-                data = Util.read_url(url)
+                data = self._read_url(url)
             except IOError as e:
                 print("Error reading url: %s, continuing" % str(e), file=sys.stderr)
                 continue
@@ -242,7 +242,7 @@ class TimeseriesFactory(object):
             # existing data file, merge new data into existing
             if os.path.isfile(url_file):
                 try:
-                    existing_data = Util.read_file(url_file)
+                    existing_data = self._read_url(url)
                     existing_data = self.parse_string(
                         existing_data,
                         observatory=url_data[0].stats.station,
@@ -322,6 +322,21 @@ class TimeseriesFactory(object):
             os.makedirs(parent)
         return filename
 
+    def _read_url(self, url):
+        """Read data from url, to be parsed by parse_string.
+
+        Parameters
+        ----------
+        url : str
+            url to read.
+
+        Returns
+        -------
+        str
+            url contents.
+        """
+        return Util.read_url(url)
+
     def _get_url(
         self, observatory, date, type="variation", interval="minute", channels=None
     ):
@@ -6,6 +6,9 @@ import sys
 import numpy
 import obspy.core
 
+# reduction methods supported by decimate_trace
+DECIMATE_METHODS = ["minmax", "mean", "lttb"]
+
 
 def create_empty_trace(
     starttime, endtime, observatory, channel, type, interval, network, station, location
@@ -63,6 +66,179 @@ def create_empty_trace(
     return obspy.core.Trace(data, stats)
 
 
+def decimate_stream(stream, max_points, method="minmax"):
+    """Reduce each trace in a stream to at most max_points samples.
+
+    Parameters
+    ----------
+    stream: obspy.core.Stream
+        stream to reduce.
+    max_points: int
+        maximum number of samples in each output trace.
+    method: {'minmax', 'mean', 'lttb'}
+        reduction method, see decimate_trace.
+
+    Returns
+    -------
+    obspy.core.Stream
+        stream with one reduced trace for each input trace.
+    """
+    return obspy.core.Stream(
+        [decimate_trace(trace, max_points, method) for trace in stream]
+    )
+
+
+def decimate_trace(trace, max_points, method="minmax"):
+    """Reduce a trace to at most max_points samples, for plotting.
+
+    Samples are divided into equal blocks, and each block is reduced to:
+        - 'minmax' the minimum and maximum, in the order they occur.
+        - 'mean' the mean.
+        - 'lttb' the sample that forms the largest triangle with the
+          previously selected sample and the mean of the next block
+          (Largest Triangle Three Buckets). The first and last valid
+          samples are always kept, and samples between them are divided
+          into max_points - 2 blocks.
+    Missing values are ignored, blocks without values are nan.
+
+    Output traces are evenly spaced, so reduced samples are assigned
+    times within their block, which may differ from the times of
+    selected samples. Output times start at the first block, and end at
+    the last block, which may be shorter than other blocks.
+
+    Parameters
+    ----------
+    trace: obspy.core.Trace
+        trace to reduce.
+    max_points: int
+        maximum number of output samples, at least 2.
+    method: {'minmax', 'mean', 'lttb'}
+        reduction method.
+
+    Returns
+    -------
+    obspy.core.Trace
+        reduced trace, or the original trace when it has at most
+        max_points samples.
+    """
+    if method not in DECIMATE_METHODS:
+        raise ValueError(
+            f"Unknown decimate method '{method}',"
+            f" expected one of {', '.join(DECIMATE_METHODS)}"
+        )
+    npts = len(trace.data)
+    if npts <= max_points:
+        return trace
+    data = trace.data
+    if numpy.ma.isMaskedArray(data):
+        data = data.filled(numpy.nan)
+    delta = trace.stats.delta
+    stats = obspy.core.Stats(trace.stats)
+    if method == "lttb":
+        values, first, last = _decimate_lttb(data, max_points)
+        stats.starttime = trace.stats.starttime + first * delta
+        if len(values) > 1:
+            stats.delta = (last - first) * delta / (len(values) - 1)
+        stats.npts = len(values)
+        return obspy.core.Trace(values, stats)
+    points_per_block = 2 if method == "minmax" else 1
+    size = int(math.ceil(npts / (max_points // points_per_block)))
+    count = int(math.ceil(npts / size))
+    blocks = _get_blocks(data, size)
+    stats.delta = delta * size / points_per_block
+    if method == "minmax":
+        values = _decimate_minmax(blocks)
+    else:
+        values = _decimate_mean(blocks)
+        # times of block centers, the last block may be shorter
+        first = (size - 1) / 2
+        last = (count - 1) * size + (npts - (count - 1) * size - 1) / 2
+        stats.starttime = trace.stats.starttime + first * delta
+        if count > 1:
+            stats.delta = (last - first) * delta / (count - 1)
+    stats.npts = len(values)
+    return obspy.core.Trace(values, stats)
+
+
+def _get_blocks(data, size):
+    """Rows of size values, the last row is padded with nan."""
+    count = int(math.ceil(len(data) / size))
+    blocks = numpy.full(count * size, numpy.nan)
+    blocks[: len(data)] = data
+    return blocks.reshape(count, size)
+
+
+def _decimate_mean(blocks):
+    """Mean of valid values in each row, nan for rows without values."""
+    valid = numpy.isfinite(blocks)
+    counts = valid.sum(axis=1)
+    sums = numpy.where(valid, blocks, 0).sum(axis=1)
+    means = numpy.full(len(blocks), numpy.nan)
+    numpy.divide(sums, counts, out=means, where=counts > 0)
+    return means
+
+
+def _decimate_minmax(blocks):
+    """Minimum and maximum of each row, in the order they occur."""
+    valid = numpy.isfinite(blocks)
+    low = numpy.where(valid, blocks, numpy.inf).argmin(axis=1)
+    high = numpy.where(valid, blocks, -numpy.inf).argmax(axis=1)
+    rows = numpy.arange(len(blocks))
+    return numpy.column_stack(
+        (
+            blocks[rows, numpy.minimum(low, high)],
+            blocks[rows, numpy.maximum(low, high)],
+        )
+    ).ravel()
+
+
+def _decimate_lttb(data, max_points):
+    """Select samples using Largest Triangle Three Buckets.
+
+    Selection depends on the previous selection, so blocks are processed
+    in order, and each block is processed as an array.
+
+    Returns
+    -------
+    (values, first, last)
+        selected values, and indices of the first and last values,
+        which are the first and last valid samples.
+    """
+    valid = numpy.flatnonzero(numpy.isfinite(data))
+    first, last = (valid[0], valid[-1]) if len(valid) else (0, len(data) - 1)
+    if last - first + 1 <= max_points:
+        return data[first : last + 1], first, last
+    # samples between first and last, x is relative to first + 1
+    inner = data[first + 1 : last]
+    size = int(math.ceil(len(inner) / (max_points - 2)))
+    blocks = _get_blocks(inner, size)
+    means = _decimate_mean(blocks)
+    count = len(blocks)
+    values = numpy.full(count, numpy.nan)
+    offsets = numpy.arange(size)
+    previous_x, previous_y = -1.0, data[first]
+    last_x, last_y = float(last - first - 1), data[last]
+    for i in range(count):
+        block = blocks[i]
+        if i + 1 < count and numpy.isfinite(means[i + 1]):
+            next_x, next_y = (i + 1) * size + (size - 1) / 2, means[i + 1]
+        else:
+            next_x, next_y = last_x, last_y
+        x = i * size + offsets
+        # twice the area of triangles (previous, sample, next)
+        areas = numpy.abs(
+            (previous_x - next_x) * (block - previous_y)
+            - (previous_x - x) * (next_y - previous_y)
+        )
+        areas[~numpy.isfinite(areas)] = -1
+        index = areas.argmax()
+        if areas[index] < 0:
+            continue
+        values[i] = block[index]
+        previous_x, previous_y = x[index], block[index]
+    return numpy.concatenate(([data[first]], values, [data[last]])), first, last
+
+
 def get_delta_from_interval(data_interval):
     """Convert interval name to number of seconds
 
@@ -184,6 +360,43 @@ def get_stream_gaps(stream, channels=None):
     return gaps
 
 
+def get_trace_millisecond_times(trace, start=0, end=None):
+    """Get times of samples in a trace, truncated to milliseconds.
+
+    Times match formatting ``datetime.utcfromtimestamp(starttime + i * delta)``
+    for each sample, without creating a datetime for each sample.
+
+    Parameters
+    ----------
+    trace: obspy.core.Trace
+        trace with starttime, delta, and data.
+    start: int
+        index of first sample.
+    end: int
+        index after last sample, default is length of trace data.
+
+    Returns
+    -------
+    numpy.ndarray
+        array of numpy.datetime64 with millisecond precision,
+        one for each value in ``trace.data[start:end]``.
+    """
+    stats = trace.stats
+    indices = numpy.arange(len(trace.data))[start:end]
+    timestamps = float(stats.starttime) + indices * stats.delta
+    fraction, seconds = numpy.modf(timestamps)
+    # utcfromtimestamp rounds to microseconds, half to even
+    microseconds = numpy.rint(fraction * 1e6)
+    seconds = seconds.astype(numpy.int64)
+    microseconds = microseconds.astype(numpy.int64)
+    carry = numpy.where(microseconds >= 1000000, 1, 0) - numpy.where(
+        microseconds < 0, 1, 0
+    )
+    seconds += carry
+    microseconds -= carry * 1000000
+    return (seconds * 1000 + microseconds // 1000).astype("datetime64[ms]")
+
+
 def get_trace_gaps(trace):
     """Gets gaps in a trace representing a single channel
     Parameters
@@ -196,29 +409,40 @@ def get_trace_gaps(trace):
     array of gaps, which is empty when there are no gaps.
     each gap is an array [start of gap, end of gap, next sample]
     """
-    gaps = []
-    gap = None
-    data = trace.data
     stats = trace.stats
     starttime = stats.starttime
-    length = len(data)
     delta = stats.delta
-    for i in range(0, length):
-        if numpy.isnan(data[i]):
-            if gap is None:
-                # start of a gap
-                gap = [starttime + i * delta]
-        else:
-            if gap is not None:
-                # end of a gap
-                gap.extend([starttime + (i - 1) * delta, starttime + i * delta])
-                gaps.append(gap)
-                gap = None
-    # check for gap at end
-    if gap is not None:
-        gap.extend([starttime + (length - 1) * delta, starttime + length * delta])
-        gaps.append(gap)
-    return gaps
+    return [
+        [
+            starttime + int(start) * delta,
+            starttime + int(end) * delta,
+            starttime + (int(end) + 1) * delta,
+        ]
+        for start, end in get_trace_gap_indices(trace)
+    ]
+
+
+def get_trace_gap_indices(trace):
+    """Gets indices of gaps in a trace representing a single channel
+    Parameters
+    ----------
+    trace: obspy.core.Trace
+        a stream containing a single channel of data.
+
+    Returns
+    -------
+    numpy.ndarray
+        integer array with one row for each gap, which is empty when there
+        are no gaps. each row is [index of first missing sample,
+        index of last missing sample].
+    """
+    # masked values are not gaps
+    missing = numpy.ma.filled(numpy.isnan(trace.data), False)
+    # +1 where gaps start, -1 after gaps end
+    edges = numpy.diff(missing.astype(numpy.int8), prepend=0, append=0)
+    return numpy.column_stack(
+        (numpy.flatnonzero(edges == 1), numpy.flatnonzero(edges == -1) - 1)
+    )
 
 
 def get_merged_gaps(gaps):
@@ -439,6 +663,25 @@ def merge_streams(*streams):
     for stream in streams:
         merged += stream
 
+    aligned = _merge_aligned_stream(merged)
+    if aligned is not None:
+        return aligned
+    return _merge_split_stream(merged)
+
+
+def _merge_split_stream(merged):
+    """Merge a stream using obspy, by splitting traces at gaps.
+
+    Parameters
+    ----------
+    merged : obspy.core.Stream
+        stream to merge
+
+    Returns
+    -------
+    obspy.core.Stream
+        stream with contiguous traces merged, and gaps filled with numpy.nan
+    """
     split = mask_stream(merged)
 
     # split traces that contain gaps
@@ -473,6 +716,139 @@ def merge_streams(*streams):
     return merged
 
 
+def _merge_aligned_stream(stream):
+    """Merge traces with the same sample times, without splitting them.
+
+    Gives the same result as the obspy merge in merge_streams.
+    Segments of non-NaN values are joined when they are adjacent, or overlap
+    with equal values. Where joined segments overlap, values come from the
+    segment that ends last (or starts first, when segments end at the same
+    time).
+
+    Parameters
+    ----------
+    stream : obspy.core.Stream
+        stream to merge
+
+    Returns
+    -------
+    obspy.core.Stream
+        merged stream, sorted by trace id,
+        or None if traces with the same id have different delta or data type,
+        are not sample aligned, or are not float arrays.
+    """
+    traces_by_id = {}
+    for trace in stream:
+        traces_by_id.setdefault(trace.id, []).append(trace)
+    merged = obspy.core.Stream()
+    for trace_id in sorted(traces_by_id):
+        traces = traces_by_id[trace_id]
+        first = traces[0]
+        delta = first.stats.delta
+        dtype = first.data.dtype
+        # (first index, last index, order, trace, first index in trace)
+        segments = []
+        extent = []
+        has_empty = False
+        for order, trace in enumerate(traces):
+            if (
+                trace.stats.delta != delta
+                or trace.data.dtype != dtype
+                or dtype.kind != "f"
+                or isinstance(trace.data, numpy.ma.MaskedArray)
+                or numpy.isinf(trace.data).any()
+            ):
+                return None
+            offset = (trace.stats.starttime - first.stats.starttime) / delta
+            if abs(offset - round(offset)) > 1e-6:
+                return None
+            offset = int(round(offset))
+            length = len(trace.data)
+            if length == 0:
+                has_empty = True
+                continue
+            extent.append((offset, offset + length - 1, trace.data, trace))
+            gaps = get_trace_gap_indices(trace)
+            starts = numpy.concatenate(([0], gaps[:, 1] + 1))
+            ends = numpy.concatenate((gaps[:, 0] - 1, [length - 1]))
+            for start, end in zip(starts, ends):
+                if start <= end:
+                    segments.append(
+                        (offset + int(start), offset + int(end), order, trace, start)
+                    )
+        if segments:
+            extent = _join_segments(sorted(segments, key=lambda s: s[:3]))
+        elif has_empty:
+            # obspy split keeps empty traces, so NaN traces are not kept
+            continue
+        if not extent:
+            continue
+        start_index = min(e[0] for e in extent)
+        end_index = max(e[1] for e in extent)
+        data = numpy.full(end_index - start_index + 1, numpy.nan, dtype=dtype)
+        if segments:
+            # write segments that end later after segments they overlap
+            order = sorted(
+                range(len(extent)),
+                key=lambda i: (extent[i][1], -extent[i][0], -i),
+            )
+            for i in order:
+                start, end, values, _ = extent[i]
+                data[start - start_index : end - start_index + 1] = values
+        # stats come from the first segment, like obspy merge
+        stats = min(enumerate(extent), key=lambda e: (e[1][0], e[1][1], e[0]))[1][
+            3
+        ].stats.copy()
+        stats.starttime = first.stats.starttime + start_index * delta
+        stats.npts = len(data)
+        merged += obspy.core.Trace(data, stats)
+    return merged
+
+
+def _join_segments(segments):
+    """Join segments that are adjacent, or overlap with equal values.
+
+    Parameters
+    ----------
+    segments : list
+        sorted segments, each (first index, last index, order, trace,
+        first index in trace).
+
+    Returns
+    -------
+    list
+        joined segments, each (first index, last index, values, trace).
+    """
+    joined = []
+    current = None
+    for start, end, _, trace, trace_start in segments:
+        values = trace.data[trace_start : trace_start + end - start + 1]
+        if current is not None:
+            current_start, current_end, current_values, _ = current
+            if start <= current_end:
+                common_end = min(current_end, end)
+                if numpy.array_equal(
+                    current_values[
+                        start - current_start : common_end - current_start + 1
+                    ],
+                    values[: common_end - start + 1],
+                ):
+                    if end > current_end:
+                        current[1] = end
+                        current[2] = numpy.concatenate(
+                            (current_values, values[current_end - start + 1 :])
+                        )
+                    continue
+            elif start == current_end + 1:
+                current[1] = end
+                current[2] = numpy.concatenate((current_values, values))
+                continue
+            joined.append(tuple(current))
+        current = [start, end, values, trace]
+    joined.append(tuple(current))
+    return joined
+
+
 def pad_timeseries(timeseries, starttime, endtime):
     """Calls pad_and_trim_trace for each trace in a stream.
 
@@ -1,9 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy
 import os
+import sys
+import threading
 from obspy.core import Stats, Trace
 from io import BytesIO
 
 
+# state for stdout_to_stderr, shared by all threads
+_stdout_lock = threading.Lock()
+_stdout_count = 0
+_stdout = None
+
+
 class ObjectView(object):
     """
     Wrap a dictionary so its properties can be accessed as an object.
@@ -104,13 +114,71 @@ def get_intervals(starttime, endtime, size=86400, align=True, trim=False):
     return intervals
 
 
-def read_file(filepath):
+def map_concurrent(function, items, max_workers=1):
+    """Call function for each item, using a pool of threads.
+
+    Parameters
+    ----------
+    function : callable
+        called with each item.
+    items : array_like
+        items to process.
+    max_workers : int
+        maximum number of concurrent calls.
+        when <= 1, items are processed serially.
+
+    Returns
+    -------
+    list
+        results in the same order as items.
+
+    Raises
+    ------
+    Exception
+        the first exception, in item order, raised by function,
+        after all calls have completed.
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(function, item) for item in items]
+    return [future.result() for future in futures]
+
+
+@contextmanager
+def stdout_to_stderr():
+    """Send sys.stdout to sys.stderr, while any thread is in this context.
+
+    stdout is redirected when the first thread enters,
+    and restored when the last thread exits,
+    so threads with overlapping contexts do not restore it early.
+    """
+    global _stdout, _stdout_count
+    with _stdout_lock:
+        if _stdout_count == 0:
+            _stdout = sys.stdout
+            sys.stdout = sys.stderr
+        _stdout_count += 1
+    try:
+        yield
+    finally:
+        with _stdout_lock:
+            _stdout_count -= 1
+            if _stdout_count == 0:
+                sys.stdout = _stdout
+                _stdout = None
+
+
+def read_file(filepath, binary=False):
     """Open and read file contents.
 
     Parameters
     ----------
     filepath : str
         path to a file
+    binary : bool
+        return bytes instead of str.
 
     Returns
     -------
@@ -123,18 +191,20 @@ def read_file(filepath):
         if file does not exist
     """
     file_data = None
-    with open(filepath, "r") as f:
+    with open(filepath, "rb" if binary else "r") as f:
         file_data = f.read()
     return file_data
 
 
-def read_url(url, connect_timeout=15, max_redirects=5, timeout=300):
+def read_url(url, connect_timeout=15, max_redirects=5, timeout=300, binary=False):
     """Open and read url contents.
 
     Parameters
     ----------
     url : str
         A urllib2 compatible url, such as http:// or file://.
+    binary : bool
+        return bytes instead of str.
 
     Returns
     -------
@@ -149,7 +219,7 @@ def read_url(url, connect_timeout=15, max_redirects=5, timeout=300):
     try:
         # short circuit file urls
         filepath = get_file_from_url(url)
-        return read_file(filepath)
+        return read_file(filepath, binary=binary)
     except IOError as e:
         raise e
     except Exception:
@@ -170,7 +240,8 @@ def read_url(url, connect_timeout=15, max_redirects=5, timeout=300):
         curl.setopt(pycurl.WRITEFUNCTION, out.write)
         curl.perform()
         content = out.getvalue()
-        content = content.decode("utf-8")
+        if not binary:
+            content = content.decode("utf-8")
     except pycurl.error as e:
         raise IOError(e.args)
     finally:
@@ -5,7 +5,7 @@
 from __future__ import absolute_import
 
 from .Algorithm import Algorithm
-import json
+from .StateStore import StateStore
 import numpy as np
 from obspy.core import Stream, Stats
 import sys
@@ -43,7 +43,7 @@ class AdjustedAlgorithm(Algorithm):
 
     def load_state(self):
         """Load algorithm state from a file.
-        File name is self.statefile.
+        File name is self.statefile, see StateStore for supported formats.
         """
         # Adjusted matrix defaults to identity matrix
         matrix_size = len([c for c in self.get_input_channels() if c != "F"]) + 1
@@ -53,9 +53,7 @@ class AdjustedAlgorithm(Algorithm):
             return
         data = None
         try:
-            with open(self.statefile, "r") as f:
-                data = f.read()
-                data = json.loads(data)
+            data = StateStore(self.statefile).load()
         except IOError as err:
             sys.stderr.write("I/O error {0}".format(err))
         if data is None or data == "":
@@ -67,7 +65,7 @@ class AdjustedAlgorithm(Algorithm):
 
     def save_state(self):
         """Save algorithm state to a file.
-        File name is self.statefile.
+        File name is self.statefile, see StateStore for supported formats.
         """
         if self.statefile is None:
             return
@@ -77,8 +75,7 @@ class AdjustedAlgorithm(Algorithm):
             for j in range(0, length):
                 key = "M" + str(i + 1) + str(j + 1)
                 data[key] = self.matrix[i, j]
-        with open(self.statefile, "w") as f:
-            f.write(json.dumps(data))
+        StateStore(self.statefile).save(data)
 
     def create_trace(self, channel, stats, data):
         """Utility to create a new trace object.
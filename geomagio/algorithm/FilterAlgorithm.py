@@ -1,13 +1,12 @@
-import json
 import sys
 from typing import Dict
 
 import numpy as np
-from numpy.lib import stride_tricks as npls
-from obspy.core import Stream, Stats
+from obspy.core import Stream, Stats, Trace, UTCDateTime
 import scipy.signal as sps
 
 from .Algorithm import Algorithm
+from .StateStore import StateStore
 from .. import TimeseriesUtility
 
 
@@ -89,6 +88,55 @@ def get_nearest_time(step, output_time, left=True):
     }
 
 
+def decimate_correlate(data, window, step, count):
+    """Correlate data with window, keeping every step-th output.
+
+    Computes output[k] = sum(window * data[k * step : k * step + len(window)])
+    using a polyphase decomposition, which only evaluates kept outputs and
+    uses memory proportional to the length of data.
+
+    Parameters
+    ----------
+    data: numpy.ndarray
+        array of finite data to filter.
+    window: numpy.ndarray
+        array of filter coefficients.
+    step: int
+        decimation factor.
+    count: int
+        number of outputs, at most (len(data) - len(window)) // step + 1.
+
+    Returns
+    -------
+    numpy.ndarray
+        array of count outputs.
+    """
+    out = np.zeros(count)
+    for phase in range(min(step, len(window))):
+        taps = window[phase::step]
+        samples = data[phase::step][: count + len(taps) - 1]
+        out += np.correlate(samples, taps, mode="valid")
+    return out
+
+
+def is_block_average(window, step):
+    """Whether filtering with window and decimating by step averages blocks.
+
+    Parameters
+    ----------
+    window: numpy.ndarray
+        array of filter coefficients.
+    step: int
+        decimation factor.
+
+    Returns
+    -------
+    bool
+        True if window has step equal coefficients.
+    """
+    return len(window) == step and np.all(window == window[0])
+
+
 def get_step_time_shift(step):
     """Calculates the time shift generated in each filtering step
 
@@ -110,6 +158,9 @@ def get_step_time_shift(step):
 class FilterAlgorithm(Algorithm):
     """
     Filter Algorithm that filters and downsamples data
+
+    When a statefile is configured, input samples not yet used by an output
+    are carried between calls to process, so each call only needs new data.
     """
 
     def __init__(
@@ -121,6 +172,7 @@ class FilterAlgorithm(Algorithm):
         output_sample_period=None,
         inchannels=None,
         outchannels=None,
+        statefile=None,
     ):
 
         Algorithm.__init__(self, inchannels=None, outchannels=None)
@@ -129,6 +181,11 @@ class FilterAlgorithm(Algorithm):
         self.input_sample_period = input_sample_period
         self.output_sample_period = output_sample_period
         self.steps = steps
+        self.statefile = statefile
+        # state variables
+        self.tails = {}
+        self.last_observatory = None
+        self.next_starttime = None
         self.load_state()
         # ensure correctly aligned coefficients in each step
         self.steps = (
@@ -136,14 +193,14 @@ class FilterAlgorithm(Algorithm):
         )
 
     def load_state(self):
-        """Load filter coefficients from json file if custom filter is used.
-        File name is self.coeff_filename.
+        """Load filter coefficients from json file if custom filter is used,
+        and carried samples when streaming.
+        File names are self.coeff_filename and self.statefile.
         """
+        self.load_stream_state()
         if self.coeff_filename is None:
             return
-        with open(self.coeff_filename, "r") as f:
-            data = f.read()
-            data = json.loads(data)
+        data = StateStore(self.coeff_filename).load()
         if data is None or data == "":
             return
         self.steps = [
@@ -165,15 +222,72 @@ class FilterAlgorithm(Algorithm):
             }
         ]
 
+    def load_stream_state(self):
+        """Load carried samples from a file.
+        File name is self.statefile, see StateStore for supported formats.
+        """
+        self.clear_state()
+        if self.statefile is None:
+            return
+        try:
+            data = StateStore(self.statefile).load()
+        except Exception:
+            return
+        for i, tail in enumerate(data["tails"]):
+            stats = Stats()
+            stats.station = data["last_observatory"]
+            stats.channel = tail["channel"]
+            stats.delta = tail["delta"]
+            self.tails[(tail["step"], tail["channel"])] = {
+                "time": UTCDateTime(tail["time"]),
+                "trace": self._create_carried_trace(
+                    stats,
+                    UTCDateTime(tail["starttime"]),
+                    np.array(data["tail_%d" % i], dtype=np.float64),
+                ),
+            }
+        self.last_observatory = data["last_observatory"]
+        self.next_starttime = (
+            data["next_starttime"] and UTCDateTime(data["next_starttime"]) or None
+        )
+
     def save_state(self):
-        """Save algorithm state to a file.
-        File name is self.statefile.
+        """Save carried samples to a file.
+        File name is self.statefile, see StateStore for supported formats.
         """
-        if self.coeff_filename is None:
+        if self.statefile is None:
             return
-        data = {"window": list(self.window), "type": self.type}
-        with open(self.coeff_filename, "w") as f:
-            f.write(json.dumps(data))
+        data = {
+            "last_observatory": self.last_observatory,
+            "next_starttime": self.next_starttime and str(self.next_starttime),
+            "tails": [],
+        }
+        for i, ((step, channel), tail) in enumerate(sorted(self.tails.items())):
+            trace = tail["trace"]
+            data["tails"].append(
+                {
+                    "step": step,
+                    "channel": channel,
+                    "delta": trace.stats.delta,
+                    "starttime": str(trace.stats.starttime),
+                    "time": str(tail["time"]),
+                }
+            )
+            data["tail_%d" % i] = np.asarray(trace.data, dtype=np.float64)
+        StateStore(self.statefile).save(data)
+
+    def clear_state(self):
+        """Clear in-memory state.
+
+        Call save_state() after this method to clear filesystem state.
+        """
+        self.tails = {}
+        self.last_observatory = None
+        self.next_starttime = None
+
+    def get_next_starttime(self):
+        """Return the next_starttime from the state, if it is set."""
+        return self.next_starttime
 
     def get_filter_steps(self):
         """Method to gather necessary filtering steps from STEPS constant.
@@ -212,6 +326,8 @@ class FilterAlgorithm(Algorithm):
         """Can Produce data
 
         The FilterAlgorithm can produce data for each channel independently.
+        When input channels are not configured, all channels in stream are
+        checked.
 
         Parameters
         ----------
@@ -222,9 +338,10 @@ class FilterAlgorithm(Algorithm):
         stream: obspy.core.Stream
             The input stream we want to make certain has data for the algorithm
         """
-        return TimeseriesUtility.has_any_channels(
-            stream, self.get_required_channels(), starttime, endtime
-        )
+        channels = self.get_required_channels() or [
+            trace.stats.channel for trace in stream
+        ]
+        return TimeseriesUtility.has_any_channels(stream, channels, starttime, endtime)
 
     def create_trace(self, channel, stats, data):
         """Utility to create a new trace object.
@@ -262,11 +379,124 @@ class FilterAlgorithm(Algorithm):
         """
         # intitialize step array for filter
         steps = self.get_filter_steps()
-        for step in steps:
-            stream = self.process_step(step, stream.copy())
-
+        if self.statefile is None:
+            for step in steps:
+                stream = self.process_step(step, stream.copy())
+            return stream
+        if len(stream) == 0:
+            return stream
+        # streaming, carry unused input between calls
+        self.last_observatory = stream[0].stats.station
+        for step_index, step in enumerate(steps):
+            stream = self.process_step_streaming(step_index, step, stream.copy())
+        next_times = [
+            tail["time"]
+            for (step_index, _), tail in self.tails.items()
+            if step_index == len(steps) - 1
+        ]
+        self.next_starttime = next_times and min(next_times) or None
+        self.save_state()
         return stream
 
+    def process_step_streaming(self, step_index, step, stream):
+        """Filters stream for one step, using carried samples.
+        Samples carried from the previous call are joined to the start of each
+        trace, and samples not yet used by an output are carried to the next
+        call.
+        Parameters
+        ----------
+        step_index : int
+            index of step, used to identify carried samples
+        step : array element
+            step holding variables for one filtering operation
+        stream : obspy.core.Stream
+            stream of data to filter
+        Returns
+        -------
+        out : obspy.core.Stream
+            stream containing 1 trace per original trace,
+            with only new output samples.
+        """
+        out = Stream()
+        for trace in stream:
+            key = (step_index, trace.stats.channel)
+            trace = self.join_tail(step, trace, self.tails.get(key))
+            out += self.process_step(step, Stream([trace]))
+            self.tails[key] = self.get_tail(step, trace)
+        return out
+
+    def join_tail(self, step, trace, tail):
+        """Join carried samples to the start of a trace.
+        Parameters
+        ----------
+        step: dict
+            Dictionary object holding information about a given filter step
+        trace: obspy.core.trace
+            new input data
+        tail: dict
+            carried samples, as returned by get_tail
+        Returns
+        -------
+        obspy.core.trace
+            trace starting with carried samples, and any gap filled with nan.
+            trace is returned unchanged when tail is None, for another station
+            or delta, starts after trace, or ends more than one window before
+            trace.
+        """
+        if tail is None:
+            return trace
+        tail = tail["trace"]
+        delta = trace.stats.delta
+        tail_end = tail.stats.starttime + tail.stats.npts * delta
+        if (
+            tail.stats.station != trace.stats.station
+            or tail.stats.delta != delta
+            or trace.stats.starttime < tail.stats.starttime
+            or trace.stats.starttime - tail_end >= len(step["window"]) * delta
+        ):
+            return trace
+        count = int(round((trace.stats.starttime - tail.stats.starttime) / delta))
+        carried = np.full(count, np.nan)
+        carried[: min(count, tail.stats.npts)] = tail.data[:count]
+        return self._create_carried_trace(
+            trace.stats, tail.stats.starttime, np.concatenate((carried, trace.data))
+        )
+
+    def get_tail(self, step, trace):
+        """Get samples not used by any output of a trace.
+        Parameters
+        ----------
+        step: dict
+            Dictionary object holding information about a given filter step
+        trace: obspy.core.trace
+            trace that was filtered
+        Returns
+        -------
+        dict
+            "time" of next output, and "trace" of samples starting at the
+            first input for that output.
+        """
+        start, data = self.align_trace(step, trace)
+        numtaps = len(step["window"])
+        decimation = int(step["output_sample_period"] / step["input_sample_period"])
+        count = 0
+        if len(data) >= numtaps:
+            count = (len(data) - numtaps) // decimation + 1
+        next_time = start + count * step["output_sample_period"]
+        data_start = get_nearest_time(step=step, output_time=next_time)["data_start"]
+        offset = int(round((data_start - trace.stats.starttime) / trace.stats.delta))
+        tail = self._create_carried_trace(
+            trace.stats, data_start, np.array(trace.data[offset:], dtype=np.float64)
+        )
+        return {"time": next_time, "trace": tail}
+
+    def _create_carried_trace(self, stats, starttime, data):
+        """Create a trace with metadata from stats, starting at starttime."""
+        stats = Stats(stats)
+        stats.starttime = starttime
+        stats.npts = len(data)
+        return Trace(data, stats)
+
     def process_step(self, step, stream):
         """Filters stream for one step.
         Filters all traces in stream.
@@ -294,7 +524,10 @@ class FilterAlgorithm(Algorithm):
             # check that there is still enough data to filter
             if len(data) < numtaps:
                 continue
-            filtered = self.firfilter(data, window, decimation)
+            if step["type"] == "average" and is_block_average(window, decimation):
+                filtered = self.average(data, decimation)
+            else:
+                filtered = self.firfilter(data, window, decimation)
             stats = Stats(trace.stats)
             stats.delta = output_sample_period
             stats.data_interval = step["data_interval"]
@@ -340,6 +573,38 @@ class FilterAlgorithm(Algorithm):
             data = data[offset:]
         return filter_start["time"], data
 
+    @staticmethod
+    def average(data, step, allowed_bad=0.1):
+        """Average non-overlapping blocks of a numpy array.
+        Equivalent to firfilter with a boxcar window of length step,
+        but uses block sums instead of a convolution.
+        Parameters
+        ----------
+        data: numpy.ndarray
+            array of data to process
+        step: int
+            number of input samples in each output
+        allowed_bad: float
+            ratio of bad samples to block size
+        Returns
+        -------
+        averaged : numpy.ndarray
+            array containing averaged output
+        """
+        count = len(data) // step
+        blocks = np.asarray(data[: count * step], dtype=float).reshape(count, step)
+        valid = np.isfinite(blocks)
+        if valid.all():
+            return blocks.mean(axis=1)
+        counts = valid.sum(axis=1)
+        sums = np.where(valid, blocks, 0).sum(axis=1)
+        # same allowed_bad threshold as firfilter
+        bad = counts < (1 - allowed_bad) * step - 1e-9
+        counts[bad] = 1
+        averaged = sums / counts
+        averaged[bad] = np.nan
+        return averaged
+
     @staticmethod
     def firfilter(data, window, step, allowed_bad=0.1):
         """Run fir filter for a numpy array.
@@ -361,35 +626,29 @@ class FilterAlgorithm(Algorithm):
             stream containing filtered output
         """
         numtaps = len(window)
-
-        # build view into data, with numtaps  chunks separated into
-        # overlapping 'rows'
-        shape = data.shape[:-1] + (data.shape[-1] - numtaps + 1, numtaps)
-        strides = data.strides + (data.strides[-1],)
-        as_s = npls.as_strided(data, shape=shape, strides=strides, writeable=False)
-        # build masked array for invalid entries, also 'decimate' by step
-        as_masked = np.ma.masked_invalid(as_s[::step], copy=True)
-        # sums of the total 'weights' of the filter corresponding to
-        # valid samples
-        as_weight_sums = np.dot(window, (~as_masked.mask).T)
-        # mark the output locations as 'bad' that have missing input weights
-        # that sum to greater than the allowed_bad threshhold
-        as_invalid_masked = np.ma.masked_less(as_weight_sums, 1 - allowed_bad)
-        # apply filter, using masked version of dot (in 3.5 and above, there
-        # seems to be a move toward np.matmul and/or @ operator as opposed to
-        # np.dot/np.ma.dot - haven't tested to see if the shape of first and
-        # second argument need to be changed)
-        filtered = np.ma.dot(window, as_masked.T)
-        # re-normalize, especially important for partially filled windows
-        filtered = np.divide(filtered, as_weight_sums)
-        # use the earlier marked output locations to mask the output data
-        # array
-        filtered.mask = as_invalid_masked.mask
-        # convert masked array back to regular array, with nan as fill value
-        # (otherwise the type returned is not always the same, and can cause
-        # problems with factories, merge, etc.)
-        filtered_out = np.ma.filled(filtered, np.nan)
-        return filtered_out
+        count = (len(data) - numtaps) // step + 1
+        if count <= 0:
+            return np.array([], dtype=float)
+        data = np.asarray(data, dtype=float)
+        valid = np.isfinite(data)
+        if valid.all():
+            filtered = decimate_correlate(data, window, step, count)
+            # every window is full, weights are the same for every output
+            weight_sums = np.full(count, np.sum(window))
+        else:
+            # filter zero-filled data, and separately the valid sample mask
+            # to get the sums of filter weights corresponding to valid samples
+            filtered = decimate_correlate(np.where(valid, data, 0), window, step, count)
+            weight_sums = decimate_correlate(valid.astype(float), window, step, count)
+        # re-normalize, especially important for partially filled windows,
+        # and mark outputs as bad when missing input weights sum to greater
+        # than the allowed_bad threshold (with tolerance for rounding, so
+        # exactly allowed_bad is not affected by summation order)
+        bad = weight_sums < 1 - allowed_bad - 1e-9
+        weight_sums[bad] = 1
+        filtered /= weight_sums
+        filtered[bad] = np.nan
+        return filtered
 
     def get_input_interval(self, start, end, observatory=None, channels=None):
         """Get Input Interval
@@ -409,11 +668,28 @@ class FilterAlgorithm(Algorithm):
             end of input required to generate requested output.
         """
         steps = self.get_filter_steps()
+        streaming = (
+            self.next_starttime is not None
+            and start == self.next_starttime
+            and observatory == self.last_observatory
+        )
         # calculate start/end from inverted step array
         for step in reversed(steps):
             start_interval = get_nearest_time(step=step, output_time=start, left=False)
             end_interval = get_nearest_time(step=step, output_time=end, left=True)
             start, end = start_interval["data_start"], end_interval["data_end"]
+        if streaming:
+            # carried samples are up to date, only need new data
+            tails = [
+                tail["trace"]
+                for (step_index, channel), tail in self.tails.items()
+                if step_index == 0 and (channels is None or channel in channels)
+            ]
+            if tails and (channels is None or len(tails) == len(channels)):
+                start = min(
+                    tail.stats.starttime + tail.stats.npts * tail.stats.delta
+                    for tail in tails
+                )
         return (start, end)
 
     @classmethod
@@ -432,6 +708,14 @@ class FilterAlgorithm(Algorithm):
             default=None,
             help="File storing custom filter coefficients",
         )
+        parser.add_argument(
+            "--filter-statefile",
+            default=None,
+            help="""
+                File to store input carried between calls to algorithm,
+                so each call only reads and filters new data
+                """,
+        )
 
     def configure(self, arguments):
         """Configure algorithm using comand line arguments.
@@ -443,6 +727,7 @@ class FilterAlgorithm(Algorithm):
         Algorithm.configure(self, arguments)
         # intialize filter with command line arguments
         self.coeff_filename = arguments.filter_coefficients
+        self.statefile = arguments.filter_statefile
         self.input_sample_period = TimeseriesUtility.get_delta_from_interval(
             arguments.input_interval or arguments.interval
         )
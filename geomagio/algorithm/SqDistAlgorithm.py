@@ -13,14 +13,170 @@
 """
 from __future__ import absolute_import, print_function
 
-from .. import StreamConverter
+from .. import StreamConverter, TimeseriesUtility
 from .Algorithm import Algorithm
 from .AlgorithmException import AlgorithmException
-import json
+from .StateStore import StateStore
+from concurrent.futures import ThreadPoolExecutor
+import math
 import numpy as np
+import time
 from obspy.core import Stream, UTCDateTime
 from scipy.optimize import fmin_l_bfgs_b
 
+try:
+    import numba
+except ImportError:
+    # numba is optional, the "python" engine is used when not installed
+    numba = None
+
+
+def _additive_kernel(
+    yobs,
+    fc,
+    m,
+    hstep,
+    alpha,
+    beta,
+    gamma,
+    phi,
+    zthresh,
+    l,
+    b,
+    sigma,
+    yhat,
+    r,
+    s,
+    weights,
+    sumc2_H,
+    phiHminus1,
+):
+    """Holt-Winters recursion used by SqDistAlgorithm.additive().
+
+    Written using only operations supported by numba, so the same function
+    may be run by the Python interpreter, or compiled by numba.
+    Arrays are pre-allocated by the caller and updated in place.
+
+    Parameters
+    ----------
+    yobs : numpy.ndarray
+        float64 input series.
+    fc, m, hstep : int
+        see SqDistAlgorithm.additive().
+    alpha, beta, gamma, phi, zthresh : float
+        see SqDistAlgorithm.additive().
+    l, b : float
+        initial level and slope.
+    sigma, yhat, r, s : numpy.ndarray
+        pre-allocated state arrays, updated in place.
+    weights : numpy.ndarray
+        seasonal smoothing weights.
+    sumc2_H, phiHminus1 : float
+        hstep "prediction interval" variables.
+
+    Returns
+    -------
+    l : float
+        level after processing the last observation.
+    b : float
+        slope after processing the last observation.
+    """
+    n = len(yobs)
+    nts = len(weights)
+    half = nts // 2
+    phiJminus1 = phiHminus1
+    sumc2 = sumc2_H
+    jstep = hstep
+    sigma2 = 0.0
+    lnext = l
+    bnext = b
+    for i in range(n + fc):
+        # Update/append sigma for h steps ahead of i following
+        # Hyndman-et-al-2005. This will be over-written if valid
+        # observations exist at step i
+        if jstep == hstep:
+            sigma2 = sigma[i] * sigma[i]
+        sigma[i + hstep + 1] = math.sqrt(sigma2 * sumc2)
+
+        # predict h steps ahead
+        yhat[i + hstep] = l + phiHminus1 * b + s[i + hstep % m]
+
+        # discrepancy between observation and prediction at step i
+        if i < n:
+            et = yobs[i] - yhat[i]
+        else:
+            # fc>0, so simulate beyond last input
+            et = math.nan
+
+        if math.isnan(et) or abs(et) > zthresh * sigma[i]:
+            # forecast (i.e., update l, b, and s assuming et==0)
+
+            # no change in seasonal adjustments
+            r[i + 1] = 0 + r[i]
+            s[i + m] = s[i]
+
+            # update l before b
+            l = l + phi * b
+            b = phi * b
+
+            if math.isnan(et):
+                # when forecasting, grow sigma=sqrt(var) like a prediction
+                # interval; sumc2 and jstep will be reset with the next
+                # valid observation
+                phiJminus1 = phiJminus1 + phi ** float(jstep)
+                jstep = jstep + 1
+                sumc2 = (
+                    sumc2
+                    + (
+                        alpha * (1 + phiJminus1 * beta)
+                        + gamma * (1 if (jstep % m == 0) else 0)
+                    )
+                    ** 2
+                )
+
+            else:
+                # still update sigma using et when et > zthresh * sigma
+                # (and is not NaN)
+                sigma[i + 1] = alpha * abs(et) + (1 - alpha) * sigma[i]
+                jstep = hstep
+        else:
+            # smooth (i.e., update l, b, and s by filtering et)
+
+            # r will be used to enforce zero-mean seasonal correction
+            r[i + 1] = gamma * (1 - alpha) * et / m + r[i]
+
+            # distribute error correction across range of seasonal
+            # corrections according to weights calculated above
+            correction = gamma * (1 - alpha) * et
+            s[i + m] = s[i] + correction * weights[half]
+            s[i + m - half : i + m] = (
+                s[i + m - half : i + m] + correction * weights[:half]
+            )
+            s[i + 1 : i + half + 1] = (
+                s[i + 1 : i + half + 1] + correction * weights[half + 1 :]
+            )
+
+            # update l and b using equation-error formulation
+            l = l + phi * b + alpha * et
+            b = phi * b + alpha * beta * et
+
+            # update sigma with et, then reset prediction interval
+            sigma[i + 1] = alpha * abs(et) + (1 - alpha) * sigma[i]
+            sumc2 = sumc2_H
+            phiJminus1 = phiHminus1
+            jstep = hstep
+
+        # freeze level and slope with last input for reinitialization
+        if i == (n - 1):
+            lnext = l
+            bnext = b
+
+    return lnext, bnext
+
+
+# compiled lazily, on first use of the "numba" engine
+_compiled_additive_kernel = None
+
 
 class SqDistAlgorithm(Algorithm):
     """Solar Quiet, Secular Variation, and Disturbance algorithm"""
@@ -43,6 +199,9 @@ class SqDistAlgorithm(Algorithm):
         statefile=None,
         mag=False,
         smooth=1,
+        engine="auto",
+        multichannel=False,
+        statefile_history=0,
     ):
         Algorithm.__init__(self, inchannels=None, outchannels=None)
         self.alpha = alpha
@@ -54,8 +213,11 @@ class SqDistAlgorithm(Algorithm):
         self.fc = fc
         self.hstep = hstep
         self.statefile = statefile
+        self.statefile_history = statefile_history
         self.mag = mag
         self.smooth = smooth
+        self.engine = engine
+        self.multichannel = multichannel
         # state variables
         self.yhat0 = yhat0
         self.s0 = s0
@@ -89,10 +251,13 @@ class SqDistAlgorithm(Algorithm):
         """
         if self.mag:
             channels = "H"
+        if self.multichannel:
+            same_channels = list(channels) == self.last_channel
+        else:
+            same_channels = len(channels) == 1 and channels[0] == self.last_channel
         if (
             observatory == self.last_observatory
-            and len(channels) == 1
-            and channels[0] == self.last_channel
+            and same_channels
             and start == self.next_starttime
         ):
             # state is up to date, only need new data
@@ -122,15 +287,15 @@ class SqDistAlgorithm(Algorithm):
     def load_state(self):
         """Load algorithm state from a file.
 
-        File name is self.statefile.
+        File name is self.statefile, see StateStore for supported formats.
+        In multichannel mode, state variables have one row per channel,
+        and last_channel is a list of channels.
         """
         if self.statefile is None:
             return
         data = None
         try:
-            with open(self.statefile, "r") as f:
-                data = f.read()
-                data = json.loads(data)
+            data = self.get_state_store().load()
         except Exception:
             pass
         if data is None or data == "":
@@ -148,28 +313,45 @@ class SqDistAlgorithm(Algorithm):
     def save_state(self):
         """Save algorithm state to a file.
 
-        File name is self.statefile.
+        File name is self.statefile, see StateStore for supported formats.
         """
         if self.statefile is None:
             return
+
+        def as_state(value):
+            if value is None or np.isscalar(value):
+                return value
+            return np.asarray(value, dtype=np.float64)
+
         data = {
-            "yhat0": list(self.yhat0),
-            "s0": list(self.s0),
-            "l0": self.l0,
-            "b0": self.b0,
-            "sigma0": list(self.sigma0),
+            "yhat0": as_state(self.yhat0),
+            "s0": as_state(self.s0),
+            "l0": as_state(self.l0),
+            "b0": as_state(self.b0),
+            "sigma0": as_state(self.sigma0),
             "last_observatory": self.last_observatory,
             "last_channel": self.last_channel,
             "last_delta": self.last_delta,
             "next_starttime": str(self.next_starttime),
         }
-        with open(self.statefile, "w") as f:
-            f.write(json.dumps(data))
+        self.get_state_store().save(data)
+
+    def get_state_store(self):
+        """Get store used to load and save state.
+
+        Returns
+        -------
+        StateStore
+            store for self.statefile, retaining self.statefile_history
+            previous snapshots.
+        """
+        return StateStore(self.statefile, history=self.statefile_history)
 
     def process(self, stream):
         """Run algorithm for a stream.
 
-        Processes each trace in the stream using process_one.
+        Processes each trace in the stream using process_one,
+        or all traces at once using process_many in multichannel mode.
 
         Parameters
         ----------
@@ -199,10 +381,112 @@ class SqDistAlgorithm(Algorithm):
                 raise AlgorithmException("Unable to convert to magnetic H")
             stream = stream.select(channel="H")
 
+        if self.multichannel:
+            return self.process_many(stream)
         for trace in stream.traces:
             out += self.process_one(trace)
         return out
 
+    def process_many(self, stream):
+        """Run algorithm for all traces in a stream at once.
+
+        Traces are padded to a common interval and processed as a 2-D array,
+        with one row of state per channel.
+        NOTE: state currently assumes repeated calls to process_many are
+        for sequential chunks of data, with the same channels in the same
+        order.
+
+        Parameters
+        ----------
+        stream : obspy.core.Stream
+            chunk of data to process
+
+        Returns
+        -------
+        out : obspy.core.Stream
+            stream containing 4 traces per original trace,
+            see process_one.
+        """
+        out = Stream()
+        if len(stream) == 0:
+            return out
+        stream = stream.copy()
+        starttime, endtime = TimeseriesUtility.get_stream_start_end_times(stream)
+        TimeseriesUtility.pad_timeseries(stream, starttime, endtime)
+        stats = stream[0].stats
+        channels = [trace.stats.channel for trace in stream]
+        # check state
+        if (
+            self.last_observatory is not None
+            or self.last_channel is not None
+            or self.last_delta is not None
+            or self.next_starttime is not None
+        ):
+            # have state, verify okay to proceed
+            if (
+                stats.station != self.last_observatory
+                or channels != self.last_channel
+                or stats.delta != self.last_delta
+                or stats.starttime != self.next_starttime
+            ):
+                # state not correct
+                raise AlgorithmException(
+                    "Inconsistent SQDist algorithm state"
+                    + " process(%s, %s, %s, %s) <> state(%s, %s, %s, %s)"
+                    % (
+                        stats.station,
+                        channels,
+                        stats.delta,
+                        stats.starttime,
+                        self.last_observatory,
+                        self.last_channel,
+                        self.last_delta,
+                        self.next_starttime,
+                    )
+                )
+        # process
+        yobs = np.vstack([trace.data for trace in stream])
+        yhat, shat, sigmahat, yhat0, s0, l0, b0, sigma0 = self.additive(
+            yobs=yobs,
+            m=self.m,
+            alpha=self.alpha,
+            beta=self.beta,
+            gamma=self.gamma,
+            phi=self.phi,
+            yhat0=self.yhat0,
+            s0=self.s0,
+            l0=self.l0,
+            b0=self.b0,
+            sigma0=self.sigma0,
+            zthresh=self.zthresh,
+            fc=self.fc,
+            hstep=self.hstep,
+            smooth=self.smooth,
+            engine=self.engine,
+        )
+        # update state
+        self.yhat0 = yhat0
+        self.s0 = s0
+        self.l0 = l0
+        self.b0 = b0
+        self.sigma0 = sigma0
+        self.last_observatory = stats.station
+        self.last_channel = channels
+        self.last_delta = stats.delta
+        self.next_starttime = stats.starttime + (stats.delta * stats.npts)
+        self.save_state()
+        # create updated traces
+        raw = np.hstack((yobs, np.full((len(channels), self.fc), np.nan)))
+        dist = np.subtract(raw, yhat)
+        sv = np.subtract(yhat, shat)
+        for i, trace in enumerate(stream):
+            channel = trace.stats.channel
+            out += self.create_trace(channel + "_Dist", trace.stats, dist[i])
+            out += self.create_trace(channel + "_SQ", trace.stats, shat[i])
+            out += self.create_trace(channel + "_SV", trace.stats, sv[i])
+            out += self.create_trace(channel + "_Sigma", trace.stats, sigmahat[i])
+        return out
+
     def process_one(self, trace):
         """Run algorithm for one trace.
 
@@ -271,6 +555,7 @@ class SqDistAlgorithm(Algorithm):
             fc=self.fc,
             hstep=self.hstep,
             smooth=self.smooth,
+            engine=self.engine,
         )
         # update state
         self.yhat0 = yhat0
@@ -323,6 +608,7 @@ class SqDistAlgorithm(Algorithm):
         fc=0,
         hstep=0,
         smooth=1,
+        engine="auto",
     ):
         """Primary function for Holt-Winters smoothing/forecasting with
           damped linear trend and additive seasonal component.
@@ -339,10 +625,15 @@ class SqDistAlgorithm(Algorithm):
         The result is a sigma that grows over gaps, and for forecasts beyond
         yobs[-1].
 
+        When yobs is a 2-D array, each row is processed as a separate series;
+        state parameters and results then have one row (or element) per
+        series.
+
         Parameters
         ----------
         yobs : array_like
-            input series to be smoothed/forecast
+            input series to be smoothed/forecast,
+            or 2-D array with one series per row
         m : int
             number of "seasons"
         alpha : float
@@ -382,6 +673,8 @@ class SqDistAlgorithm(Algorithm):
         smooth: int
             period (in samples) at which Gaussian smoother will attenuate
             signal power by half
+        engine : {'auto', 'numba', 'python'}
+            implementation of the recursion, see get_additive_kernel().
 
         Returns
         -------
@@ -412,6 +705,31 @@ class SqDistAlgorithm(Algorithm):
         if phi is None:
             raise AlgorithmException("phi is required")
 
+        if np.ndim(yobs) == 2:
+            # process each row, then combine results by position
+            rows = [
+                cls.additive(
+                    yobs[i],
+                    m,
+                    alpha,
+                    beta,
+                    gamma,
+                    phi=phi,
+                    yhat0=None if yhat0 is None else yhat0[i],
+                    s0=None if s0 is None else s0[i],
+                    l0=None if l0 is None else l0[i],
+                    b0=None if b0 is None else b0[i],
+                    sigma0=None if sigma0 is None else sigma0[i],
+                    zthresh=zthresh,
+                    fc=fc,
+                    hstep=hstep,
+                    smooth=smooth,
+                    engine=engine,
+                )
+                for i in range(len(yobs))
+            ]
+            return tuple(np.array(result) for result in zip(*rows))
+
         # set some default values
         if l0 is None:
             l = np.nanmean(yobs[0 : int(m)])
@@ -480,8 +798,8 @@ class SqDistAlgorithm(Algorithm):
         r = [np.nanmean(s)]
 
         # determine sum(c^2) and phi_(j-1) for hstep "prediction interval"
-        # outside of loop; initialize variables for jstep (beyond hstep)
-        # prediction intervals
+        # outside of loop; variables for jstep (beyond hstep) prediction
+        # intervals are initialized from these by the kernel
         sumc2_H = 1
         phiHminus1 = 0
         for h in range(1, hstep):
@@ -491,109 +809,45 @@ class SqDistAlgorithm(Algorithm):
                 + (alpha * (1 + phiHminus1 * beta) + gamma * (1 if (h % m == 0) else 0))
                 ** 2
             )
-        phiJminus1 = phiHminus1
-        sumc2 = sumc2_H
-        jstep = hstep
 
         # convert to, and pre-allocate numpy arrays
-        yobs = np.array(yobs)
+        yobs = np.array(yobs, dtype=np.float64)
         sigma = np.concatenate((sigma, np.zeros(yobs.size + fc)))
         yhat = np.concatenate((yhat, np.zeros(yobs.size + fc)))
         r = np.concatenate((r, np.zeros(yobs.size + fc)))
         s = np.concatenate((s, np.zeros(yobs.size + fc)))
 
         # smooth/simulate/forecast yobs
-        for i in range(len(yobs) + fc):
-            # Update/append sigma for h steps ahead of i following
-            # Hyndman-et-al-2005. This will be over-written if valid
-            # observations exist at step i
-            if jstep == hstep:
-                sigma2 = sigma[i] * sigma[i]
-            sigma[i + hstep + 1] = np.sqrt(sigma2 * sumc2)
-
-            # predict h steps ahead
-            yhat[i + hstep] = l + phiHminus1 * b + s[i + hstep % m]
-
-            # discrepancy between observation and prediction at step i
-            if i < len(yobs):
-                et = yobs[i] - yhat[i]
-            else:
-                # fc>0, so simulate beyond last input
-                et = np.nan
-
-            if np.isnan(et) or np.abs(et) > zthresh * sigma[i]:
-                # forecast (i.e., update l, b, and s assuming et==0)
-
-                # no change in seasonal adjustments
-                r[i + 1] = 0 + r[i]
-                s[i + m] = s[i]
-
-                # update l before b
-                l = l + phi * b
-                b = phi * b
-
-                if np.isnan(et):
-                    # when forecasting, grow sigma=sqrt(var) like a prediction
-                    # interval; sumc2 and jstep will be reset with the next
-                    # valid observation
-                    phiJminus1 = phiJminus1 + phi ** jstep
-                    jstep = jstep + 1
-                    sumc2 = (
-                        sumc2
-                        + (
-                            alpha * (1 + phiJminus1 * beta)
-                            + gamma * (1 if (jstep % m == 0) else 0)
-                        )
-                        ** 2
-                    )
-
-                else:
-                    # still update sigma using et when et > zthresh * sigma
-                    # (and is not NaN)
-                    sigma[i + 1] = alpha * np.abs(et) + (1 - alpha) * sigma[i]
-                    jstep = hstep
-            else:
-                # smooth (i.e., update l, b, and s by filtering et)
-
-                # r will be used to enforce zero-mean seasonal correction
-                r[i + 1] = gamma * (1 - alpha) * et / m + r[i]
-
-                # #update and append to s using equation-error formulation
-                # s[i + m] = s[i] + gamma * (1 - alpha) * et
-
-                # distribute error correction across range of seasonal
-                # corrections according to weights calculated above
-                s[i + m] = s[i] + gamma * (1 - alpha) * et * weights[nts // 2]
-                s[i + m - nts // 2 : i + m] = (
-                    s[i + m - nts // 2 : i + m]
-                    + gamma * (1 - alpha) * et * weights[: nts // 2]
-                )
-                s[i + 1 : i + nts // 2 + 1] = (
-                    s[i + 1 : i + nts // 2 + 1]
-                    + gamma * (1 - alpha) * et * weights[nts // 2 + 1 :]
-                )
-
-                # update l and b using equation-error formulation
-                l = l + phi * b + alpha * et
-                b = phi * b + alpha * beta * et
-
-                # update sigma with et, then reset prediction interval
-                sigma[i + 1] = alpha * np.abs(et) + (1 - alpha) * sigma[i]
-                sumc2 = sumc2_H
-                phiJminus1 = phiHminus1
-                jstep = hstep
-
-            # endif (np.isnan(et) or np.abs(et) > zthresh * sigma[i])
-
-            # freeze state with last input for reinitialization
-            if i == (len(yobs) - 1):
-                yhat0 = yhat[len(yobs) : (len(yobs) + hstep)].copy()
-                s0 = s[len(yobs) : (len(yobs) + m)].copy() - r[i + 1]
-                l0 = l + r[i + 1]
-                b0 = b
-                sigma0 = sigma[len(yobs) : (len(yobs) + hstep + 1)].copy()
+        kernel = cls.get_additive_kernel(engine)
+        lnext, bnext = kernel(
+            yobs,
+            int(fc),
+            int(m),
+            int(hstep),
+            float(alpha),
+            float(beta),
+            float(gamma),
+            float(phi),
+            float(zthresh),
+            float(l),
+            float(b),
+            sigma,
+            yhat,
+            r,
+            s,
+            weights,
+            float(sumc2_H),
+            float(phiHminus1),
+        )
 
-        # endfor i in range(len(yobs) + fc)
+        # freeze state with last input for reinitialization
+        if len(yobs) > 0:
+            n = len(yobs)
+            yhat0 = yhat[n : (n + hstep)].copy()
+            s0 = s[n : (n + m)].copy() - r[n]
+            l0 = lnext + r[n]
+            b0 = bnext
+            sigma0 = sigma[n : (n + hstep + 1)].copy()
 
         # adjustments to enforce zero-mean seasonal corrections
         l = l + r[-1]
@@ -610,6 +864,46 @@ class SqDistAlgorithm(Algorithm):
             sigma0,
         )
 
+    @classmethod
+    def get_additive_kernel(cls, engine="auto"):
+        """Get the function that implements the Holt-Winters recursion.
+
+        Parameters
+        ----------
+        engine : {'auto', 'numba', 'python'}
+            'numba' compiles the recursion, and requires numba be installed.
+            'python' runs the recursion in the interpreter.
+            'auto' (default) uses 'numba' when installed, otherwise 'python'.
+            All engines produce identical results.
+
+        Returns
+        -------
+        function
+            kernel with the same signature as _additive_kernel().
+
+        Raises
+        ------
+        AlgorithmException
+            if engine is not recognized, or is 'numba' and numba is not
+            installed.
+        """
+        global _compiled_additive_kernel
+        if engine is None or engine == "auto":
+            engine = "python" if numba is None else "numba"
+        if engine == "python":
+            return _additive_kernel
+        if engine != "numba":
+            raise AlgorithmException("Unknown SqDist engine '%s'" % engine)
+        if numba is None:
+            raise AlgorithmException("SqDist engine 'numba' requires numba")
+        if _compiled_additive_kernel is None:
+            # release the GIL so threads may run the kernel concurrently,
+            # and cache compiled code on disk, so later processes skip compiling
+            _compiled_additive_kernel = numba.njit(nogil=True, cache=True)(
+                _additive_kernel
+            )
+        return _compiled_additive_kernel
+
     @classmethod
     def estimate_parameters(
         cls,
@@ -630,9 +924,20 @@ class SqDistAlgorithm(Algorithm):
         alpha0=0.3,
         beta0=0.1,
         gamma0=0.1,
+        engine="auto",
+        workers=None,
+        epsilon=1e-8,
+        factr=1e7,
+        pgtol=1e-5,
+        maxiter=15000,
+        full_output=False,
     ):
         """Estimate alpha, beta, and gamma parameters based on observed data.
 
+        The gradient is estimated using forward differences, and each
+        parameter's difference is evaluated concurrently.  Evaluations run in
+        parallel when using the "numba" engine, which releases the GIL.
+
         Parameters
         ----------
         yobs : array_like
@@ -682,6 +987,25 @@ class SqDistAlgorithm(Algorithm):
         gamma0 : float
             initial value for gamma.
             used only when gamma is None.
+        engine : {'auto', 'numba', 'python'}
+            implementation of the recursion, see get_additive_kernel().
+        workers : int
+            number of concurrent evaluations
+            (if None, default is one more than the number of parameters
+            being estimated)
+        epsilon : float
+            step size used to estimate the gradient.
+        factr : float
+            stop when the relative reduction in error is below
+            factr * machine precision, see fmin_l_bfgs_b.
+            larger values stop earlier.
+        pgtol : float
+            stop when the largest projected gradient is below pgtol,
+            see fmin_l_bfgs_b.
+        maxiter : int
+            maximum number of iterations.
+        full_output : bool
+            whether to also return information about the fit.
 
         Returns
         -------
@@ -693,7 +1017,12 @@ class SqDistAlgorithm(Algorithm):
             optimized gamma, if gamma was None.
         rmse : float
             root-mean-squared-error for data using optimized parameters.
+        info : dict
+            only when full_output is True.
+            information returned by fmin_l_bfgs_b,
+            plus "elapsed" time in seconds for the fit.
         """
+        start = time.perf_counter()
         # if alpha/beta/gamma is specified, restrict bounds to "fix" parameter.
         boundaries = [
             (alpha, alpha) if alpha is not None else (0, 1),
@@ -731,16 +1060,55 @@ class SqDistAlgorithm(Algorithm):
                 s0=s0,
                 zthresh=zthresh,
                 hstep=hstep,
+                engine=engine,
             )
             # compute root-mean-squared-error of predictions
             error = np.sqrt(np.nanmean(np.square(np.subtract(yobs, yhat))))
             return error
 
-        parameters = fmin_l_bfgs_b(
-            func, x0=initial_values, args=(), bounds=boundaries, approx_grad=True
-        )
+        # parameters that are not fixed by boundaries
+        free = [i for i, (low, high) in enumerate(boundaries) if low != high]
+
+        def func_and_grad(params):
+            """Function that computes root-mean-squared-error, and its
+            gradient, by evaluating func at params and at params stepped in
+            each free dimension.
+
+            Parameters
+            ----------
+            params: list-like
+                list containing alpha, beta, and gamma parameters to test
+            """
+            candidates = [params]
+            steps = []
+            for i in free:
+                # step backward at upper bound
+                step = epsilon if params[i] + epsilon <= boundaries[i][1] else -epsilon
+                candidate = np.array(params)
+                candidate[i] += step
+                candidates.append(candidate)
+                steps.append(step)
+            errors = list(executor.map(func, candidates))
+            gradient = np.zeros(len(params))
+            for i, step, error in zip(free, steps, errors[1:]):
+                gradient[i] = (error - errors[0]) / step
+            return errors[0], gradient
+
+        with ThreadPoolExecutor(max_workers=workers or len(free) + 1) as executor:
+            parameters = fmin_l_bfgs_b(
+                func_and_grad,
+                x0=initial_values,
+                bounds=boundaries,
+                factr=factr,
+                pgtol=pgtol,
+                maxiter=maxiter,
+            )
         alpha, beta, gamma = parameters[0]
         rmse = parameters[1]
+        if full_output:
+            info = parameters[2]
+            info["elapsed"] = time.perf_counter() - start
+            return (alpha, beta, gamma, rmse, info)
         return (alpha, beta, gamma, rmse)
 
     @classmethod
@@ -782,10 +1150,25 @@ class SqDistAlgorithm(Algorithm):
             default=False,
             help="Generate sqdist based on magnetic H component",
         )
+        parser.add_argument(
+            "--sqdist-multichannel",
+            action="store_true",
+            default=False,
+            help="Process all channels together, with state in one statefile",
+        )
         parser.add_argument(
             "--sqdist-statefile",
             default=None,
-            help="File to store state between calls to algorithm",
+            help="""
+                File to store state between calls to algorithm,
+                files ending with .npz use a binary format, others use JSON
+                """,
+        )
+        parser.add_argument(
+            "--sqdist-statefile-history",
+            default=0,
+            help="Number of previous state snapshots to retain",
+            type=int,
         )
         parser.add_argument(
             "--sqdist-zthresh", default=6, help="Set Z-score threshold", type=float
@@ -793,6 +1176,15 @@ class SqDistAlgorithm(Algorithm):
         parser.add_argument(
             "--sqdist-smooth", default=1, help="Local SQ smoothing parameter", type=int
         )
+        parser.add_argument(
+            "--sqdist-engine",
+            choices=["auto", "numba", "python"],
+            default="auto",
+            help="""
+                Implementation of the smoothing recursion,
+                'auto' uses 'numba' when installed
+                """,
+        )
 
     def configure(self, arguments):
         """Configure algorithm using comand line arguments.
@@ -808,7 +1200,10 @@ class SqDistAlgorithm(Algorithm):
         self.gamma = arguments.sqdist_gamma
         self.m = arguments.sqdist_m
         self.mag = arguments.sqdist_mag
+        self.multichannel = arguments.sqdist_multichannel
         self.statefile = arguments.sqdist_statefile
+        self.statefile_history = arguments.sqdist_statefile_history
         self.zthresh = arguments.sqdist_zthresh
         self.smooth = arguments.sqdist_smooth
+        self.engine = arguments.sqdist_engine
         self.load_state()
@@ -0,0 +1,167 @@
+"""Persistent storage for algorithm state."""
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+# version of the ".npz" state format
+STATE_VERSION = 1
+# array in ".npz" files holding version and non-array values
+HEADER_KEY = "__state__"
+# ".npz" files are zip archives
+NPZ_MAGIC = b"PK\x03\x04"
+
+
+class StateStore(object):
+    """Load and save algorithm state.
+
+    State is a dictionary. Files ending with ".npz" are saved in NumPy
+    binary format, with numpy.ndarray values stored as arrays and other
+    values in a JSON header. Other files are saved as JSON.
+    Either format is loaded from any file.
+
+    Files are written atomically, to a temporary file that is renamed over
+    the previous state, so a crash while saving never corrupts state.
+
+    Parameters
+    ----------
+    filename: str
+        path to state file.
+    history: int
+        number of previous snapshots to retain, as filename.1 (most recent)
+        through filename.<history>.
+    """
+
+    def __init__(self, filename, history=0):
+        self.filename = filename
+        self.history = history
+        self.binary = filename.endswith(".npz")
+
+    def get_filenames(self):
+        """Get state and snapshot filenames.
+
+        Returns
+        -------
+        list of str
+            state filename, followed by snapshot filenames newest to oldest.
+        """
+        return [self.filename] + [
+            "{}.{}".format(self.filename, i) for i in range(1, self.history + 1)
+        ]
+
+    def load(self):
+        """Load state.
+
+        When the state file cannot be read, snapshots are tried newest to
+        oldest.
+
+        Returns
+        -------
+        dict
+            saved state.
+
+        Raises
+        ------
+        FileNotFoundError
+            if state file and snapshots do not exist.
+        Exception
+            if state file and snapshots cannot be read.
+        """
+        error = None
+        for filename in self.get_filenames():
+            if not os.path.exists(filename):
+                continue
+            try:
+                with open(filename, "rb") as f:
+                    return self._decode(f)
+            except Exception as e:
+                error = e
+        if error is None:
+            raise FileNotFoundError("State file not found: " + self.filename)
+        raise error
+
+    def save(self, data):
+        """Save state.
+
+        When history is configured, the previous state is retained as a
+        snapshot.
+
+        Parameters
+        ----------
+        data: dict
+            state to save.
+        """
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        fd, temp = tempfile.mkstemp(
+            dir=directory, prefix="." + os.path.basename(self.filename), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self._encode(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates private files, use permissions of a new file
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp, 0o666 & ~umask)
+            self._rotate()
+            os.replace(temp, self.filename)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    def _rotate(self):
+        """Shift snapshots, and copy current state to newest snapshot."""
+        if self.history <= 0 or not os.path.exists(self.filename):
+            return
+        filenames = self.get_filenames()
+        for i in range(self.history - 1, 0, -1):
+            if os.path.exists(filenames[i]):
+                os.replace(filenames[i], filenames[i + 1])
+        shutil.copyfile(self.filename, filenames[1])
+
+    def _decode(self, f):
+        # detect format from content, so snapshots are read correctly
+        is_npz = f.read(len(NPZ_MAGIC)) == NPZ_MAGIC
+        f.seek(0)
+        if not is_npz:
+            return json.loads(f.read().decode("utf-8"))
+        with np.load(f, allow_pickle=False) as npz:
+            header = json.loads(str(npz[HEADER_KEY]))
+            if header["version"] > STATE_VERSION:
+                raise ValueError(
+                    "Unsupported state version {}".format(header["version"])
+                )
+            data = header["values"]
+            for key in npz.files:
+                if key != HEADER_KEY:
+                    data[key] = npz[key]
+        return data
+
+    def _encode(self, data, f):
+        if not self.binary:
+            f.write(json.dumps(data, default=_json_default).encode("utf-8"))
+            return
+        arrays = {}
+        values = {}
+        for key, value in data.items():
+            if isinstance(value, np.ndarray):
+                arrays[key] = value
+            else:
+                values[key] = value
+        header = {"version": STATE_VERSION, "values": values}
+        arrays[HEADER_KEY] = np.array(json.dumps(header, default=_json_default))
+        np.savez(f, **arrays)
+
+
+def _json_default(value):
+    """Convert numpy values for JSON encoding."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Cannot encode {} as JSON".format(type(value)))
@@ -6,6 +6,7 @@ from __future__ import absolute_import
 # base classes
 from .Algorithm import Algorithm
 from .AlgorithmException import AlgorithmException
+from .StateStore import StateStore
 
 # algorithms
 from .AdjustedAlgorithm import AdjustedAlgorithm
@@ -34,6 +35,7 @@ __all__ = [
     # base classes
     "Algorithm",
     "AlgorithmException",
+    "StateStore",
     # algorithms
     "AdjustedAlgorithm",
     "AverageAlgorithm",
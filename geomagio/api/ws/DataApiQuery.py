@@ -12,9 +12,17 @@ from .Observatory import OBSERVATORY_INDEX
 
 DEFAULT_ELEMENTS = ["X", "Y", "Z", "F"]
 REQUEST_LIMIT = 345600
+# samples read by requests with max_points, 30 days of 4 second elements
+DECIMATE_REQUEST_LIMIT = 30 * 86400 * 4
 VALID_ELEMENTS = [e.id for e in ELEMENTS]
 
 
+class DecimateMethod(str, enum.Enum):
+    LTTB = "lttb"
+    MEAN = "mean"
+    MINMAX = "minmax"
+
+
 class DataType(str, enum.Enum):
     VARIATION = "variation"
     ADJUSTED = "adjusted"
@@ -27,6 +35,7 @@ class DataType(str, enum.Enum):
 
 
 class OutputFormat(str, enum.Enum):
+    BINARY = "binary"
     IAGA2002 = "iaga2002"
     JSON = "json"
 
@@ -47,6 +56,8 @@ class DataApiQuery(BaseModel):
     sampling_period: SamplingPeriod = SamplingPeriod.MINUTE
     data_type: Union[DataType, str] = DataType.VARIATION
     format: OutputFormat = OutputFormat.IAGA2002
+    max_points: Optional[int] = None
+    decimate: DecimateMethod = DecimateMethod.MINMAX
 
     @validator("data_type")
     def validate_data_type(
@@ -73,6 +84,12 @@ class DataApiQuery(BaseModel):
                 )
         return elements
 
+    @validator("max_points")
+    def validate_max_points(cls, max_points: Optional[int]) -> Optional[int]:
+        if max_points is not None and max_points < 2:
+            raise ValueError("max_points must be at least 2.")
+        return max_points
+
     @validator("id")
     def validate_id(cls, id: str) -> str:
         if id not in OBSERVATORY_INDEX:
@@ -106,12 +123,13 @@ class DataApiQuery(BaseModel):
 
     @root_validator
     def validate_combinations(cls, values):
-        starttime, endtime, elements, format, sampling_period = (
+        starttime, endtime, elements, format, sampling_period, max_points = (
             values.get("starttime"),
             values.get("endtime"),
             values.get("elements"),
             values.get("format"),
             values.get("sampling_period"),
+            values.get("max_points"),
         )
         if len(elements) > 4 and format == "iaga2002":
             raise ValueError("No more than four elements allowed for iaga2002 format.")
@@ -119,7 +137,78 @@ class DataApiQuery(BaseModel):
             raise ValueError("Starttime must be before endtime.")
         # check data volume
         samples = int(len(elements) * (endtime - starttime) / sampling_period)
-        if samples > REQUEST_LIMIT:
-            raise ValueError(f"Request exceeds limit ({samples} > {REQUEST_LIMIT})")
+        validate_request_limit(samples, len(elements), max_points)
         # otherwise okay
         return values
+
+
+class BatchDataApiQuery(DataApiQuery):
+    """Query for multiple observatories.
+
+    REQUEST_LIMIT applies to the total number of samples for all
+    observatories.
+    """
+
+    id: List[str]
+    format: OutputFormat = OutputFormat.JSON
+
+    @validator("id", pre=True)
+    def validate_id(cls, id: List[str]) -> List[str]:
+        if isinstance(id, str):
+            id = [id]
+        if len(id) == 1 and "," in id[0]:
+            id = [i.strip() for i in id[0].split(",")]
+        for i in id:
+            DataApiQuery.validate_id(i)
+        # ignore duplicates, keeping request order
+        return list(dict.fromkeys(id))
+
+    @root_validator
+    def validate_batch(cls, values):
+        ids, starttime, endtime, elements, format, sampling_period = (
+            values.get("id"),
+            values.get("starttime"),
+            values.get("endtime"),
+            values.get("elements"),
+            values.get("format"),
+            values.get("sampling_period"),
+        )
+        if ids is None or starttime is None or endtime is None:
+            # other validation failed
+            return values
+        if format == OutputFormat.IAGA2002:
+            raise ValueError("iaga2002 format is not supported for batch requests.")
+        samples = int(
+            len(ids) * len(elements) * (endtime - starttime) / sampling_period
+        )
+        validate_request_limit(
+            samples, len(ids) * len(elements), values.get("max_points")
+        )
+        return values
+
+
+def validate_request_limit(samples: int, traces: int, max_points: Optional[int]):
+    """Check the number of samples read, and returned, by a request.
+
+    Requests with max_points may read up to DECIMATE_REQUEST_LIMIT samples,
+    and return up to REQUEST_LIMIT samples after reducing each trace.
+
+    Parameters
+    ----------
+    samples: number of samples read
+    traces: number of traces returned
+    max_points: maximum number of samples in each returned trace
+
+    Raises
+    ------
+    ValueError
+        when a limit is exceeded
+    """
+    if max_points:
+        if samples > DECIMATE_REQUEST_LIMIT:
+            raise ValueError(
+                f"Request exceeds limit ({samples} > {DECIMATE_REQUEST_LIMIT})"
+            )
+        samples = min(samples, traces * max_points)
+    if samples > REQUEST_LIMIT:
+        raise ValueError(f"Request exceeds limit ({samples} > {REQUEST_LIMIT})")
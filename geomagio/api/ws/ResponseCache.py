@@ -0,0 +1,149 @@
+import asyncio
+from collections import OrderedDict
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from obspy import UTCDateTime
+
+
+# (seconds endtime is before now, seconds to cache response)
+# responses for older data are cached longer, since it changes less often
+DEFAULT_TTLS = [(3600, 30), (86400, 300), (30 * 86400, 3600)]
+# seconds to cache responses for data older than DEFAULT_TTLS
+DEFAULT_MAX_TTL = 86400
+
+
+def get_ttl(
+    endtime: UTCDateTime,
+    now: UTCDateTime = None,
+    ttls: List[Tuple[float, float]] = DEFAULT_TTLS,
+    max_ttl: float = DEFAULT_MAX_TTL,
+) -> float:
+    """Get number of seconds to cache a response.
+
+    Parameters
+    ----------
+    endtime: time of last requested data
+    now: current time, default UTCDateTime()
+    ttls: sorted list of (age, ttl), responses with endtime less than
+        age seconds before now are cached for ttl seconds
+    max_ttl: seconds to cache responses older than all ttls
+    """
+    age = (now or UTCDateTime()) - endtime
+    for max_age, ttl in ttls:
+        if age < max_age:
+            return ttl
+    return max_ttl
+
+
+class ResponseCache(object):
+    """In-process cache of formatted response bodies.
+
+    Entries expire after a time-to-live, and least recently used entries
+    are removed when the cache exceeds max_size. Concurrent requests for
+    the same key share one call to create.
+
+    Must be used from one event loop.
+
+    Parameters
+    ----------
+    max_size: maximum number of bytes of response bodies to keep
+    """
+
+    def __init__(self, max_size: int = 64 * 1024 * 1024):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    def get(
+        self,
+        key: Hashable,
+        ttl: float,
+        create: Callable[[], Awaitable[bytes]],
+    ) -> "asyncio.Future[bytes]":
+        """Get a cached response body, or create it.
+
+        Parameters
+        ----------
+        key: normalized request
+        ttl: seconds to cache a created response body
+        create: called to create response body when it is not cached,
+            or being created by another request
+
+        Returns
+        -------
+        future for response body.
+        waiters should use asyncio.shield(), so a waiter that stops waiting
+        does not cancel creating the body for other waiters.
+        """
+        body = self._get_entry(key)
+        if body is not None:
+            self.hits += 1
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(body)
+            return future
+        task = self._pending.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._create(key, ttl, create))
+            self._pending[key] = task
+        else:
+            self.coalesced += 1
+        return task
+
+    def get_metrics(self) -> Dict:
+        """Get cache statistics."""
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "pending": len(self._pending),
+        }
+
+    async def _create(
+        self, key: Hashable, ttl: float, create: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        try:
+            body = await create()
+        finally:
+            del self._pending[key]
+        if ttl > 0:
+            self._set_entry(key, body, ttl)
+        return body
+
+    def _get_entry(self, key: Hashable) -> bytes:
+        """Get unexpired body, and mark it most recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        body, expires = entry
+        if expires <= time.monotonic():
+            self._remove_entry(key)
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+    def _set_entry(self, key: Hashable, body: bytes, ttl: float):
+        """Store body, removing least recently used entries."""
+        if len(body) > self.max_size:
+            return
+        if key in self._entries:
+            self._remove_entry(key)
+        self._entries[key] = (body, time.monotonic() + ttl)
+        self.size += len(body)
+        while self.size > self.max_size:
+            self._remove_entry(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove_entry(self, key: Hashable):
+        body, _ = self._entries.pop(key)
+        self.size -= len(body)
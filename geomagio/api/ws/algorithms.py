@@ -1,27 +1,32 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from obspy import Stream
 from starlette.responses import Response
 
 from ... import TimeseriesFactory
 from ...algorithm import DbDtAlgorithm
 from .DataApiQuery import DataApiQuery
-from .data import format_timeseries, get_data_factory, get_data_query, get_timeseries
+from .data import get_data_factory, get_data_query, get_data_response, get_timeseries
 
 
 router = APIRouter()
 
 
-@router.get("/algorithms/dbdt/")
-def get_dbdt(
-    query: DataApiQuery = Depends(get_data_query),
-    data_factory: TimeseriesFactory = Depends(get_data_factory),
-) -> Response:
+def get_dbdt_timeseries(data_factory: TimeseriesFactory, query: DataApiQuery) -> Stream:
+    """Read data, and run dbdt."""
     dbdt = DbDtAlgorithm()
     # read data
     raw = get_timeseries(data_factory, query)
     # run dbdt
-    timeseries = dbdt.process(raw)
+    return dbdt.process(raw)
+
+
+@router.get("/algorithms/dbdt/")
+async def get_dbdt(
+    request: Request,
+    query: DataApiQuery = Depends(get_data_query),
+    data_factory: TimeseriesFactory = Depends(get_data_factory),
+) -> Response:
     elements = [f"{element}_DT" for element in query.elements]
-    # output response
-    return format_timeseries(
-        timeseries=timeseries, format=query.format, elements=elements
+    return await get_data_response(
+        request, query, elements, get_dbdt_timeseries, data_factory, query
     )
@@ -1,9 +1,11 @@
+import asyncio
 import os
 
 from fastapi import FastAPI, Request, Response
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from obspy import UTCDateTime
+from starlette.requests import ClientDisconnect
 
 from . import algorithms, data, elements, metadata, observatories
 
@@ -16,6 +18,7 @@ ERROR_CODE_MESSAGES = {
     500: "Internal Server Error",
     501: "Not Implemented",
     503: "Service Unavailable",
+    504: "Gateway Timeout",
 }
 
 METADATA_ENDPOINT = bool(os.getenv("METADATA_ENDPOINT", False))
@@ -61,6 +64,24 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return format_error(400, str(exc), data_format, request)
 
 
+@app.exception_handler(asyncio.TimeoutError)
+async def timeout_exception_handler(request: Request, exc: asyncio.TimeoutError):
+    """Data that is not available in time is a gateway timeout."""
+    data_format = (
+        "format" in request.query_params
+        and str(request.query_params["format"])
+        or "text"
+    )
+    return format_error(504, str(exc), data_format, request)
+
+
+@app.exception_handler(ClientDisconnect)
+async def disconnect_exception_handler(request: Request, exc: ClientDisconnect):
+    """Client is no longer waiting for a response."""
+    # nginx convention for "client closed request"
+    return Response(status_code=499)
+
+
 @app.exception_handler(Exception)
 async def server_exception_handler(request: Request, exc: Exception):
     """Other exceptions are server errors."""
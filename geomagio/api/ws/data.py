@@ -1,21 +1,134 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
 import os
-from typing import Any, Dict, List, Union
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from obspy import UTCDateTime, Stream
-from starlette.responses import Response
+from starlette.requests import ClientDisconnect
+from starlette.responses import Response, StreamingResponse
 
 from ... import TimeseriesFactory, TimeseriesUtility
-from ...edge import EdgeFactory
+from ...AggregateFactory import AggregateFactory
+from ...binary import BinaryWriter
+from ...edge import EdgeFactory, WaveformCache
 from ...iaga2002 import IAGA2002Writer
 from ...imfjson import IMFJSONWriter
 from .DataApiQuery import (
     DEFAULT_ELEMENTS,
+    BatchDataApiQuery,
     DataApiQuery,
     DataType,
+    DecimateMethod,
     OutputFormat,
     SamplingPeriod,
 )
+from .ResponseCache import ResponseCache, get_ttl
+
+
+def get_data_cache() -> Optional[WaveformCache]:
+    """Reads environment variables to configure the data cache
+
+    Returns
+    -------
+    data_cache
+        cache shared by data factories, or None when DATA_CACHE_SIZE
+        (megabytes) is not set
+    """
+    cache_size = float(os.getenv("DATA_CACHE_SIZE", "0"))
+    if cache_size <= 0:
+        return None
+    return WaveformCache(
+        max_size=int(cache_size * 1024 * 1024),
+        directory=os.getenv("DATA_CACHE_DIRECTORY"),
+        immutable_age=float(os.getenv("DATA_CACHE_AGE", "86400")),
+    )
+
+
+DATA_CACHE = get_data_cache()
+
+
+def get_aggregate_cache() -> Optional[WaveformCache]:
+    """Reads environment variables to configure the aggregate cache
+
+    Returns
+    -------
+    aggregate_cache
+        store for hour and day aggregates of minute data, or None when
+        AGGREGATE_CACHE_SIZE (megabytes) is not set
+    """
+    cache_size = float(os.getenv("AGGREGATE_CACHE_SIZE", "0"))
+    if cache_size <= 0:
+        return None
+    return WaveformCache(
+        max_size=int(cache_size * 1024 * 1024),
+        directory=os.getenv("AGGREGATE_CACHE_DIRECTORY"),
+        # one day longer than DATA_CACHE_AGE, so incomplete days are not kept
+        immutable_age=float(os.getenv("AGGREGATE_CACHE_AGE", "172800")),
+    )
+
+
+AGGREGATE_CACHE = get_aggregate_cache()
+
+
+def get_data_executor() -> ThreadPoolExecutor:
+    """Reads environment variables to configure the data executor
+
+    Returns
+    -------
+    data_executor
+        executor for blocking data reads, with DATA_WORKERS threads
+        (default 16)
+    """
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("DATA_WORKERS", "16")),
+        thread_name_prefix="data",
+    )
+
+
+DATA_EXECUTOR = get_data_executor()
+# seconds to wait for blocking data reads, 0 to wait forever
+DATA_TIMEOUT = float(os.getenv("DATA_TIMEOUT", "60"))
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Reads environment variables to configure the response cache
+
+    Returns
+    -------
+    response_cache
+        cache of formatted responses, or None when RESPONSE_CACHE_SIZE
+        (megabytes) is not set
+    """
+    cache_size = float(os.getenv("RESPONSE_CACHE_SIZE", "0"))
+    if cache_size <= 0:
+        return None
+    return ResponseCache(max_size=int(cache_size * 1024 * 1024))
+
+
+RESPONSE_CACHE = get_response_cache()
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Reads environment variables to configure the batch executor
+
+    Returns
+    -------
+    batch_executor
+        executor for observatories read by batch requests,
+        with BATCH_WORKERS threads (default 8), shared by all requests
+    """
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("BATCH_WORKERS", "8")),
+        thread_name_prefix="batch",
+    )
+
+
+# separate from DATA_EXECUTOR, where batch requests wait for observatories
+BATCH_EXECUTOR = get_batch_executor()
+# responses with more samples are streamed, and not cached
+RESPONSE_CACHE_MAX_SAMPLES = int(os.getenv("RESPONSE_CACHE_MAX_SAMPLES", "86400"))
 
 
 def get_data_factory() -> TimeseriesFactory:
@@ -24,15 +137,20 @@ def get_data_factory() -> TimeseriesFactory:
     Returns
     -------
     data_factory
-        Edge or miniseed factory object
+        Edge or miniseed factory object.
+        when AGGREGATE_CACHE is configured, hour and day data are
+        averaged from minute data.
     """
     data_type = os.getenv("DATA_TYPE", "edge")
     data_host = os.getenv("DATA_HOST", "cwbpub.cr.usgs.gov")
     data_port = int(os.getenv("DATA_PORT", "2060"))
     if data_type == "edge":
-        return EdgeFactory(host=data_host, port=data_port)
+        factory = EdgeFactory(host=data_host, port=data_port, cache=DATA_CACHE)
     else:
         return None
+    if AGGREGATE_CACHE is not None:
+        return AggregateFactory(factory, cache=AGGREGATE_CACHE)
+    return factory
 
 
 def get_data_query(
@@ -66,6 +184,15 @@ def get_data_query(
         " For example: R0 is 'internet variation'",
     ),
     format: OutputFormat = Query(OutputFormat.IAGA2002),
+    max_points: int = Query(
+        None,
+        title="Maximum points",
+        description="Reduce each element to at most this many values.",
+    ),
+    decimate: DecimateMethod = Query(
+        DecimateMethod.MINMAX,
+        description="Method used to reduce elements when max_points is set.",
+    ),
 ) -> DataApiQuery:
     """Define query parameters used for webservice requests.
 
@@ -89,6 +216,10 @@ def get_data_query(
         data processing level
     format
         output format
+    max_points
+        maximum number of values for each element
+    decimate
+        method used to reduce elements with more than max_points values
     """
     # parse query
     query = DataApiQuery(
@@ -99,15 +230,75 @@ def get_data_query(
         sampling_period=sampling_period,
         data_type=data_type,
         format=format,
+        max_points=max_points,
+        decimate=decimate,
     )
     return query
 
 
+def get_batch_data_query(
+    id: List[str] = Query(
+        ...,
+        title="Observatory codes",
+        description="Either comma separated list of observatories,"
+        " or repeated query parameter",
+    ),
+    starttime: UTCDateTime = Query(None, title="Start Time"),
+    endtime: UTCDateTime = Query(None, title="End Time"),
+    elements: List[str] = Query(DEFAULT_ELEMENTS, title="Geomagnetic Elements."),
+    sampling_period: Union[SamplingPeriod, float] = Query(
+        SamplingPeriod.MINUTE, title="data rate"
+    ),
+    data_type: Union[DataType, str] = Query(DataType.ADJUSTED, alias="type"),
+    format: OutputFormat = Query(
+        OutputFormat.JSON, description="json or binary, iaga2002 is not supported."
+    ),
+    max_points: int = Query(None, title="Maximum points"),
+    decimate: DecimateMethod = Query(DecimateMethod.MINMAX),
+) -> BatchDataApiQuery:
+    """Define query parameters used for batch webservice requests.
+
+    Parameters are the same as get_data_query, except id is a list.
+    """
+    return BatchDataApiQuery(
+        id=id,
+        starttime=starttime,
+        endtime=endtime,
+        elements=elements,
+        sampling_period=sampling_period,
+        data_type=data_type,
+        format=format,
+        max_points=max_points,
+        decimate=decimate,
+    )
+
+
+def format_chunks(
+    timeseries: Stream, format: OutputFormat, elements: List[str]
+) -> Iterator[bytes]:
+    """Formats timeseries output, in chunks
+
+    Parameters
+    ----------
+    timeseries: data to format
+    format: output format
+    elements: elements to output
+    """
+    if format == OutputFormat.BINARY:
+        return BinaryWriter().write_chunks(timeseries, elements)
+    if format == OutputFormat.JSON:
+        return IMFJSONWriter().write_chunks(timeseries, elements)
+    return IAGA2002Writer().write_chunks(timeseries, elements)
+
+
 def format_timeseries(
     timeseries: Stream, format: OutputFormat, elements: List[str]
 ) -> Response:
     """Formats timeseries output
 
+    Output is streamed in chunks as it is formatted,
+    instead of formatting the entire response first.
+
     Parameters
     ----------
     timeseries: data to format
@@ -115,13 +306,171 @@ def format_timeseries(
     obspy.core.Stream
         timeseries object with requested data
     """
+    return StreamingResponse(
+        format_chunks(timeseries, format, elements), media_type=get_media_type(format)
+    )
+
+
+async def get_data_response(
+    request: Request,
+    query: DataApiQuery,
+    elements: List[str],
+    function: Callable[..., Stream],
+    *args,
+) -> Response:
+    """Read and format data for a query
+
+    When RESPONSE_CACHE is configured, responses with at most
+    RESPONSE_CACHE_MAX_SAMPLES samples are formatted completely and cached,
+    and concurrent identical requests share one read.
+    Other responses are streamed.
+
+    Parameters
+    ----------
+    request: request being processed
+    query: parameters for the data to read
+    elements: elements to output
+    function: blocking function to read data, called with args
+    """
+    samples = int(
+        len(query.elements) * (query.endtime - query.starttime) / query.sampling_period
+    )
+    if query.max_points:
+        samples = min(samples, len(query.elements) * query.max_points)
+
+    def read_timeseries() -> Stream:
+        return decimate_timeseries(function(*args), query)
+
+    if RESPONSE_CACHE is None or samples > RESPONSE_CACHE_MAX_SAMPLES:
+        timeseries = await run_data_function(request, read_timeseries)
+        return format_timeseries(timeseries, query.format, elements)
+
+    def format_body() -> bytes:
+        timeseries = read_timeseries()
+        return b"".join(format_chunks(timeseries, query.format, elements))
+
+    async def create_body() -> bytes:
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(DATA_EXECUTOR, format_body), DATA_TIMEOUT or None
+        )
+
+    body = RESPONSE_CACHE.get(
+        key=(function.__name__, *get_query_key(query)),
+        ttl=get_ttl(query.endtime),
+        create=create_body,
+    )
+    return Response(
+        await wait_for_request(request, asyncio.shield(body)),
+        media_type=get_media_type(query.format),
+    )
+
+
+def format_batch_chunks(
+    results: List[Tuple[str, Optional[Stream], Optional[str]]],
+    query: BatchDataApiQuery,
+) -> Iterator[bytes]:
+    """Formats batch output, in chunks
+
+    Observatories are formatted in request order. Observatories that could
+    not be read, or formatted, are included as errors.
+
+    json output is a "TimeseriesCollection" with a "timeseries" list of
+    IMF JSON "Timeseries", or "Error" with the observatory iaga_code.
+    binary output is one binary document for each observatory,
+    with an "error" header for errors.
+
+    Parameters
+    ----------
+    results: (observatory, timeseries, error) for each observatory
+    query: batch query
+    """
+    documents = []
+    for id, timeseries, error in results:
+        if error is None:
+            try:
+                # validates channels before output starts
+                documents.append(
+                    format_chunks(timeseries, query.format, query.elements)
+                )
+                continue
+            except Exception as e:
+                error = str(e)
+        if query.format == OutputFormat.BINARY:
+            error_document = BinaryWriter().format_error(
+                id, error, query.starttime, query.sampling_period
+            )
+        else:
+            error_document = json.dumps(
+                {
+                    "type": "Error",
+                    "metadata": {
+                        "intermagnet": {"imo": {"iaga_code": id}},
+                        "status": 500,
+                        "error": error,
+                    },
+                },
+                separators=(",", ":"),
+            ).encode("utf8")
+        documents.append([error_document])
+    return _iter_batch_chunks(documents, query.format)
+
+
+def _iter_batch_chunks(
+    documents: List[Iterator[bytes]], format: OutputFormat
+) -> Iterator[bytes]:
+    if format == OutputFormat.BINARY:
+        for document in documents:
+            yield from document
+        return
+    generated = UTCDateTime().strftime("%Y-%m-%dT%H:%M:%SZ")
+    yield json.dumps(
+        {"type": "TimeseriesCollection", "metadata": {"generated": generated}},
+        separators=(",", ":"),
+    ).encode("utf8")[:-1] + b',"timeseries":['
+    for i, document in enumerate(documents):
+        if i:
+            yield b","
+        yield from document
+    yield b"]}"
+
+
+def get_media_type(format: OutputFormat) -> str:
+    if format == OutputFormat.BINARY:
+        return "application/octet-stream"
     if format == OutputFormat.JSON:
-        data = IMFJSONWriter.format(timeseries, elements)
-        media_type = "application/json"
-    else:
-        data = IAGA2002Writer.format(timeseries, elements)
-        media_type = "text/plain"
-    return Response(data, media_type=media_type)
+        return "application/json"
+    return "text/plain"
+
+
+def get_query_key(query: DataApiQuery) -> Tuple:
+    """Normalized query, for use as a cache key"""
+    return (
+        query.id,
+        query.starttime.isoformat(),
+        query.endtime.isoformat(),
+        tuple(query.elements),
+        float(query.sampling_period),
+        str(getattr(query.data_type, "value", query.data_type)),
+        OutputFormat(query.format).value,
+        query.max_points,
+        DecimateMethod(query.decimate).value,
+    )
+
+
+def decimate_timeseries(timeseries: Stream, query: DataApiQuery) -> Stream:
+    """Reduce traces to query.max_points, when set
+
+    Parameters
+    ----------
+    timeseries: data to reduce
+    query: max_points, and decimate method
+    """
+    if not query.max_points:
+        return timeseries
+    return TimeseriesUtility.decimate_stream(
+        timeseries, query.max_points, DecimateMethod(query.decimate).value
+    )
 
 
 def get_timeseries(data_factory: TimeseriesFactory, query: DataApiQuery) -> Stream:
@@ -144,17 +493,138 @@ def get_timeseries(data_factory: TimeseriesFactory, query: DataApiQuery) -> Stre
     return timeseries
 
 
+def get_batch_timeseries(
+    data_factory: TimeseriesFactory, query: BatchDataApiQuery
+) -> List[Tuple[str, Optional[Stream], Optional[str]]]:
+    """Get timeseries data for multiple observatories
+
+    Observatories are read concurrently, using BATCH_EXECUTOR threads.
+
+    Parameters
+    ----------
+    data_factory: where to read data
+    query: parameters for the data to read
+
+    Returns
+    -------
+    (observatory, timeseries, error) for each observatory, in query order.
+    timeseries is None, and error is a message, when reading fails.
+    """
+
+    def get_observatory_timeseries(id: str):
+        try:
+            timeseries = get_timeseries(data_factory, query.copy(update={"id": id}))
+            timeseries = decimate_timeseries(timeseries, query)
+            return (id, timeseries, None)
+        except Exception as e:
+            return (id, None, str(e) or e.__class__.__name__)
+
+    futures = [BATCH_EXECUTOR.submit(get_observatory_timeseries, id) for id in query.id]
+    return [future.result() for future in futures]
+
+
+async def run_data_function(
+    request: Request, function: Callable, *args, timeout: float = None
+) -> Any:
+    """Run a blocking function using the data executor.
+
+    The event loop is not blocked while function runs, and stops waiting
+    when the timeout expires or the client disconnects. Functions that
+    already started continue in the background until they return, but
+    their results are discarded.
+
+    Parameters
+    ----------
+    request: request being processed
+    function: blocking function to call
+    args: arguments for function
+    timeout: seconds to wait, default DATA_TIMEOUT
+
+    Raises
+    ------
+    asyncio.TimeoutError
+        when function does not return before timeout
+    ClientDisconnect
+        when client disconnects before function returns
+    """
+    loop = asyncio.get_running_loop()
+    result = loop.run_in_executor(DATA_EXECUTOR, function, *args)
+    return await wait_for_request(request, result, timeout=timeout)
+
+
+async def wait_for_request(
+    request: Request, result: "asyncio.Future", timeout: float = None
+) -> Any:
+    """Wait for a result, while the client is still waiting for a response.
+
+    Parameters
+    ----------
+    request: request being processed
+    result: future to wait for, cancelled when no longer needed
+    timeout: seconds to wait, default DATA_TIMEOUT
+
+    Raises
+    ------
+    asyncio.TimeoutError
+        when result is not available before timeout
+    ClientDisconnect
+        when client disconnects before result is available
+    """
+    timeout = DATA_TIMEOUT if timeout is None else timeout
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            [result, disconnect],
+            timeout=timeout or None,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    finally:
+        disconnect.cancel()
+    if result in done:
+        return result.result()
+    result.cancel()
+    if disconnect in done:
+        raise ClientDisconnect()
+    raise asyncio.TimeoutError(f"Data not available after {timeout} seconds")
+
+
+async def _wait_for_disconnect(request: Request):
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
 router = APIRouter()
 
 
 @router.get("/data/")
-def get_data(
+async def get_data(
+    request: Request,
     query: DataApiQuery = Depends(get_data_query),
     data_factory: TimeseriesFactory = Depends(get_data_factory),
 ) -> Response:
-    # read data
-    timeseries = get_timeseries(data_factory, query)
-    # output response
-    return format_timeseries(
-        timeseries=timeseries, format=query.format, elements=query.elements
+    return await get_data_response(
+        request, query, query.elements, get_timeseries, data_factory, query
     )
+
+
+@router.get("/data/batch/")
+async def get_batch_data(
+    request: Request,
+    query: BatchDataApiQuery = Depends(get_batch_data_query),
+    data_factory: TimeseriesFactory = Depends(get_data_factory),
+) -> Response:
+    results = await run_data_function(
+        request, get_batch_timeseries, data_factory, query
+    )
+    return StreamingResponse(
+        format_batch_chunks(results, query), media_type=get_media_type(query.format)
+    )
+
+
+@router.get("/data/cache/", include_in_schema=False)
+async def get_response_cache_metrics() -> Dict:
+    if RESPONSE_CACHE is None:
+        return Response(status_code=404)
+    return RESPONSE_CACHE.get_metrics()
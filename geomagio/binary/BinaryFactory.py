@@ -0,0 +1,103 @@
+"""Factory that loads data from, and writes data to, binary files."""
+from __future__ import absolute_import
+
+import obspy.core
+
+from .. import ChannelConverter, Util
+from ..TimeseriesFactory import TimeseriesFactory
+from .BinaryParser import BinaryParser
+from .BinaryWriter import BinaryWriter
+
+
+class BinaryFactory(TimeseriesFactory):
+    """TimeseriesFactory for binary formatted files.
+
+    Parameters
+    ----------
+    urlTemplate : str
+        A string that contains any of the following replacement patterns:
+        - '%(i)s' : interval abbreviation
+        - '%(interval)s' interval name
+        - '%(obs)s' lowercase observatory code
+        - '%(OBS)s' uppercase observatory code
+        - '%(t)s' type abbreviation
+        - '%(type)s' type name
+        - '%(ymd)s' time formatted as YYYYMMDD
+
+    Attributes
+    ----------
+    errors : dict
+        errors for documents parsed by the last call to parse_string,
+        keys are stations, values are error messages.
+
+    See Also
+    --------
+    BinaryParser
+    BinaryWriter
+    """
+
+    def __init__(self, **kwargs):
+        TimeseriesFactory.__init__(self, **kwargs)
+        self.errors = {}
+
+    def parse_string(self, data, **kwargs):
+        """Parse the contents of a binary file.
+
+        Parameters
+        ----------
+        data : bytes
+            binary formatted data, such as a /ws/data/ response
+            with format=binary.
+
+        Returns
+        -------
+        obspy.core.Stream
+            parsed data, for all documents when documents are concatenated.
+            documents with an error have no channels,
+            and their errors are stored in errors.
+        """
+        stream = obspy.core.Stream()
+        self.errors = {}
+        offset = 0
+        while offset < len(data):
+            parser = BinaryParser()
+            offset = parser.parse(data, offset)
+            if "error" in parser.header:
+                station = parser.header["metadata"].get("station")
+                self.errors[station] = parser.header["error"]
+            stream += self._get_stream(parser)
+        return stream
+
+    def _get_stream(self, parser):
+        """Create traces for one parsed document."""
+        header = parser.header
+        stream = obspy.core.Stream()
+        for channel_stats in header["channels"]:
+            stats = obspy.core.Stats(header["metadata"])
+            stats.update(channel_stats)
+            stats.starttime = obspy.core.UTCDateTime(header["starttime"])
+            stats.delta = header["delta"]
+            data = parser.data[stats.channel]
+            if stats.channel == "D":
+                data = ChannelConverter.get_radians_from_minutes(data)
+            stats.npts = len(data)
+            stream += obspy.core.Trace(data, stats)
+        return stream
+
+    def write_file(self, fh, timeseries, channels):
+        """Write timeseries data to the given file object.
+
+        Parameters
+        ----------
+        fh : writable
+            file handle where data is written.
+        timeseries : obspy.core.Stream
+            stream containing traces to store.
+        channels : list
+            list of channels to store.
+        """
+        BinaryWriter().write(fh, timeseries, channels)
+
+    def _read_url(self, url):
+        """Read binary data from url."""
+        return Util.read_url(url, binary=True)
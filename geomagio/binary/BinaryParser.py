@@ -0,0 +1,103 @@
+"""Parsing methods for the Binary Format.
+
+Files start with MAGIC, followed by the header length as a little-endian
+uint32, and a UTF-8 JSON header. The header is padded with spaces so
+values start on an 8 byte boundary. Values follow as one column for each
+channel, in header order, each with npts values of dtype.
+
+The header contains:
+    version : int
+        format version.
+    starttime : str
+        ISO8601 time of first sample.
+    delta : float
+        seconds between samples.
+    npts : int
+        number of samples in each column.
+    dtype : str
+        numpy dtype of values, "<f8".
+    metadata : dict
+        stats shared by all channels.
+    channels : list of dict
+        stats for each column, including "channel".
+    error : str
+        optional, when data for a station could not be read.
+        channels is empty.
+
+Documents for multiple stations may be concatenated.
+"""
+import json
+import struct
+
+import numpy
+
+from ..TimeseriesFactoryException import TimeseriesFactoryException
+
+
+MAGIC = b"GEOMAGIO"
+VERSION = 1
+# header length, after MAGIC
+HEADER_LENGTH = struct.Struct("<I")
+# values start on multiples of this many bytes
+ALIGNMENT = 8
+
+
+class BinaryParser(object):
+    """Binary format parser.
+
+    Attributes
+    ----------
+    header : dict
+        parsed header.
+    data : dict
+        keys are channel names, in header order.
+        values are ``numpy.array`` of timeseries values, array values are
+        ``numpy.nan`` when values are missing.
+    """
+
+    def __init__(self):
+        self.header = None
+        self.data = {}
+
+    def parse(self, data, offset=0):
+        """Parse bytes containing binary formatted data.
+
+        Parameters
+        ----------
+        data : bytes
+            binary formatted file contents.
+        offset : int
+            index of document to parse, when documents are concatenated.
+
+        Returns
+        -------
+        int
+            index after the parsed document.
+
+        Raises
+        ------
+        TimeseriesFactoryException
+            if data is not binary formatted, or is truncated.
+        """
+        if data[offset : offset + len(MAGIC)] != MAGIC:
+            raise TimeseriesFactoryException("Not binary formatted data")
+        (length,) = HEADER_LENGTH.unpack_from(data, offset + len(MAGIC))
+        offset += len(MAGIC) + HEADER_LENGTH.size
+        self.header = json.loads(bytes(data[offset : offset + length]).decode("utf8"))
+        if self.header["version"] > VERSION:
+            raise TimeseriesFactoryException(
+                "Unsupported binary format version {}".format(self.header["version"])
+            )
+        offset += length
+        dtype = numpy.dtype(self.header["dtype"])
+        npts = self.header["npts"]
+        channels = self.header["channels"]
+        if len(data) < offset + len(channels) * npts * dtype.itemsize:
+            raise TimeseriesFactoryException("Binary formatted data is truncated")
+        self.data = {}
+        for channel in channels:
+            values = numpy.frombuffer(data, dtype=dtype, count=npts, offset=offset)
+            # copy to a writable, native array
+            self.data[channel["channel"]] = values.astype(numpy.float64)
+            offset += npts * dtype.itemsize
+        return offset
@@ -0,0 +1,219 @@
+from io import BytesIO
+import json
+
+import numpy
+
+from .. import ChannelConverter, TimeseriesUtility
+from ..TimeseriesFactoryException import TimeseriesFactoryException
+from .BinaryParser import ALIGNMENT, HEADER_LENGTH, MAGIC, VERSION
+
+# number of values in each chunk
+CHUNK_SIZE = 8192
+# stats copied to header metadata, when set
+METADATA_KEYS = [
+    "network",
+    "station",
+    "station_name",
+    "agency_name",
+    "geodetic_latitude",
+    "geodetic_longitude",
+    "elevation",
+    "sensor_orientation",
+    "sensor_sampling_rate",
+    "data_interval_type",
+    "data_type",
+]
+# stats copied to header channels
+CHANNEL_KEYS = ["network", "station", "location", "channel"]
+
+
+class BinaryWriter(object):
+    """Binary format writer.
+
+    Values are written without copying trace data, when it is already
+    contiguous little-endian float64. Declination is written in minutes,
+    like other output formats.
+    """
+
+    def write(self, out, timeseries, channels):
+        """Write timeseries to binary file.
+
+        Parameters
+        ----------
+        out: file object
+            file object to be written to. could be stdout
+        timeseries: obspy.core.stream
+            timeseries object with data to be written
+        channels: array_like
+            channels to be written from timeseries object
+        """
+        for chunk in self.write_chunks(timeseries, channels):
+            out.write(chunk)
+
+    def write_chunks(self, timeseries, channels, chunk_size=CHUNK_SIZE):
+        """Format timeseries as binary, one chunk at a time.
+
+        Parameters
+        ----------
+        timeseries: obspy.core.stream
+            timeseries object with data to be written
+        channels: array_like
+            channels to be written from timeseries object
+        chunk_size: int
+            number of values in each chunk.
+
+        Returns
+        -------
+        iterator of bytes-like objects
+            header, followed by chunks of values.
+
+        Raises
+        ------
+        TimeseriesFactoryException
+            if there is a missing channel, or channels have different
+            start times, deltas, or lengths, before any output is generated.
+        """
+        for channel in channels:
+            if timeseries.select(channel=channel).count() == 0:
+                raise TimeseriesFactoryException(
+                    'Missing channel "%s" for output, available channels %s'
+                    % (channel, str(TimeseriesUtility.get_channels(timeseries)))
+                )
+        traces = [timeseries.select(channel=c)[0] for c in channels]
+        stats = traces[0].stats
+        for trace in traces:
+            if (
+                trace.stats.starttime != stats.starttime
+                or trace.stats.delta != stats.delta
+                or len(trace.data) != len(traces[0].data)
+            ):
+                raise TimeseriesFactoryException(
+                    "Channels must have the same start time, delta, and length"
+                )
+        columns = [self._get_column(trace) for trace in traces]
+        header = self._format_header(traces)
+        return self._iter_chunks(header, columns, chunk_size)
+
+    def _iter_chunks(self, header, columns, chunk_size):
+        yield header
+        for column in columns:
+            values = memoryview(column)
+            for start in range(0, len(column), chunk_size):
+                yield values[start : start + chunk_size]
+
+    def _format_header(self, traces):
+        """Format magic, header length, and padded header.
+
+        Parameters
+        ----------
+        traces : sequence of obspy.core.Trace
+            traces in output order.
+
+        Returns
+        -------
+        bytes
+            everything before values.
+        """
+        stats = traces[0].stats
+        return self._encode_header(
+            {
+                "version": VERSION,
+                "starttime": stats.starttime.isoformat() + "Z",
+                "delta": stats.delta,
+                "npts": len(traces[0].data),
+                "dtype": "<f8",
+                "metadata": {
+                    key: _json_value(stats[key])
+                    for key in METADATA_KEYS
+                    if key in stats
+                },
+                "channels": [
+                    {key: trace.stats[key] for key in CHANNEL_KEYS} for trace in traces
+                ],
+            }
+        )
+
+    def _encode_header(self, header):
+        """Encode header dictionary, see _format_header."""
+        encoded = json.dumps(header, separators=(",", ":")).encode("utf8")
+        # pad with spaces, so values are aligned
+        prefix = len(MAGIC) + HEADER_LENGTH.size
+        encoded += b" " * (-(prefix + len(encoded)) % ALIGNMENT)
+        return MAGIC + HEADER_LENGTH.pack(len(encoded)) + encoded
+
+    def _get_column(self, trace):
+        """Get trace values as contiguous little-endian float64.
+
+        Returns trace data without copying, when possible.
+        """
+        data = trace.data
+        if numpy.ma.isMaskedArray(data):
+            data = data.filled(numpy.nan)
+        if trace.stats.channel == "D":
+            data = ChannelConverter.get_minutes_from_radians(data)
+        return numpy.ascontiguousarray(data, dtype="<f8")
+
+    def format_error(self, station, error, starttime, delta):
+        """Format a document without values, for a station with an error.
+
+        Used when documents for multiple stations are concatenated,
+        so errors are reported in order with data.
+
+        Parameters
+        ----------
+        station : str
+            station that could not be formatted.
+        error : str
+            error message, stored in header "error".
+        starttime : obspy.core.UTCDateTime
+            requested start time.
+        delta : float
+            requested seconds between samples.
+
+        Returns
+        -------
+        bytes
+            header with no channels, and no values.
+        """
+        return self._encode_header(
+            {
+                "version": VERSION,
+                "starttime": starttime.isoformat() + "Z",
+                "delta": float(delta),
+                "npts": 0,
+                "dtype": "<f8",
+                "metadata": {"station": station},
+                "channels": [],
+                "error": error,
+            }
+        )
+
+    @classmethod
+    def format(self, timeseries, channels):
+        """Get binary formatted bytes.
+
+        Calls write() with a BytesIO, and returns the output.
+
+        Parameters
+        ----------
+        timeseries : obspy.core.Stream
+            stream containing traces with channel listed in channels
+        channels: array_like
+            channels to be written from timeseries
+
+        Returns
+        -------
+        bytes
+            binary formatted data.
+        """
+        out = BytesIO()
+        writer = BinaryWriter()
+        writer.write(out, timeseries, channels)
+        return out.getvalue()
+
+
+def _json_value(value):
+    """Convert numpy values for JSON encoding."""
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
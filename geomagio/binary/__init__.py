@@ -0,0 +1,16 @@
+"""IO Module for Binary Format
+
+Columns of little-endian float64 values, with a JSON header.
+"""
+from __future__ import absolute_import
+
+from .BinaryFactory import BinaryFactory
+from .BinaryParser import BinaryParser
+from .BinaryWriter import BinaryWriter
+
+
+__all__ = [
+    "BinaryFactory",
+    "BinaryParser",
+    "BinaryWriter",
+]
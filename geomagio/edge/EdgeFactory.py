@@ -10,14 +10,13 @@ Edge is the USGS earthquake hazard centers replacement for earthworm.
 """
 from __future__ import absolute_import
 
-import sys
 import numpy
 import numpy.ma
 import obspy.core
 from datetime import datetime
 from obspy.clients import earthworm
 
-from .. import ChannelConverter, TimeseriesUtility
+from .. import ChannelConverter, TimeseriesUtility, Util
 from ..TimeseriesFactory import TimeseriesFactory
 from ..TimeseriesFactoryException import TimeseriesFactoryException
 from ..ObservatoryMetadata import ObservatoryMetadata
@@ -59,6 +58,11 @@ class EdgeFactory(TimeseriesFactory):
     forceout: bool
         Tells edge to forceout a packet to miniseed.  Generally used when
         the user knows no more data is coming.
+    max_workers: int
+        maximum number of channels requested concurrently by get_timeseries.
+        the client opens a connection for each request.
+    cache: WaveformCache
+        optional cache for requested data.
 
     See Also
     --------
@@ -87,6 +91,8 @@ class EdgeFactory(TimeseriesFactory):
         cwbport=0,
         tag="GeomagAlg",
         forceout=False,
+        max_workers=8,
+        cache=None,
     ):
         TimeseriesFactory.__init__(self, observatory, channels, type, interval)
         self.client = earthworm.Client(host, port)
@@ -101,6 +107,8 @@ class EdgeFactory(TimeseriesFactory):
         self.cwbhost = cwbhost or ""
         self.cwbport = cwbport
         self.forceout = forceout
+        self.max_workers = max_workers
+        self.cache = cache
 
     def get_timeseries(
         self,
@@ -150,20 +158,18 @@ class EdgeFactory(TimeseriesFactory):
             )
 
         # obspy factories sometimes write to stdout, instead of stderr
-        original_stdout = sys.stdout
-        try:
-            # send stdout to stderr
-            sys.stdout = sys.stderr
+        with Util.stdout_to_stderr():
             # get the timeseries
             timeseries = obspy.core.Stream()
-            for channel in channels:
-                data = self._get_timeseries(
+            # request channels concurrently, results are in channel order
+            for data in Util.map_concurrent(
+                lambda channel: self._get_timeseries(
                     starttime, endtime, observatory, channel, type, interval
-                )
+                ),
+                channels,
+                max_workers=self.max_workers,
+            ):
                 timeseries += data
-        finally:
-            # restore stdout
-            sys.stdout = original_stdout
         self._post_process(timeseries, starttime, endtime, channels)
 
         return timeseries
@@ -486,13 +492,20 @@ class EdgeFactory(TimeseriesFactory):
         location = self._get_edge_location(observatory, channel, type, interval)
         network = self._get_edge_network(observatory, channel, type, interval)
         edge_channel = self._get_edge_channel(observatory, channel, type, interval)
-        try:
-            data = self.client.get_waveforms(
+        if self.cache:
+            data = self.cache.get_waveforms(
+                self._get_waveforms,
+                network,
+                station,
+                location,
+                edge_channel,
+                starttime,
+                endtime,
+            )
+        else:
+            data = self._get_waveforms(
                 network, station, location, edge_channel, starttime, endtime
             )
-        except TypeError:
-            # get_waveforms() fails if no data is returned from Edge
-            data = obspy.core.Stream()
 
         # make sure data is 32bit int
         for trace in data:
@@ -513,6 +526,22 @@ class EdgeFactory(TimeseriesFactory):
         self._set_metadata(data, observatory, channel, type, interval)
         return data
 
+    def _get_waveforms(self, network, station, location, channel, starttime, endtime):
+        """Request waveforms from client.
+
+        Returns
+        -------
+        obspy.core.Stream
+            requested data, empty when Edge has no data.
+        """
+        try:
+            return self.client.get_waveforms(
+                network, station, location, channel, starttime, endtime
+            )
+        except TypeError:
+            # get_waveforms() fails if no data is returned from Edge
+            return obspy.core.Stream()
+
     def _post_process(self, timeseries, starttime, endtime, channels):
         """Post process a timeseries stream after the raw data is
                 is fetched from a waveserver. Specifically changes
@@ -10,14 +10,13 @@ Edge is the USGS earthquake hazard centers replacement for earthworm.
 """
 from __future__ import absolute_import
 
-import sys
 import numpy
 import numpy.ma
 
 import obspy.core
 from obspy.clients.neic import client as miniseed
 
-from .. import ChannelConverter, TimeseriesUtility
+from .. import ChannelConverter, TimeseriesUtility, Util
 from ..Metadata import get_instrument
 from ..TimeseriesFactory import TimeseriesFactory
 from ..TimeseriesFactoryException import TimeseriesFactoryException
@@ -50,6 +49,13 @@ class MiniSeedFactory(TimeseriesFactory):
     locationCode: str
         the location code for the given edge server, overrides type
         in get_timeseries/put_timeseries
+    convert_channels: array
+        channels calculated from multiple component channels.
+    max_workers: int
+        maximum number of channels requested concurrently by get_timeseries.
+        the client opens a connection for each request.
+    cache: WaveformCache
+        optional cache for requested data.
 
     See Also
     --------
@@ -75,6 +81,8 @@ class MiniSeedFactory(TimeseriesFactory):
         observatoryMetadata=None,
         locationCode=None,
         convert_channels=None,
+        max_workers=8,
+        cache=None,
     ):
         TimeseriesFactory.__init__(self, observatory, channels, type, interval)
 
@@ -86,6 +94,8 @@ class MiniSeedFactory(TimeseriesFactory):
         self.port = port
         self.write_port = write_port
         self.convert_channels = convert_channels or []
+        self.max_workers = max_workers
+        self.cache = cache
         self.write_client = MiniSeedInputClient(self.host, self.write_port)
 
     def get_timeseries(
@@ -136,25 +146,42 @@ class MiniSeedFactory(TimeseriesFactory):
             )
 
         # obspy factories sometimes write to stdout, instead of stderr
-        original_stdout = sys.stdout
-        try:
-            # send stdout to stderr
-            sys.stdout = sys.stderr
-            # get the timeseries
+        with Util.stdout_to_stderr():
+            # (start, end, components) for each channel,
+            # components is None for channels that are not converted
+            channel_parts = [
+                self._get_channel_parts(starttime, endtime, observatory, channel)
+                for channel in channels
+            ]
+            requests = [
+                (start, end, channel)
+                if components is None
+                else (start, end, component["channel"])
+                for channel, parts in zip(channels, channel_parts)
+                for start, end, components in parts
+                for component in (components or [None])
+            ]
+            # one pool for all requests, including converted channel components,
+            # results are in request order
+            results = iter(
+                Util.map_concurrent(
+                    lambda request: self._get_timeseries(
+                        request[0], request[1], observatory, request[2], type, interval
+                    ),
+                    requests,
+                    max_workers=self.max_workers,
+                )
+            )
             timeseries = obspy.core.Stream()
-            for channel in channels:
-                if channel in self.convert_channels:
-                    data = self._convert_timeseries(
-                        starttime, endtime, observatory, channel, type, interval
+            for channel, parts in zip(channels, channel_parts):
+                for start, end, components in parts:
+                    if components is None:
+                        timeseries += next(results)
+                        continue
+                    component_data = [next(results)[0] for component in components]
+                    timeseries += self._calculate_timeseries(
+                        channel, components, component_data
                     )
-                else:
-                    data = self._get_timeseries(
-                        starttime, endtime, observatory, channel, type, interval
-                    )
-                timeseries += data
-        finally:
-            # restore stdout
-            sys.stdout = original_stdout
 
         self._post_process(timeseries, starttime, endtime, channels)
         return timeseries
@@ -238,6 +265,33 @@ class MiniSeedFactory(TimeseriesFactory):
                 offset: float
                 scale: float
 
+        Returns
+        -------
+        obspy.core.trace
+            timeseries trace of the converted channel data
+        """
+        # load components concurrently
+        component_data = Util.map_concurrent(
+            lambda component: self._get_timeseries(
+                starttime, endtime, observatory, component["channel"], type, interval
+            )[0],
+            components,
+            max_workers=self.max_workers,
+        )
+        return self._calculate_timeseries(channel, components, component_data)
+
+    def _calculate_timeseries(self, channel, components, component_data):
+        """Sum scaled and offset component data.
+
+        Parameters
+        ----------
+        channel : str
+            single character channel {H, E, D, Z, F}
+        components: list
+            components, as described in get_calculated_timeseries.
+        component_data: list of obspy.core.Trace
+            data for each component.
+
         Returns
         -------
         obspy.core.trace
@@ -246,11 +300,7 @@ class MiniSeedFactory(TimeseriesFactory):
         # sum channels
         stats = None
         converted = None
-        for component in components:
-            # load component
-            data = self._get_timeseries(
-                starttime, endtime, observatory, component["channel"], type, interval
-            )[0]
+        for component, data in zip(components, component_data):
             # convert to nT
             nt = data.data * component["scale"] + component["offset"]
             # add to converted
@@ -276,6 +326,29 @@ class MiniSeedFactory(TimeseriesFactory):
         out.data = converted
         return out
 
+    def _get_channel_parts(self, starttime, endtime, observatory, channel):
+        """Get requests needed for a single channel, converting if needed.
+
+        Parameters
+        ----------
+        starttime: obspy.core.UTCDateTime
+            the starttime of the requested data
+        endtime: obspy.core.UTCDateTime
+            the endtime of the requested data
+        observatory : str
+            observatory code
+        channel : str
+            single character channel {H, E, D, Z, F}
+
+        Returns
+        -------
+        list of (start, end, components)
+            components is None when channel is read without conversion.
+        """
+        if channel in self.convert_channels:
+            return self._get_conversion_parts(starttime, endtime, observatory, channel)
+        return [(starttime, endtime, None)]
+
     def _convert_stream_to_masked(self, timeseries, channel):
         """convert geomag edge traces in a timeseries stream to a MaskedArray
             This allows for gaps and splitting.
@@ -528,9 +601,20 @@ class MiniSeedFactory(TimeseriesFactory):
         location = self._get_edge_location(observatory, channel, type, interval)
         network = self._get_edge_network(observatory, channel, type, interval)
         edge_channel = self._get_edge_channel(observatory, channel, type, interval)
-        data = self.client.get_waveforms(
-            network, station, location, edge_channel, starttime, endtime
-        )
+        if self.cache:
+            data = self.cache.get_waveforms(
+                self.client.get_waveforms,
+                network,
+                station,
+                location,
+                edge_channel,
+                starttime,
+                endtime,
+            )
+        else:
+            data = self.client.get_waveforms(
+                network, station, location, edge_channel, starttime, endtime
+            )
         data.merge()
         if data.count() == 0:
             data += TimeseriesUtility.create_empty_trace(
@@ -547,13 +631,8 @@ class MiniSeedFactory(TimeseriesFactory):
         self._set_metadata(data, observatory, channel, type, interval)
         return data
 
-    def _convert_timeseries(
-        self, starttime, endtime, observatory, channel, type, interval
-    ):
-        """Generate a single channel using multiple components.
-
-        Finds metadata, then calls _get_converted_timeseries for actual
-        conversion.
+    def _get_conversion_parts(self, starttime, endtime, observatory, channel):
+        """Find components used to generate a single channel.
 
         Parameters
         ----------
@@ -565,17 +644,14 @@ class MiniSeedFactory(TimeseriesFactory):
             observatory code
         channel : str
             single character channel {H, E, D, Z, F}
-        type : str
-            data type {definitive, quasi-definitive, variation}
-        interval : str
-            interval length {'day', 'hour', 'minute', 'second', 'tenhertz'}
 
         Returns
         -------
-        obspy.core.trace
-            timeseries trace of the requested channel data
+        list of (start, end, components)
+            components for each instrument configuration in the request,
+            as described in get_calculated_timeseries.
         """
-        out = obspy.core.Stream()
+        parts = []
         metadata = get_instrument(observatory, starttime, endtime)
         # loop in case request spans different configurations
         for entry in metadata:
@@ -597,17 +673,8 @@ class MiniSeedFactory(TimeseriesFactory):
                 if entry_endtime is None or entry_endtime > endtime
                 else entry_endtime
             )
-            # now convert
-            out += self.get_calculated_timeseries(
-                start,
-                end,
-                observatory,
-                channel,
-                type,
-                interval,
-                instrument_channels[channel],
-            )
-        return out
+            parts.append((start, end, instrument_channels[channel]))
+        return parts
 
     def _post_process(self, timeseries, starttime, endtime, channels):
         """Post process a timeseries stream after the raw data is
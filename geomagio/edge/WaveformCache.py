@@ -0,0 +1,325 @@
+"""Read-through cache for Edge and MiniSeed waveform requests."""
+from collections import OrderedDict
+import json
+import os
+import tempfile
+import threading
+
+import numpy
+import obspy.core
+from obspy.core import UTCDateTime
+
+
+class WaveformCache(object):
+    """Cache waveforms returned by Edge or MiniSeed clients.
+
+    Data is cached for each network, station, location, and channel, along
+    with the time ranges that have been requested, so gaps within requested
+    data are cached too. Requests that return no data, or only missing
+    values, are not cached, because data may be added later. Only data
+    older than immutable_age is cached; newer data may still change, and is
+    always requested. When part of a request is cached, only the remainder
+    is requested.
+
+    One cache may be shared by multiple factories and threads.
+
+    Parameters
+    ----------
+    max_size: int
+        maximum number of bytes of data to keep in memory, and on disk.
+        least recently used channels are removed first.
+    directory: str
+        optional directory where cached data is also stored,
+        so it can be reused by other processes.
+    immutable_age: float
+        number of seconds after which data is not expected to change.
+    """
+
+    def __init__(self, max_size=256 * 1024 * 1024, directory=None, immutable_age=86400):
+        self.max_size = max_size
+        self.directory = directory
+        self.immutable_age = immutable_age
+        self._entries = OrderedDict()
+        self._size = 0
+        # bytes of data in directory, None until directory is scanned
+        self._directory_size = None
+        self._lock = threading.Lock()
+
+    def get_waveforms(
+        self, fetch, network, station, location, channel, starttime, endtime
+    ):
+        """Get waveforms, using cached data when available.
+
+        Parameters
+        ----------
+        fetch: callable
+            called with (network, station, location, channel, starttime,
+            endtime) to request data that is not cached.
+            usually a client get_waveforms method.
+        network: str
+            network code
+        station: str
+            station code
+        location: str
+            location code
+        channel: str
+            channel code
+        starttime: obspy.core.UTCDateTime
+            time of first sample
+        endtime: obspy.core.UTCDateTime
+            time of last sample
+
+        Returns
+        -------
+        obspy.core.Stream
+            cached and requested data.
+        """
+        key = (network, station, location, channel)
+        immutable_end = UTCDateTime() - self.immutable_age
+        with self._lock:
+            entry = self._get_entry(key)
+            coverage = list(entry["coverage"]) if entry else []
+            cached = (
+                entry["stream"].slice(starttime, endtime).copy()
+                if entry
+                else obspy.core.Stream()
+            )
+        timeseries = obspy.core.Stream()
+        timeseries += cached
+        for start, end in get_missing_intervals(starttime, endtime, coverage):
+            data = fetch(network, station, location, channel, start, end)
+            _normalize_data(data)
+            timeseries += data
+            if start <= immutable_end:
+                self._add(key, start, min(end, immutable_end), data)
+        timeseries.merge()
+        return timeseries
+
+    def clear(self):
+        """Remove all cached data from memory."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _add(self, key, starttime, endtime, data):
+        """Add requested data to cache."""
+        data = data.slice(starttime, endtime).copy()
+        if not _has_data(data):
+            # data may be added later
+            return
+        with self._lock:
+            entry = self._get_entry(key) or {
+                "coverage": [],
+                "stream": obspy.core.Stream(),
+                "size": 0,
+            }
+            entry["coverage"] = merge_intervals(
+                entry["coverage"] + [(starttime, endtime)]
+            )
+            entry["stream"] += data
+            entry["stream"].merge()
+            self._set_entry(key, entry)
+            if self.directory:
+                self._write_entry(key, entry, data)
+
+    def _get_entry(self, key):
+        """Get entry from memory, or disk, and mark it most recently used.
+
+        Must be called while holding the lock.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.directory:
+            entry = self._read_entry(key)
+            if entry is not None:
+                self._set_entry(key, entry)
+        return entry
+
+    def _set_entry(self, key, entry):
+        """Store entry in memory, removing least recently used entries.
+
+        Must be called while holding the lock.
+        """
+        if key in self._entries:
+            self._size -= self._entries[key]["size"]
+        entry["size"] = sum(trace.data.nbytes for trace in entry["stream"])
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._size += entry["size"]
+        while self._size > self.max_size and self._entries:
+            _, removed = self._entries.popitem(last=False)
+            self._size -= removed["size"]
+
+    def _get_path(self, key, extension):
+        return os.path.join(self.directory, ".".join(key) + extension)
+
+    def _read_entry(self, key):
+        """Read entry from directory, or None if not cached."""
+        coverage_path = self._get_path(key, ".json")
+        data_path = self._get_path(key, ".mseed")
+        try:
+            with open(coverage_path) as f:
+                coverage = [
+                    (UTCDateTime(start), UTCDateTime(end))
+                    for start, end in json.load(f)
+                ]
+            stream = obspy.core.Stream()
+            if os.path.exists(data_path):
+                stream = obspy.core.read(data_path, format="MSEED")
+                # records are appended, and may overlap
+                stream.merge()
+            # mark used, for removing least recently used files
+            os.utime(coverage_path)
+        except Exception:
+            # missing, or incomplete, files are not cached
+            return None
+        return {"coverage": coverage, "stream": stream, "size": 0}
+
+    def _write_entry(self, key, entry, data):
+        """Append data, and write coverage, to directory.
+
+        Removes least recently used files when directory exceeds max_size.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        data_path = self._get_path(key, ".mseed")
+        size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        # miniseed records can be appended, instead of rewriting the file
+        data = obspy.core.Stream([trace for trace in data.split() if len(trace.data)])
+        with open(data_path, "ab") as f:
+            data.write(f, format="MSEED")
+        coverage = [(str(start), str(end)) for start, end in entry["coverage"]]
+        _replace_file(
+            self._get_path(key, ".json"),
+            lambda f: f.write(json.dumps(coverage).encode("utf-8")),
+        )
+        if self._directory_size is not None:
+            self._directory_size += os.path.getsize(data_path) - size
+        if self._directory_size is None or self._directory_size > self.max_size:
+            self._directory_size = self._trim_directory()
+
+    def _trim_directory(self):
+        """Remove least recently used files when directory exceeds max_size.
+
+        Returns
+        -------
+        int
+            bytes of data in directory after files are removed.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            coverage_path = os.path.join(self.directory, name)
+            data_path = coverage_path[: -len(".json")] + ".mseed"
+            try:
+                used = os.path.getmtime(coverage_path)
+                size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+            except OSError:
+                continue
+            entries.append((used, coverage_path, data_path, size))
+            total += size
+        for _, coverage_path, data_path, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            for path in (coverage_path, data_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+        return total
+
+
+def get_missing_intervals(starttime, endtime, coverage):
+    """Get parts of an interval that are not covered.
+
+    Parameters
+    ----------
+    starttime: obspy.core.UTCDateTime
+        start of interval.
+    endtime: obspy.core.UTCDateTime
+        end of interval.
+    coverage: list of (UTCDateTime, UTCDateTime)
+        sorted, non-overlapping covered intervals.
+
+    Returns
+    -------
+    list of (UTCDateTime, UTCDateTime)
+        uncovered intervals. endpoints are inclusive, and may include
+        the first or last covered sample.
+    """
+    missing = []
+    start = starttime
+    for covered_start, covered_end in coverage:
+        if covered_end < start:
+            continue
+        if covered_start > endtime:
+            break
+        if covered_start > start:
+            missing.append((start, covered_start))
+        start = covered_end
+        if start >= endtime:
+            return missing
+    missing.append((start, endtime))
+    return missing
+
+
+def merge_intervals(intervals):
+    """Merge overlapping or adjacent intervals.
+
+    Parameters
+    ----------
+    intervals: list of (UTCDateTime, UTCDateTime)
+        intervals to merge.
+
+    Returns
+    -------
+    list of (UTCDateTime, UTCDateTime)
+        sorted, non-overlapping intervals.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _has_data(stream):
+    """Whether stream has any values that are not missing."""
+    for trace in stream:
+        data = trace.data
+        if numpy.ma.isMaskedArray(data):
+            data = data.compressed()
+        if data.dtype.kind == "f":
+            data = data[~numpy.isnan(data)]
+        if len(data):
+            return True
+    return False
+
+
+def _normalize_data(stream):
+    """Use native byte order, and 32bit integers, so cached and requested
+    data can be merged, and written as miniseed."""
+    for trace in stream:
+        dtype = trace.data.dtype
+        if dtype.kind == "i":
+            dtype = numpy.dtype("i4")
+        if not dtype.isnative:
+            dtype = dtype.newbyteorder("=")
+        if dtype != trace.data.dtype:
+            trace.data = trace.data.astype(dtype)
+
+
+def _replace_file(path, write):
+    """Write a file atomically, using a temporary file."""
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
@@ -6,5 +6,12 @@ from .EdgeFactory import EdgeFactory
 from .LocationCode import LocationCode
 from .MiniSeedFactory import MiniSeedFactory
 from .RawInputClient import RawInputClient
+from .WaveformCache import WaveformCache
 
-__all__ = ["EdgeFactory", "LocationCode", "MiniSeedFactory", "RawInputClient"]
+__all__ = [
+    "EdgeFactory",
+    "LocationCode",
+    "MiniSeedFactory",
+    "RawInputClient",
+    "WaveformCache",
+]
@@ -11,6 +11,15 @@ NINES = numpy.float64("99999")
 # placeholder channel name used when less than 4 channels are being written.
 EMPTY_CHANNEL = "NUL"
 
+# fixed width data line fields, as (name, offset, size)
+DATA_FIELDS = [
+    ("time", 0, 23),
+    ("d1", 31, 9),
+    ("d2", 41, 9),
+    ("d3", 51, 9),
+    ("d4", 61, 9),
+]
+
 
 class IAGA2002Parser(object):
     """IAGA2002 parser.
@@ -61,20 +70,21 @@ class IAGA2002Parser(object):
         # create parsing time and data arrays
         self._parsedata = ([], [], [], [], [])
 
-        parsing_headers = True
         lines = data.splitlines()
-        for line in lines:
-            if parsing_headers:
-                if line.startswith(" ") and line.endswith("|"):
-                    # still in headers
-                    if line.startswith(" #"):
-                        self._parse_comment(line)
-                    else:
-                        self._parse_header(line)
+        data_lines = []
+        for i, line in enumerate(lines):
+            if line.startswith(" ") and line.endswith("|"):
+                # still in headers
+                if line.startswith(" #"):
+                    self._parse_comment(line)
                 else:
-                    parsing_headers = False
-                    self._parse_channels(line)
+                    self._parse_header(line)
             else:
+                self._parse_channels(line)
+                data_lines = lines[i + 1 :]
+                break
+        if not self._parse_data_block(data_lines):
+            for line in data_lines:
                 self._parse_data(line)
         self._post_process()
 
@@ -138,6 +148,69 @@ class IAGA2002Parser(object):
         self.channels.append(line[50:60].strip().replace(iaga_code, ""))
         self.channels.append(line[60:69].strip().replace(iaga_code, ""))
 
+    def _parse_data_block(self, lines):
+        """Parse all data lines at once, as fixed width records.
+
+        Adds times to ``self.times``, and channel values to ``self.data``,
+        when all lines have the same width, all values are numbers, and
+        times are evenly spaced. Otherwise nothing is parsed, and lines
+        should be parsed individually using ``_parse_data``.
+
+        Parameters
+        ----------
+        lines : list of str
+            data lines.
+
+        Returns
+        -------
+        bool
+            whether lines were parsed.
+        """
+        if not lines:
+            return False
+        width = len(lines[0])
+        if width < 70:
+            return False
+        try:
+            block = ("\n".join(lines) + "\n").encode("ascii")
+        except UnicodeEncodeError:
+            return False
+        if len(block) != len(lines) * (width + 1):
+            return False
+        fields = DATA_FIELDS + [("newline", width, 1)]
+        records = numpy.frombuffer(
+            block,
+            dtype=numpy.dtype(
+                {
+                    "names": [name for name, _, _ in fields],
+                    "formats": ["S%d" % size for _, _, size in fields],
+                    "offsets": [offset for _, offset, _ in fields],
+                    "itemsize": width + 1,
+                }
+            ),
+        )
+        # lines are the same width when each record ends with a newline
+        if (records["newline"] != b"\n").any():
+            return False
+        try:
+            times = records["time"].astype("datetime64[ms]")
+            values = [
+                records[name].astype(numpy.float64) for name, _, _ in DATA_FIELDS[1:]
+            ]
+        except ValueError:
+            return False
+        if len(times) > 1:
+            interval = times[1] - times[0]
+            if interval <= numpy.timedelta64(0, "ms"):
+                return False
+            # times must be evenly spaced, to be computed from first time
+            expected = times[0] + numpy.arange(len(times)) * interval
+            if (times != expected).any():
+                return False
+            times = expected
+        self._parsedata = (times.astype("datetime64[us]").tolist(), *values)
+        return True
+
     def _parse_data(self, line):
         """Parse one data point in the timeseries.
 
@@ -2,7 +2,6 @@ from __future__ import absolute_import
 from builtins import range
 
 from io import BytesIO
-from datetime import datetime
 import numpy
 from os import linesep
 import textwrap
@@ -11,6 +10,9 @@ from ..TimeseriesFactoryException import TimeseriesFactoryException
 from ..Util import create_empty_trace
 from . import IAGA2002Parser
 
+# number of data lines formatted in each chunk
+CHUNK_SIZE = 1440
+
 
 class IAGA2002Writer(object):
     """IAGA2002 writer."""
@@ -35,6 +37,29 @@ class IAGA2002Writer(object):
         channels: array_like
             channels to be written from timeseries object
         """
+        for chunk in self.write_chunks(timeseries, channels):
+            out.write(chunk)
+
+    def write_chunks(self, timeseries, channels, chunk_size=CHUNK_SIZE):
+        """Format timeseries as iaga file contents, one chunk at a time.
+
+        Channels are checked before returning, so missing channels raise
+        an exception before any output is generated.
+
+        Parameters
+        ----------
+        timeseries: obspy.core.stream
+            timeseries object with data to be written
+        channels: array_like
+            channels to be written from timeseries object
+        chunk_size: int
+            number of data lines in each chunk.
+
+        Returns
+        -------
+        iterator of bytes
+            headers, followed by chunks of data lines.
+        """
         for channel in channels:
             if timeseries.select(channel=channel).count() == 0:
                 raise TimeseriesFactoryException(
@@ -44,10 +69,23 @@ class IAGA2002Writer(object):
         stats = timeseries[0].stats
         if len(channels) != 4:
             channels = self._pad_to_four_channels(timeseries, channels)
-        out.write(self._format_headers(stats, channels).encode("utf8"))
-        out.write(self._format_comments(stats).encode("utf8"))
-        out.write(self._format_channels(channels, stats.station).encode("utf8"))
-        out.write(self._format_data(timeseries, channels).encode("utf8"))
+        headers = (
+            self._format_headers(stats, channels)
+            + self._format_comments(stats)
+            + self._format_channels(channels, stats.station)
+        )
+        if timeseries.select(channel="D"):
+            d = timeseries.select(channel="D")
+            d[0].data = ChannelConverter.get_minutes_from_radians(d[0].data)
+        traces = [timeseries.select(channel=c)[0] for c in channels]
+        return self._iter_chunks(headers, traces, chunk_size)
+
+    def _iter_chunks(self, headers, traces, chunk_size):
+        yield headers.encode("utf8")
+        npts = len(traces[0].data)
+        for start in range(0, npts, chunk_size):
+            end = min(start + chunk_size, npts)
+            yield self._format_data(traces, start, end).encode("utf8")
 
     def _format_headers(self, stats, channels):
         """format headers for IAGA2002 file
@@ -215,60 +253,35 @@ class IAGA2002Writer(object):
         buf.append("|" + linesep)
         return "".join(buf)
 
-    def _format_data(self, timeseries, channels):
-        """Format all data lines.
-
-        Parameters
-        ----------
-        timeseries : obspy.core.Stream
-            stream containing traces with channel listed in channels
-        channels : sequence
-            list and order of channel values to output.
-        """
-        buf = []
-        if timeseries.select(channel="D"):
-            d = timeseries.select(channel="D")
-            d[0].data = ChannelConverter.get_minutes_from_radians(d[0].data)
-        traces = [timeseries.select(channel=c)[0] for c in channels]
-        starttime = float(traces[0].stats.starttime)
-        delta = traces[0].stats.delta
-        for i in range(len(traces[0].data)):
-            buf.append(
-                self._format_values(
-                    datetime.utcfromtimestamp(starttime + i * delta),
-                    (t.data[i] for t in traces),
-                )
-            )
-        return "".join(buf)
-
-    def _format_values(self, time, values):
-        """Format one line of data values.
+    def _format_data(self, traces, start, end):
+        """Format data lines.
 
         Parameters
         ----------
-        time : datetime
-            timestamp for values
-        values : sequence
-            list and order of channel values to output.
-            if value is NaN, self.empty_value is output in its place.
-
-        Returns
-        -------
-        unicode
-            Formatted line containing values.
+        traces : sequence of obspy.core.Trace
+            traces in output order, with declination in minutes.
+        start : int
+            index of first sample to format.
+        end : int
+            index after last sample to format.
         """
-        tt = time.timetuple()
-        return (
-            "{0.tm_year:0>4d}-{0.tm_mon:0>2d}-{0.tm_mday:0>2d} "
-            "{0.tm_hour:0>2d}:{0.tm_min:0>2d}:{0.tm_sec:0>2d}.{1:0>3d} "
-            "{0.tm_yday:0>3d}   "
-            " {2:9.2f} {3:9.2f} {4:9.2f} {5:9.2f}".format(
-                tt,
-                int(time.microsecond / 1000),
-                *[self.empty_value if numpy.isnan(val) else val for val in values]
-            )
-            + linesep
-        )
+        npts = end - start
+        if npts <= 0:
+            return ""
+        times = TimeseriesUtility.get_trace_millisecond_times(traces[0], start, end)
+        days = times.astype("datetime64[D]")
+        # one row of arguments for each line, formatted with one operation
+        rows = numpy.empty((npts, 2 + len(traces)), dtype=object)
+        dates = numpy.datetime_as_string(times, unit="ms")
+        # replace "T" separator with a space, in place
+        dates.view(numpy.uint32).reshape(npts, -1)[:, 10] = ord(" ")
+        rows[:, 0] = dates
+        rows[:, 1] = (days - days.astype("datetime64[Y]")).astype(numpy.int64) + 1
+        for i, trace in enumerate(traces):
+            values = trace.data[start:end]
+            rows[:, 2 + i] = numpy.where(numpy.isnan(values), self.empty_value, values)
+        line = "%s %03d   " + " %9.2f" * len(traces) + linesep
+        return (line * npts) % tuple(rows.ravel())
 
     def _pad_to_four_channels(self, timeseries, channels):
         padded = channels[:]
@@ -8,6 +8,9 @@ import numpy as np
 from .. import ChannelConverter, TimeseriesUtility
 from ..TimeseriesFactoryException import TimeseriesFactoryException
 
+# number of times, or values, formatted in each chunk
+CHUNK_SIZE = 1440
+
 
 class IMFJSONWriter(object):
     """JSON writer."""
@@ -31,6 +34,36 @@ class IMFJSONWriter(object):
         TimeseriesFactoryException
             if there is a missing channel.
         """
+        for chunk in self.write_chunks(timeseries, channels, url=url):
+            out.write(chunk)
+
+    def write_chunks(self, timeseries, channels, url=None, chunk_size=CHUNK_SIZE):
+        """Format timeseries as json, one chunk at a time.
+
+        Output is the same as a single json document, but times and values
+        are formatted chunk_size samples at a time.
+
+        Parameters
+        ----------
+        timeseries: obspy.core.stream
+            timeseries object with data to be written
+        channels: array_like
+            channels to be written from timeseries object
+        url: str
+            string with the requested url
+        chunk_size: int
+            number of times, or values, in each chunk.
+
+        Returns
+        -------
+        iterator of bytes
+            json document chunks.
+
+        Raises
+        ------
+        TimeseriesFactoryException
+            if there is a missing channel, before any output is generated.
+        """
         file_dict = OrderedDict()
         for channel in channels:
             if timeseries.select(channel=channel).count() == 0:
@@ -42,12 +75,31 @@ class IMFJSONWriter(object):
         file_dict["type"] = "Timeseries"
         file_dict["metadata"] = self._format_metadata(stats, channels)
         file_dict["metadata"]["url"] = url
-        file_dict["times"] = self._format_times(timeseries, channels)
-        file_dict["values"] = self._format_data(timeseries, channels, stats)
-        formatted_timeseries = json.dumps(
-            file_dict, ensure_ascii=True, separators=(",", ":")
-        ).encode("utf8")
-        out.write(formatted_timeseries)
+        value_dicts = [
+            self._format_value_metadata(timeseries, channel, stats)
+            for channel in channels
+        ]
+        return self._iter_chunks(file_dict, value_dicts, timeseries, chunk_size)
+
+    def _iter_chunks(self, file_dict, value_dicts, timeseries, chunk_size):
+        # objects are formatted without their closing "}", so arrays can follow
+        yield _dumps(file_dict)[:-1] + b',"times":['
+        channels = [value_dict["id"] for value_dict in value_dicts]
+        npts = len(timeseries.select(channel=channels[0])[0].data)
+        for start in range(0, npts, chunk_size):
+            times = self._format_times(timeseries, channels, start, start + chunk_size)
+            yield _dumps_items(times, first=start == 0)
+        yield b'],"values":['
+        for i, value_dict in enumerate(value_dicts):
+            if i:
+                yield b","
+            yield _dumps(value_dict)[:-1] + b',"values":['
+            trace = timeseries.select(channel=value_dict["id"])[0]
+            for start in range(0, len(trace.data), chunk_size):
+                values = self._format_values(trace, start, start + chunk_size)
+                yield _dumps_items(values, first=start == 0)
+            yield b"]}"
+        yield b"]}"
 
     def _format_data(self, timeseries, channels, stats):
         """Format all data lines.
@@ -68,37 +120,81 @@ class IMFJSONWriter(object):
         """
         values = []
         for c in channels:
-            value_dict = OrderedDict()
-            trace = timeseries.select(channel=c)[0]
-            value_dict["id"] = c
-            value_dict["metadata"] = OrderedDict()
-            metadata = value_dict["metadata"]
-            metadata["element"] = c
-            metadata["network"] = stats.network
-            metadata["station"] = stats.station
-            edge_channel = trace.stats.channel
-            metadata["channel"] = edge_channel
-            if stats.location == "":
-                if stats.data_type == "variation" or stats.data_type == "reported":
-                    stats.location = "R0"
-                elif stats.data_type == "adjusted" or stats.data_type == "provisional":
-                    stats.location = "A0"
-                elif stats.data_type == "quasi-definitive":
-                    stats.location = "Q0"
-                elif stats.data_type == "definitive":
-                    stats.location = "D0"
-            metadata["location"] = stats.location
+            value_dict = self._format_value_metadata(timeseries, c, stats)
             values += [value_dict]
-            series = np.copy(trace.data)
-            if c == "D":
-                series = ChannelConverter.get_minutes_from_radians(series)
-            # Converting numpy array to list required for JSON serialization
-            series = series.tolist()
-            series = [None if str(x) == "nan" else x for x in series]
-            value_dict["values"] = series
+            trace = timeseries.select(channel=c)[0]
+            value_dict["values"] = self._format_values(trace)
             # TODO: Add flag metadata
         return values
 
+    def _format_value_metadata(self, timeseries, channel, stats):
+        """Format id and metadata for one channel.
+
+        Parameters
+        ----------
+        timeseries : obspy.core.Stream
+            stream containing a trace for channel
+        channel : str
+            channel to output.
+        stats: obspy.core.trace.stats
+            holds the observatory metadata
+
+        Returns
+        -------
+        OrderedDict
+            dictionary with id and metadata, but not values.
+        """
+        value_dict = OrderedDict()
+        trace = timeseries.select(channel=channel)[0]
+        value_dict["id"] = channel
+        value_dict["metadata"] = OrderedDict()
+        metadata = value_dict["metadata"]
+        metadata["element"] = channel
+        metadata["network"] = stats.network
+        metadata["station"] = stats.station
+        edge_channel = trace.stats.channel
+        metadata["channel"] = edge_channel
+        if stats.location == "":
+            if stats.data_type == "variation" or stats.data_type == "reported":
+                stats.location = "R0"
+            elif stats.data_type == "adjusted" or stats.data_type == "provisional":
+                stats.location = "A0"
+            elif stats.data_type == "quasi-definitive":
+                stats.location = "Q0"
+            elif stats.data_type == "definitive":
+                stats.location = "D0"
+        metadata["location"] = stats.location
+        return value_dict
+
+    def _format_values(self, trace, start=0, end=None):
+        """Format values for one channel.
+
+        Parameters
+        ----------
+        trace : obspy.core.Trace
+            trace with values to output.
+        start : int
+            index of first value.
+        end : int
+            index after last value, default is length of trace data.
+
+        Returns
+        -------
+        list
+            values, with None where values are missing.
+        """
+        series = np.copy(trace.data[start:end])
+        if trace.stats.channel == "D":
+            series = ChannelConverter.get_minutes_from_radians(series)
+        # Converting numpy array to list required for JSON serialization
+        nans = np.isnan(series)
+        series = series.tolist()
+        if nans.any():
+            series = np.array(series, dtype=object)
+            series[nans] = None
+            series = series.tolist()
+        return series
+
     def _format_metadata(self, stats, channels):
         """Format metadata for json file and update dictionary
 
@@ -157,7 +253,7 @@ class IMFJSONWriter(object):
         metadata_dict["generated"] = generated.strftime("%Y-%m-%dT%H:%M:%SZ")
         return metadata_dict
 
-    def _format_times(self, timeseries, channels):
+    def _format_times(self, timeseries, channels, start=0, end=None):
         """Format times for json file and update dictionary
 
         Parameters
@@ -166,43 +262,19 @@ class IMFJSONWriter(object):
             stream containing traces with channel listed in channels
         channels: array_like
             channels to be reported.
+        start : int
+            index of first time.
+        end : int
+            index after last time, default is length of trace data.
 
         Returns
         -------
         array_like
             an array containing formatted strings of time data.
         """
-        times = []
-        traces = [timeseries.select(channel=c)[0] for c in channels]
-        starttime = float(traces[0].stats.starttime)
-        delta = traces[0].stats.delta
-        for i in range(len(traces[0].data)):
-            times.append(
-                self._format_time_string(
-                    datetime.utcfromtimestamp(starttime + i * delta)
-                )
-            )
-        return times
-
-    def _format_time_string(self, time):
-        """Format one datetime object.
-
-        Parameters
-        ----------
-        time : datetime
-            timestamp for values
-
-        Returns
-        -------
-        unicode
-            formatted time.
-        """
-        tt = time.timetuple()
-        return (
-            "{0.tm_year:0>4d}-{0.tm_mon:0>2d}-{0.tm_mday:0>2d}T"
-            "{0.tm_hour:0>2d}:{0.tm_min:0>2d}:{0.tm_sec:0>2d}.{1:0>3d}Z"
-            "".format(tt, int(time.microsecond / 1000))
-        )
+        trace = timeseries.select(channel=channels[0])[0]
+        times = TimeseriesUtility.get_trace_millisecond_times(trace, start, end)
+        return np.datetime_as_string(times, unit="ms", timezone="UTC").tolist()
 
     @classmethod
     def format(self, timeseries, channels, url=None):
@@ -228,3 +300,16 @@ class IMFJSONWriter(object):
         writer = IMFJSONWriter()
         writer.write(out, timeseries, channels, url=url)
         return out.getvalue()
+
+
+def _dumps(value):
+    """Format value as compact json bytes."""
+    return json.dumps(value, ensure_ascii=True, separators=(",", ":")).encode("utf8")
+
+
+def _dumps_items(items, first):
+    """Format list items as json bytes, without enclosing brackets.
+
+    Items are preceded by a comma, unless they are first in the list.
+    """
+    return (b"" if first else b",") + _dumps(items)[1:-1]
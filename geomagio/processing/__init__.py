@@ -3,17 +3,25 @@
 Note that these implementations are subject to change,
 and should be considered less stable than other packages in the library.
 """
-from .factory import get_edge_factory, get_miniseed_factory
+from .factory import CascadeFactory, get_edge_factory, get_miniseed_factory
 from .observatory import adjusted, average, deltaf, rotate, sqdist_minute
-from .obsrio import obsrio_minute, obsrio_second, obsrio_temperatures, obsrio_tenhertz
+from .obsrio import (
+    obsrio_filter,
+    obsrio_minute,
+    obsrio_second,
+    obsrio_temperatures,
+    obsrio_tenhertz,
+)
 
 
 __all__ = [
     "adjusted",
     "average",
+    "CascadeFactory",
     "deltaf",
     "get_edge_factory",
     "get_miniseed_factory",
+    "obsrio_filter",
     "obsrio_minute",
     "obsrio_second",
     "obsrio_temperatures",
@@ -0,0 +1,525 @@
+"""Long running realtime processing.
+
+Runs processing on a schedule, instead of one call per cron job, so
+factories, connections, and algorithm state are reused between runs.
+"""
+import json
+import math
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import typer
+from obspy.core import UTCDateTime
+
+from .observatory import (
+    get_adjusted_controller,
+    get_sqdist_controller,
+    run_adjusted,
+    run_sqdist,
+)
+from .obsrio import (
+    HOUR_RENAMES,
+    MINUTE_RENAMES,
+    SECOND_RENAMES,
+    TEMPERATURES_RENAMES,
+    TENHERTZ_RENAMES,
+    get_hour_controller,
+    get_minute_controller,
+    get_second_controller,
+    get_statefile,
+    get_temperatures_controller,
+    get_tenhertz_controller,
+    run_filter,
+)
+
+
+class Task(object):
+    """Processing for one observatory, run on a fixed cadence.
+
+    Runs are aligned to multiples of cadence. When a run is late, missed
+    runs are skipped, and the next run processes all data since the last
+    successful run.
+
+    Parameters
+    ----------
+    name: str
+        task name.
+    observatory: str
+        observatory processed by task.
+    function: callable
+        called with the number of seconds of data to process.
+    cadence: int
+        number of seconds between runs.
+    realtime_interval: int
+        number of seconds of data processed by each run.
+    max_realtime_interval: int
+        maximum number of seconds of data processed when catching up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        observatory: str,
+        function: Callable[[int], None],
+        cadence: int,
+        realtime_interval: int,
+        max_realtime_interval: int = 86400,
+    ):
+        self.name = name
+        self.observatory = observatory
+        self.function = function
+        self.cadence = cadence
+        self.realtime_interval = realtime_interval
+        self.max_realtime_interval = max_realtime_interval
+        self.next_run = None
+        self.last_run = None
+        self.last_success = None
+        self.last_duration = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+
+    def get_realtime_interval(self, now: float) -> int:
+        """Get number of seconds of data to process.
+
+        Parameters
+        ----------
+        now: float
+            current time, as a unix timestamp.
+
+        Returns
+        -------
+        int
+            realtime_interval, extended by any time the task is behind
+            schedule, up to max_realtime_interval.
+        """
+        if self.last_success is None:
+            return self.realtime_interval
+        behind = max(0, now - self.last_success - self.cadence)
+        return int(
+            min(self.realtime_interval + math.ceil(behind), self.max_realtime_interval)
+        )
+
+    def run(self, now: float):
+        """Run task, and schedule next run.
+
+        Exceptions are recorded and printed, not raised.
+
+        Parameters
+        ----------
+        now: float
+            time task was started, as a unix timestamp.
+        """
+        realtime_interval = self.get_realtime_interval(now)
+        self.last_run = now
+        start = time.time()
+        try:
+            self.function(realtime_interval)
+            self.last_success = now
+            self.last_error = None
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            print(
+                f"Exception running {self.name} for {self.observatory}",
+                e,
+                file=sys.stderr,
+            )
+        duration = time.time() - start
+        self.runs += 1
+        self.last_duration = duration
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        self.schedule(time.time())
+
+    def schedule(self, now: float):
+        """Schedule next run after now, counting any skipped runs.
+
+        Parameters
+        ----------
+        now: float
+            current time, as a unix timestamp.
+        """
+        next_run = (math.floor(now / self.cadence) + 1) * self.cadence
+        if self.next_run is not None:
+            self.skipped += max(0, round((next_run - self.next_run) / self.cadence) - 1)
+        self.next_run = next_run
+
+    def get_status(self) -> Dict:
+        """Get schedule and timing statistics.
+
+        Returns
+        -------
+        dict
+            times are ISO8601 strings, durations are seconds.
+        """
+        return {
+            "name": self.name,
+            "observatory": self.observatory,
+            "cadence": self.cadence,
+            "next_run": _format_time(self.next_run),
+            "last_run": _format_time(self.last_run),
+            "last_success": _format_time(self.last_success),
+            "last_duration": self.last_duration,
+            "mean_duration": self.total_duration / self.runs if self.runs else None,
+            "max_duration": self.max_duration,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler(object):
+    """Run tasks when they are due.
+
+    Due tasks for one observatory run in the order they were added,
+    so each step of a cascade sees output from earlier steps.
+    Observatories are scheduled independently, and run concurrently,
+    so a slow observatory does not delay others.
+
+    Parameters
+    ----------
+    tasks: list of Task
+        tasks to run.
+    workers: int
+        number of observatories to process concurrently.
+        when <= 1, observatories are processed serially by run_pending.
+    status_file: str
+        optional file where get_status() is written as JSON,
+        after tasks run.
+    """
+
+    def __init__(
+        self, tasks: List[Task], workers: int = 1, status_file: Optional[str] = None
+    ):
+        self.tasks = tasks
+        self.workers = workers
+        self.status_file = status_file
+        self._executor = None
+        self._lock = threading.Lock()
+        self._running = {}
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+
+    def run_pending(self, now: Optional[float] = None) -> Optional[float]:
+        """Start tasks that are due.
+
+        Observatories that are still running are skipped.
+
+        Parameters
+        ----------
+        now: float
+            current time, as a unix timestamp, default time.time().
+
+        Returns
+        -------
+        float
+            time when the next task is due, or None when all observatories
+            are running.
+        """
+        now = time.time() if now is None else now
+        due = OrderedDict()
+        with self._lock:
+            for task in self.tasks:
+                if task.observatory in self._running:
+                    continue
+                if task.next_run is None or task.next_run <= now:
+                    due.setdefault(task.observatory, []).append(task)
+            if self.workers > 1:
+                for observatory, tasks in due.items():
+                    self._running[observatory] = self._get_executor().submit(
+                        self._run_tasks, observatory, tasks
+                    )
+        if self.workers <= 1:
+            for observatory, tasks in due.items():
+                self._run_tasks(observatory, tasks)
+        return self.get_next_run()
+
+    def get_next_run(self) -> Optional[float]:
+        """Time when the next task, for an observatory not running, is due."""
+        with self._lock:
+            next_runs = [
+                task.next_run
+                for task in self.tasks
+                if task.observatory not in self._running
+            ]
+        if not next_runs:
+            return None
+        if None in next_runs:
+            return time.time()
+        return min(next_runs)
+
+    def run(self):
+        """Run tasks until stop() is called.
+
+        Waits for running tasks to finish before returning.
+        """
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            next_run = self.run_pending()
+            if self._stopped.is_set():
+                break
+            timeout = None if next_run is None else max(0, next_run - time.time())
+            self._wakeup.wait(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stop(self):
+        """Stop run(), after running tasks finish."""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def get_status(self) -> Dict:
+        """Get schedule and timing statistics for all tasks."""
+        return {
+            "time": _format_time(time.time()),
+            "tasks": [task.get_status() for task in self.tasks],
+        }
+
+    def write_status(self):
+        """Write status to status_file, if configured."""
+        if not self.status_file:
+            return
+        directory = os.path.dirname(os.path.abspath(self.status_file))
+        fd, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.get_status(), f, indent=2)
+            os.replace(temp, self.status_file)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="observatory"
+            )
+        return self._executor
+
+    def _run_tasks(self, observatory: str, tasks: List[Task]):
+        """Run due tasks for one observatory, in order.
+
+        Each task is passed the time it starts.
+        """
+        try:
+            for task in tasks:
+                task.run(time.time())
+            with self._lock:
+                self.write_status()
+        except Exception as e:
+            print(f"Exception writing status for {observatory}", e, file=sys.stderr)
+        finally:
+            with self._lock:
+                self._running.pop(observatory, None)
+            self._wakeup.set()
+
+
+def main():
+    typer.run(realtime_daemon)
+
+
+def realtime_daemon(
+    observatories: List[str] = typer.Argument(..., metavar="OBSERVATORY..."),
+    filter_cadence: int = typer.Option(
+        60,
+        help="Seconds between 10Hz, second, minute, and temperature filter runs,"
+        " 0 to disable.",
+    ),
+    hour_cadence: int = typer.Option(
+        600, help="Seconds between hour filter runs, 0 to disable."
+    ),
+    adjusted_cadence: int = typer.Option(
+        60, help="Seconds between adjusted runs, 0 to disable."
+    ),
+    adjusted_statefile: Optional[str] = typer.Option(
+        None,
+        help="Adjusted statefile, '{observatory}' is replaced with observatory."
+        " Adjusted is not run when not set.",
+    ),
+    sqdist_cadence: int = typer.Option(
+        60, help="Seconds between sqdist runs, 0 to disable."
+    ),
+    sqdist_statefile: Optional[str] = typer.Option(
+        None,
+        help="SqDist statefile, '{observatory}' is replaced with observatory."
+        " SqDist is not run when not set.",
+    ),
+    realtime_interval: int = 600,
+    update_limit: int = 10,
+    state_directory: Optional[str] = typer.Option(
+        None,
+        help="Directory for filter statefiles, only new data is filtered when set.",
+    ),
+    status_file: Optional[str] = typer.Option(
+        None, help="File where schedule and timing statistics are written as JSON."
+    ),
+    workers: int = typer.Option(
+        1, help="Number of observatories to process concurrently."
+    ),
+):
+    """Run realtime processing until interrupted.
+
+    Processing is configured once, and each observatory runs the 10Hz,
+    second, minute, and temperature filters, then hour filter, adjusted,
+    and sqdist, as they are due.
+    """
+    tasks = []
+    for observatory in observatories:
+        tasks.extend(
+            get_observatory_tasks(
+                observatory=observatory,
+                filter_cadence=filter_cadence,
+                hour_cadence=hour_cadence,
+                adjusted_cadence=adjusted_cadence,
+                adjusted_statefile=adjusted_statefile,
+                sqdist_cadence=sqdist_cadence,
+                sqdist_statefile=sqdist_statefile,
+                realtime_interval=realtime_interval,
+                update_limit=update_limit,
+                state_directory=state_directory,
+            )
+        )
+    if not tasks:
+        print("No tasks configured", file=sys.stderr)
+        raise typer.Exit(1)
+    scheduler = Scheduler(tasks=tasks, workers=workers, status_file=status_file)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: scheduler.stop())
+    scheduler.run()
+
+
+def get_observatory_tasks(
+    observatory: str,
+    filter_cadence: int = 60,
+    hour_cadence: int = 600,
+    adjusted_cadence: int = 60,
+    adjusted_statefile: Optional[str] = None,
+    sqdist_cadence: int = 60,
+    sqdist_statefile: Optional[str] = None,
+    realtime_interval: int = 600,
+    update_limit: int = 10,
+    state_directory: Optional[str] = None,
+) -> List[Task]:
+    """Configure realtime processing for one observatory.
+
+    Controllers are created once, and reused by each run.
+    Tasks are returned in the order they should run.
+    """
+    steps = []
+    if filter_cadence > 0:
+        for name, get_controller, renames, stateful in [
+            ("tenhertz", get_tenhertz_controller, TENHERTZ_RENAMES, True),
+            ("second", get_second_controller, SECOND_RENAMES, False),
+            ("minute", get_minute_controller, MINUTE_RENAMES, True),
+            ("temperatures", get_temperatures_controller, TEMPERATURES_RENAMES, True),
+        ]:
+            statefile = (
+                get_statefile(state_directory, observatory, name) if stateful else None
+            )
+            controller = (
+                get_controller(statefile=statefile) if stateful else get_controller()
+            )
+            steps.append(
+                (
+                    name,
+                    filter_cadence,
+                    _filter_function(
+                        controller,
+                        observatory,
+                        renames,
+                        update_limit,
+                        streaming=statefile is not None,
+                    ),
+                )
+            )
+    if hour_cadence > 0:
+        steps.append(
+            (
+                "hour",
+                hour_cadence,
+                _filter_function(
+                    get_hour_controller(),
+                    observatory,
+                    HOUR_RENAMES,
+                    update_limit,
+                    streaming=False,
+                ),
+            )
+        )
+    if adjusted_cadence > 0 and adjusted_statefile:
+        statefile = adjusted_statefile.format(observatory=observatory)
+        for interval in ["second", "minute"]:
+            controller = get_adjusted_controller(interval=interval, statefile=statefile)
+            steps.append(
+                (
+                    f"adjusted_{interval}",
+                    adjusted_cadence,
+                    _observatory_function(run_adjusted, controller, observatory),
+                )
+            )
+    if sqdist_cadence > 0 and sqdist_statefile:
+        controller = get_sqdist_controller(
+            statefile=sqdist_statefile.format(observatory=observatory)
+        )
+        steps.append(
+            (
+                "sqdist",
+                sqdist_cadence,
+                _observatory_function(run_sqdist, controller, observatory),
+            )
+        )
+    return [
+        Task(
+            name=name,
+            observatory=observatory,
+            function=function,
+            cadence=cadence,
+            realtime_interval=realtime_interval,
+        )
+        for name, cadence, function in steps
+    ]
+
+
+def _filter_function(controller, observatory, renames, update_limit, streaming):
+    def run(realtime_interval: int):
+        run_filter(
+            controller=controller,
+            observatory=observatory,
+            renames=renames,
+            realtime_interval=realtime_interval,
+            update_limit=update_limit,
+            streaming=streaming,
+        )
+
+    return run
+
+
+def _observatory_function(function, controller, observatory):
+    def run(realtime_interval: int):
+        function(
+            controller=controller,
+            observatory=observatory,
+            realtime_interval=realtime_interval,
+        )
+
+    return run
+
+
+def _format_time(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return str(UTCDateTime(timestamp))
@@ -1,8 +1,13 @@
 import os
 from typing import Callable
 
+import numpy
+from obspy.core import Stream
+
 from ..TimeseriesFactory import TimeseriesFactory
+from .. import TimeseriesUtility
 from ..edge import EdgeFactory, MiniSeedFactory
+from ..edge.WaveformCache import get_missing_intervals, merge_intervals
 
 
 def get_edge_factory(
@@ -26,3 +31,144 @@ def get_miniseed_factory(
         type=data_type,
         **kwargs
     )
+
+
+class CascadeFactory(TimeseriesFactory):
+    """Factory that keeps data it reads and writes in memory.
+
+    Used by processing steps that read output of earlier steps,
+    so data written by one step is not read back by the next.
+    Data not in memory is read from factory, and all data is written to
+    factory.
+
+    Data is never removed from memory, and changes made by other
+    processes are not seen, so use one CascadeFactory for each run.
+
+    Parameters
+    ----------
+    factory: TimeseriesFactory
+        factory used to read data not in memory, and to write data.
+    """
+
+    def __init__(self, factory: TimeseriesFactory):
+        TimeseriesFactory.__init__(
+            self,
+            observatory=factory.observatory,
+            channels=factory.channels,
+            type=factory.type,
+            interval=factory.interval,
+        )
+        self.factory = factory
+        self._entries = {}
+
+    def get_timeseries(
+        self,
+        starttime,
+        endtime,
+        observatory=None,
+        channels=None,
+        type=None,
+        interval=None,
+    ):
+        """Get timeseries data, only reading data not in memory.
+
+        Parameters are the same as TimeseriesFactory.get_timeseries.
+        """
+        observatory = observatory or self.observatory
+        channels = channels or self.channels
+        type = type or self.type
+        interval = interval or self.interval
+        delta = TimeseriesUtility.get_delta_from_interval(interval)
+        missing = {}
+        for channel in channels:
+            entry = self._get_entry((observatory, type, delta, channel))
+            intervals = get_missing_intervals(starttime, endtime, entry["coverage"])
+            if intervals:
+                missing[channel] = intervals
+        if missing:
+            # one request for all channels, keeping data already in memory
+            timeseries = self.factory.get_timeseries(
+                starttime=min(intervals[0][0] for intervals in missing.values()),
+                endtime=max(intervals[-1][1] for intervals in missing.values()),
+                observatory=observatory,
+                channels=list(missing.keys()),
+                type=type,
+                interval=interval,
+            )
+            for channel, intervals in missing.items():
+                key = (observatory, type, delta, channel)
+                for start, end in intervals:
+                    for trace in timeseries.select(channel=channel):
+                        self._add(key, trace.slice(start, end).copy())
+                self._add_coverage(key, intervals)
+        timeseries = Stream()
+        for channel in channels:
+            entry = self._get_entry((observatory, type, delta, channel))
+            timeseries += entry["stream"].slice(starttime, endtime).copy()
+        TimeseriesUtility.pad_timeseries(timeseries, starttime, endtime)
+        return timeseries
+
+    def put_timeseries(
+        self,
+        timeseries,
+        starttime=None,
+        endtime=None,
+        channels=None,
+        type=None,
+        interval=None,
+    ):
+        """Write timeseries data, and keep a copy in memory.
+
+        Parameters are the same as TimeseriesFactory.put_timeseries.
+        """
+        self.factory.put_timeseries(
+            timeseries=timeseries,
+            starttime=starttime,
+            endtime=endtime,
+            channels=channels,
+            type=type,
+            interval=interval,
+        )
+        type = type or self.type
+        for trace in timeseries:
+            stats = trace.stats
+            if channels and stats.channel not in channels:
+                continue
+            trace = trace.slice(starttime, endtime).copy()
+            key = (stats.station, type, stats.delta, stats.channel)
+            self._add(key, trace)
+            # missing values are not written, and may exist in factory
+            self._add_coverage(key, _get_data_intervals(trace))
+
+    def _add(self, key, trace):
+        entry = self._get_entry(key)
+        if len(entry["stream"]):
+            # use the same id, so traces are merged
+            existing = entry["stream"][0].stats
+            trace.stats.network = existing.network
+            trace.stats.station = existing.station
+            trace.stats.location = existing.location
+        entry["stream"] = TimeseriesUtility.merge_streams(
+            entry["stream"], Stream(trace)
+        )
+
+    def _add_coverage(self, key, intervals):
+        entry = self._get_entry(key)
+        entry["coverage"] = merge_intervals(entry["coverage"] + intervals)
+
+    def _get_entry(self, key):
+        return self._entries.setdefault(key, {"coverage": [], "stream": Stream()})
+
+
+def _get_data_intervals(trace):
+    """Get intervals of a trace that do not have missing values."""
+    gaps = TimeseriesUtility.get_trace_gap_indices(trace)
+    # data is before, between, and after gaps
+    starts = numpy.concatenate(([0], gaps[:, 1] + 1))
+    ends = numpy.concatenate((gaps[:, 0] - 1, [len(trace.data) - 1]))
+    starttime, delta = trace.stats.starttime, trace.stats.delta
+    return [
+        (starttime + int(start) * delta, starttime + int(end) * delta)
+        for start, end in zip(starts, ends)
+        if start <= end
+    ]
@@ -42,10 +42,37 @@ def adjusted(
 
     Uses update_limit=10.
     """
+    controller = get_adjusted_controller(
+        input_factory=input_factory,
+        interval=interval,
+        output_factory=output_factory,
+        matrix=matrix,
+        pier_correction=pier_correction,
+        statefile=statefile,
+    )
+    run_adjusted(
+        controller=controller,
+        observatory=observatory,
+        realtime_interval=realtime_interval,
+    )
+
+
+def get_adjusted_controller(
+    input_factory: Optional[TimeseriesFactory] = None,
+    interval: str = "second",
+    output_factory: Optional[TimeseriesFactory] = None,
+    matrix: Optional[numpy.ndarray] = None,
+    pier_correction: Optional[float] = None,
+    statefile: Optional[str] = None,
+) -> Controller:
+    """Get controller used by adjusted().
+
+    The controller may be reused by run_adjusted(), and only reads
+    statefile once.
+    """
     if not statefile and (not matrix or not pier_correction):
         raise ValueError("Either statefile or matrix and pier_correction are required.")
-    starttime, endtime = get_realtime_interval(realtime_interval)
-    controller = Controller(
+    return Controller(
         algorithm=AdjustedAlgorithm(
             matrix=matrix,
             pier_correction=pier_correction,
@@ -58,6 +85,11 @@ def adjusted(
         outputFactory=output_factory or get_edge_factory(data_type="adjusted"),
         outputInterval=interval,
     )
+
+
+def run_adjusted(controller: Controller, observatory: str, realtime_interval: int):
+    """Run controller from get_adjusted_controller()."""
+    starttime, endtime = get_realtime_interval(realtime_interval)
     controller.run_as_update(
         observatory=(observatory,),
         output_observatory=(observatory,),
@@ -215,10 +247,29 @@ def sqdist_minute(
     output_factory: where to write, should be configured with data_type and interval
     realtime_interval: window in seconds
     """
+    controller = get_sqdist_controller(
+        statefile=statefile, input_factory=input_factory, output_factory=output_factory
+    )
+    run_sqdist(
+        controller=controller,
+        observatory=observatory,
+        realtime_interval=realtime_interval,
+    )
+
+
+def get_sqdist_controller(
+    statefile: str,
+    input_factory: Optional[TimeseriesFactory] = None,
+    output_factory: Optional[TimeseriesFactory] = None,
+) -> Controller:
+    """Get controller used by sqdist_minute().
+
+    The controller may be reused by run_sqdist(), which keeps SqDist state
+    in memory between runs, and only reads statefile once.
+    """
     if not statefile:
         raise ValueError("Statefile is required.")
-    starttime, endtime = get_realtime_interval(realtime_interval)
-    controller = Controller(
+    return Controller(
         algorithm=SqDistAlgorithm(
             alpha=2.3148e-5,
             gamma=3.3333e-2,
@@ -232,15 +283,18 @@ def sqdist_minute(
         outputFactory=output_factory or get_edge_factory(interval="minute"),
         outputInterval="minute",
     )
+
+
+def run_sqdist(controller: Controller, observatory: str, realtime_interval: int):
+    """Run controller from get_sqdist_controller()."""
+    starttime, endtime = get_realtime_interval(realtime_interval)
     # sqdist is stateful, use run
     controller.run(
         observatory=(observatory,),
-        output_observatory=(observatory,),
         starttime=starttime,
         endtime=endtime,
         input_channels=("X", "Y", "Z", "F"),
         output_channels=("MDT", "MSQ", "MSV"),
         realtime=realtime_interval,
         rename_output_channel=(("H_Dist", "MDT"), ("H_SQ", "MSQ"), ("H_SV", "MSV")),
-        update_limit=10,
     )
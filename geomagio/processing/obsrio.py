@@ -1,5 +1,6 @@
 import os
-from typing import Optional
+import sys
+from typing import Dict, List, Optional
 
 import typer
 
@@ -8,9 +9,18 @@ from ..edge import EdgeFactory, MiniSeedFactory
 from ..Controller import (
     Controller,
     get_realtime_interval,
+    run_observatories,
 )
 from ..TimeseriesFactory import TimeseriesFactory
-from .factory import get_edge_factory, get_miniseed_factory
+from .factory import CascadeFactory, get_edge_factory, get_miniseed_factory
+
+
+# input to output channels for each filter
+HOUR_RENAMES = {"H": "U", "E": "V", "Z": "W", "F": "F"}
+MINUTE_RENAMES = {"H": "H", "E": "E", "Z": "Z", "F": "F"}
+SECOND_RENAMES = {"F": "F"}
+TEMPERATURES_RENAMES = {"LK1": "UK1", "LK2": "UK2", "LK3": "UK3", "LK4": "UK4"}
+TENHERTZ_RENAMES = {"U": "H", "V": "E", "W": "Z"}
 
 
 def main():
@@ -18,7 +28,7 @@ def main():
 
 
 def filter_realtime(
-    observatory: str,
+    observatories: List[str] = typer.Argument(..., metavar="OBSERVATORY..."),
     input_factory: Optional[str] = None,
     host: str = "127.0.0.1",
     port: str = 2061,
@@ -31,30 +41,85 @@ def filter_realtime(
     ),
     realtime_interval: int = 600,
     update_limit: int = 10,
+    state_directory: Optional[str] = typer.Option(
+        None,
+        help="Directory for filter statefiles, only new data is filtered when set.",
+    ),
+    workers: int = typer.Option(
+        1, help="Number of observatories to process concurrently."
+    ),
+    cascade: bool = typer.Option(
+        False,
+        help="Filter minute data from 10Hz and second output in memory,"
+        " instead of reading it back.",
+    ),
 ):
     """Filter 10Hz miniseed, 1 second, one minute, and temperature data.
     Defaults set for realtime processing; can also be implemented to update legacy data"""
 
-    if input_factory == "miniseed":
-        input_factory = MiniSeedFactory(host=host, port=port)
-    elif input_factory == "edge":
-        input_factory = EdgeFactory(host=host, port=port)
-
-    if output_factory == "miniseed":
-        output_factory = MiniSeedFactory(
-            host=host, port=output_read_port, write_port=output_port
-        )
-    elif output_factory == "edge":
-        output_factory = EdgeFactory(
-            host=host, port=output_read_port, write_port=output_port
+    def filter_observatory(observatory: str):
+        # factories hold connections, create separate factories for each thread
+        observatory_input_factory = None
+        if input_factory == "miniseed":
+            observatory_input_factory = MiniSeedFactory(host=host, port=port)
+        elif input_factory == "edge":
+            observatory_input_factory = EdgeFactory(host=host, port=port)
+        observatory_output_factory = None
+        if output_factory == "miniseed":
+            observatory_output_factory = MiniSeedFactory(
+                host=host, port=output_read_port, write_port=output_port
+            )
+        elif output_factory == "edge":
+            observatory_output_factory = EdgeFactory(
+                host=host, port=output_read_port, write_port=output_port
+            )
+        obsrio_filter(
+            observatory=observatory,
+            input_factory=observatory_input_factory,
+            output_factory=observatory_output_factory,
+            realtime_interval=realtime_interval,
+            update_limit=update_limit,
+            state_directory=state_directory,
+            cascade=cascade,
         )
 
+    exceptions = run_observatories(
+        observatories=observatories, function=filter_observatory, workers=workers
+    )
+    for observatory, e in exceptions.items():
+        print(f"Exception processing observatory {observatory}", e, file=sys.stderr)
+    if exceptions:
+        raise typer.Exit(1)
+
+
+def obsrio_filter(
+    observatory: str,
+    input_factory: Optional[TimeseriesFactory] = None,
+    output_factory: Optional[TimeseriesFactory] = None,
+    realtime_interval: int = 600,
+    update_limit: int = 10,
+    state_directory: Optional[str] = None,
+    cascade: bool = False,
+):
+    """Filter 10Hz miniseed, 1 second, one minute, and temperature data
+    for one observatory.
+
+    When cascade is set, the minute filter reads output from the 10Hz and
+    second steps from memory, and only reads data they did not write.
+    """
+    minute_input_factory = input_factory
+    if cascade:
+        output_factory = CascadeFactory(
+            output_factory or get_edge_factory(data_type="variation")
+        )
+        minute_input_factory = output_factory
     obsrio_tenhertz(
         observatory=observatory,
         input_factory=input_factory,
         output_factory=output_factory,
         realtime_interval=realtime_interval,
         update_limit=update_limit,
+        statefile=get_statefile(state_directory, observatory, "tenhertz"),
     )
     obsrio_second(
         observatory=observatory,
@@ -65,10 +130,11 @@ def filter_realtime(
     )
     obsrio_minute(
         observatory=observatory,
-        input_factory=input_factory,
+        input_factory=minute_input_factory,
         output_factory=output_factory,
         realtime_interval=realtime_interval,
         update_limit=update_limit,
+        statefile=get_statefile(state_directory, observatory, "minute"),
     )
     obsrio_temperatures(
         observatory=observatory,
@@ -76,6 +142,57 @@ def filter_realtime(
         output_factory=output_factory,
         realtime_interval=realtime_interval,
         update_limit=update_limit,
+        statefile=get_statefile(state_directory, observatory, "temperatures"),
+    )
+
+
+def get_statefile(
+    state_directory: Optional[str], observatory: str, name: str
+) -> Optional[str]:
+    """Get filter statefile path, or None when state_directory is not set."""
+    if not state_directory:
+        return None
+    return os.path.join(state_directory, f"filter_{observatory}_{name}.npz")
+
+
+def run_filter(
+    controller: Controller,
+    observatory: str,
+    renames: Dict[str, str],
+    realtime_interval: int,
+    update_limit: int,
+    streaming: bool,
+):
+    """Run filter controller for channels in renames.
+
+    When streaming, the filter is stateful and processes all channels at
+    once using run, otherwise run_as_update finds gaps for all channels
+    at once, reads input once for nearby gaps, and only writes each
+    channel where it has gaps.
+    """
+    starttime, endtime = get_realtime_interval(realtime_interval)
+    if streaming:
+        controller.run(
+            observatory=(observatory,),
+            starttime=starttime,
+            endtime=endtime,
+            input_channels=tuple(renames.keys()),
+            output_channels=tuple(renames.values()),
+            realtime=realtime_interval,
+            rename_output_channel=tuple(renames.items()),
+        )
+        return
+    controller.run_as_update(
+        observatory=(observatory,),
+        output_observatory=(observatory,),
+        starttime=starttime,
+        endtime=endtime,
+        input_channels=tuple(renames.keys()),
+        output_channels=tuple(renames.values()),
+        realtime=realtime_interval,
+        rename_output_channel=tuple(renames.items()),
+        update_limit=update_limit,
+        channel_gaps=True,
     )
 
 
@@ -87,8 +204,6 @@ def obsrio_day(
     update_limit: int = 7,
 ):
     """Filter 1 second edge H,E,Z,F to 1 day miniseed U,V,W,F."""
-    starttime, endtime = get_realtime_interval(realtime_interval)
-    # filter 10Hz U,V,W to H,E,Z
     controller = Controller(
         algorithm=FilterAlgorithm(
             input_sample_period=60.0, output_sample_period=86400.0
@@ -98,20 +213,14 @@ def obsrio_day(
         outputFactory=output_factory or get_miniseed_factory(data_type="variation"),
         outputInterval="day",
     )
-    renames = {"H": "U", "E": "V", "Z": "W", "F": "F"}
-    for input_channel in renames.keys():
-        output_channel = renames[input_channel]
-        controller.run_as_update(
-            observatory=(observatory,),
-            output_observatory=(observatory,),
-            starttime=starttime,
-            endtime=endtime,
-            input_channels=(input_channel,),
-            output_channels=(output_channel,),
-            realtime=realtime_interval,
-            rename_output_channel=((input_channel, output_channel),),
-            update_limit=update_limit,
-        )
+    run_filter(
+        controller=controller,
+        observatory=observatory,
+        renames=HOUR_RENAMES,
+        realtime_interval=realtime_interval,
+        update_limit=update_limit,
+        streaming=False,
+    )
 
 
 def obsrio_hour(
@@ -122,9 +231,24 @@ def obsrio_hour(
     update_limit: int = 10,
 ):
     """Filter 1 second edge H,E,Z,F to 1 hour miniseed U,V,W,F."""
-    starttime, endtime = get_realtime_interval(realtime_interval)
-    # filter 10Hz U,V,W to H,E,Z
-    controller = Controller(
+    run_filter(
+        controller=get_hour_controller(
+            input_factory=input_factory, output_factory=output_factory
+        ),
+        observatory=observatory,
+        renames=HOUR_RENAMES,
+        realtime_interval=realtime_interval,
+        update_limit=update_limit,
+        streaming=False,
+    )
+
+
+def get_hour_controller(
+    input_factory: Optional[TimeseriesFactory] = None,
+    output_factory: Optional[TimeseriesFactory] = None,
+) -> Controller:
+    """Get controller used by obsrio_hour()."""
+    return Controller(
         algorithm=FilterAlgorithm(
             input_sample_period=60.0, output_sample_period=3600.0
         ),
@@ -133,20 +257,6 @@ def obsrio_hour(
         outputFactory=output_factory or get_miniseed_factory(data_type="variation"),
         outputInterval="hour",
     )
-    renames = {"H": "U", "E": "V", "Z": "W", "F": "F"}
-    for input_channel in renames.keys():
-        output_channel = renames[input_channel]
-        controller.run_as_update(
-            observatory=(observatory,),
-            output_observatory=(observatory,),
-            starttime=starttime,
-            endtime=endtime,
-            input_channels=(input_channel,),
-            output_channels=(output_channel,),
-            realtime=realtime_interval,
-            rename_output_channel=((input_channel, output_channel),),
-            update_limit=update_limit,
-        )
 
 
 def obsrio_minute(
@@ -155,31 +265,43 @@ def obsrio_minute(
     output_factory: Optional[TimeseriesFactory] = None,
     realtime_interval: int = 600,
     update_limit: int = 10,
+    statefile: Optional[str] = None,
 ):
     """Filter 1Hz legacy H,E,Z,F to 1 minute legacy.
 
     Should be called after obsrio_second() and obsrio_tenhertz(),
     which populate 1Hz legacy H,E,Z,F.
+    When statefile is set, only data since the previous call is filtered.
     """
-    starttime, endtime = get_realtime_interval(realtime_interval)
-    controller = Controller(
-        algorithm=FilterAlgorithm(input_sample_period=1, output_sample_period=60),
+    run_filter(
+        controller=get_minute_controller(
+            input_factory=input_factory,
+            output_factory=output_factory,
+            statefile=statefile,
+        ),
+        observatory=observatory,
+        renames=MINUTE_RENAMES,
+        realtime_interval=realtime_interval,
+        update_limit=update_limit,
+        streaming=statefile is not None,
+    )
+
+
+def get_minute_controller(
+    input_factory: Optional[TimeseriesFactory] = None,
+    output_factory: Optional[TimeseriesFactory] = None,
+    statefile: Optional[str] = None,
+) -> Controller:
+    """Get controller used by obsrio_minute()."""
+    return Controller(
+        algorithm=FilterAlgorithm(
+            input_sample_period=1, output_sample_period=60, statefile=statefile
+        ),
         inputFactory=input_factory or get_edge_factory(data_type="variation"),
         inputInterval="second",
         outputFactory=output_factory or get_edge_factory(data_type="variation"),
         outputInterval="minute",
     )
-    for channel in ["H", "E", "Z", "F"]:
-        controller.run_as_update(
-            observatory=(observatory,),
-            output_observatory=(observatory,),
-            starttime=starttime,
-            endtime=endtime,
-            input_channels=(channel,),
-            output_channels=(channel,),
-            realtime=realtime_interval,
-            update_limit=update_limit,
-        )
 
 
 def obsrio_second(
@@ -190,24 +312,30 @@ def obsrio_second(
     update_limit: int = 10,
 ):
     """Copy 1Hz miniseed F to 1Hz legacy F."""
-    starttime, endtime = get_realtime_interval(realtime_interval)
-    controller = Controller(
+    run_filter(
+        controller=get_second_controller(
+            input_factory=input_factory, output_factory=output_factory
+        ),
+        observatory=observatory,
+        renames=SECOND_RENAMES,
+        realtime_interval=realtime_interval,
+        update_limit=update_limit,
+        streaming=False,
+    )
+
+
+def get_second_controller(
+    input_factory: Optional[TimeseriesFactory] = None,
+    output_factory: Optional[TimeseriesFactory] = None,
+) -> Controller:
+    """Get controller used by obsrio_second()."""
+    return Controller(
         algorithm=Algorithm(),
         inputFactory=input_factory or get_miniseed_factory(data_type="variation"),
         inputInterval="second",
         outputFactory=output_factory or get_edge_factory(data_type="variation"),
         outputInterval="second",
     )
-    controller.run_as_update(
-        observatory=(observatory,),
-        output_observatory=(observatory,),
-        starttime=starttime,
-        endtime=endtime,
-        input_channels=("F",),
-        output_channels=("F",),
-        realtime=realtime_interval,
-        update_limit=update_limit,
-    )
 
 
 def obsrio_temperatures(
@@ -216,30 +344,41 @@ def obsrio_temperatures(
     output_factory: Optional[TimeseriesFactory] = None,
     realtime_interval: int = 600,
     update_limit: int = 10,
+    statefile: Optional[str] = None,
 ):
-    """Filter temperatures 1Hz miniseed (LK1-4) to 1 minute legacy (UK1-4)."""
-    starttime, endtime = get_realtime_interval(realtime_interval)
-    controller = Controller(
-        algorithm=FilterAlgorithm(input_sample_period=1, output_sample_period=60),
+    """Filter temperatures 1Hz miniseed (LK1-4) to 1 minute legacy (UK1-4).
+
+    When statefile is set, only data since the previous call is filtered.
+    """
+    run_filter(
+        controller=get_temperatures_controller(
+            input_factory=input_factory,
+            output_factory=output_factory,
+            statefile=statefile,
+        ),
+        observatory=observatory,
+        renames=TEMPERATURES_RENAMES,
+        realtime_interval=realtime_interval,
+        update_limit=update_limit,
+        streaming=statefile is not None,
+    )
+
+
+def get_temperatures_controller(
+    input_factory: Optional[TimeseriesFactory] = None,
+    output_factory: Optional[TimeseriesFactory] = None,
+    statefile: Optional[str] = None,
+) -> Controller:
+    """Get controller used by obsrio_temperatures()."""
+    return Controller(
+        algorithm=FilterAlgorithm(
+            input_sample_period=1, output_sample_period=60, statefile=statefile
+        ),
         inputFactory=input_factory or get_miniseed_factory(data_type="variation"),
         inputInterval="second",
         outputFactory=output_factory or get_edge_factory(data_type="variation"),
         outputInterval="minute",
     )
-    renames = {"LK1": "UK1", "LK2": "UK2", "LK3": "UK3", "LK4": "UK4"}
-    for input_channel in renames.keys():
-        output_channel = renames[input_channel]
-        controller.run_as_update(
-            observatory=(observatory,),
-            output_observatory=(observatory,),
-            starttime=starttime,
-            endtime=endtime,
-            input_channels=(input_channel,),
-            output_channels=(output_channel,),
-            realtime=realtime_interval,
-            rename_output_channel=((input_channel, output_channel),),
-            update_limit=update_limit,
-        )
 
 
 def obsrio_tenhertz(
@@ -248,28 +387,39 @@ def obsrio_tenhertz(
     output_factory: Optional[TimeseriesFactory] = None,
     realtime_interval: int = 600,
     update_limit: int = 10,
+    statefile: Optional[str] = None,
 ):
-    """Filter 10Hz miniseed U,V,W to 1Hz legacy H,E,Z."""
-    starttime, endtime = get_realtime_interval(realtime_interval)
+    """Filter 10Hz miniseed U,V,W to 1Hz legacy H,E,Z.
+
+    When statefile is set, only data since the previous call is filtered.
+    """
+    run_filter(
+        controller=get_tenhertz_controller(
+            input_factory=input_factory,
+            output_factory=output_factory,
+            statefile=statefile,
+        ),
+        observatory=observatory,
+        renames=TENHERTZ_RENAMES,
+        realtime_interval=realtime_interval,
+        update_limit=update_limit,
+        streaming=statefile is not None,
+    )
+
+
+def get_tenhertz_controller(
+    input_factory: Optional[TimeseriesFactory] = None,
+    output_factory: Optional[TimeseriesFactory] = None,
+    statefile: Optional[str] = None,
+) -> Controller:
+    """Get controller used by obsrio_tenhertz()."""
     # filter 10Hz U,V,W to H,E,Z
-    controller = Controller(
-        algorithm=FilterAlgorithm(input_sample_period=0.1, output_sample_period=1),
+    return Controller(
+        algorithm=FilterAlgorithm(
+            input_sample_period=0.1, output_sample_period=1, statefile=statefile
+        ),
         inputFactory=input_factory or get_miniseed_factory(data_type="variation"),
         inputInterval="tenhertz",
         outputFactory=output_factory or get_edge_factory(data_type="variation"),
         outputInterval="second",
     )
-    renames = {"U": "H", "V": "E", "W": "Z"}
-    for input_channel in renames.keys():
-        output_channel = renames[input_channel]
-        controller.run_as_update(
-            observatory=(observatory,),
-            output_observatory=(observatory,),
-            starttime=starttime,
-            endtime=endtime,
-            input_channels=(input_channel,),
-            output_channels=(output_channel,),
-            realtime=realtime_interval,
-            rename_output_channel=((input_channel, output_channel),),
-            update_limit=update_limit,
-        )
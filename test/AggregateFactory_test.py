@@ -0,0 +1,88 @@
+"""Tests for AggregateFactory.py"""
+import numpy
+from numpy.testing import assert_almost_equal, assert_equal
+from obspy.core import Stream, Trace, UTCDateTime
+
+from geomagio.AggregateFactory import AggregateFactory
+from geomagio.edge import WaveformCache
+
+
+class MockMinuteFactory(object):
+    """Factory with one sample per minute, the number of minutes since epoch."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get_timeseries(self, starttime, endtime, observatory, channels, type, interval):
+        self.requests.append((starttime, endtime, interval))
+        stream = Stream()
+        for channel in channels:
+            data = numpy.arange(
+                starttime.timestamp / 60, endtime.timestamp / 60 + 1, dtype=float
+            )
+            stream += Trace(
+                data,
+                {
+                    "network": "NT",
+                    "station": observatory,
+                    "location": "R0",
+                    "channel": channel,
+                    "starttime": starttime,
+                    "delta": 60,
+                },
+            )
+        return stream
+
+
+def test_get_timeseries_hour():
+    """AggregateFactory_test.test_get_timeseries_hour()
+
+    Hour values average minute values, and are only computed once.
+    """
+    minutes = MockMinuteFactory()
+    factory = AggregateFactory(minutes, cache=WaveformCache(immutable_age=0))
+    t = UTCDateTime("2020-01-01T00:00:00Z")
+    args = dict(observatory="BOU", channels=["H", "Z"], type="variation")
+    hours = factory.get_timeseries(t, t + 86399, interval="hour", **args)
+    assert_equal(len(hours), 2)
+    trace = hours.select(channel="H")[0]
+    assert_equal(trace.stats.starttime, t + 1770)
+    assert_equal(trace.stats.delta, 3600)
+    assert_equal(trace.stats.npts, 24)
+    assert_equal(trace.stats.data_interval, "hour")
+    assert_almost_equal(trace.data, t.timestamp / 60 + 29.5 + numpy.arange(24) * 60)
+    assert_equal(minutes.requests, [(t, t + 86340, "minute")] * 2)
+    # stored aggregates are reused, only new hours are computed
+    hours = factory.get_timeseries(t + 3600, t + 2 * 86399, interval="hour", **args)
+    assert_equal(hours[0].stats.npts, 47)
+    assert_equal(minutes.requests[2:], [(t + 86400, t + 2 * 86400 - 60, "minute")] * 2)
+    # other intervals are read from factory
+    factory.get_timeseries(t, t + 60, interval="minute", **args)
+    assert_equal(minutes.requests[-1], (t, t + 60, "minute"))
+
+
+def test_get_timeseries_day(tmp_path):
+    """AggregateFactory_test.test_get_timeseries_day()
+
+    Day values are stored on disk, and padded to the requested interval.
+    """
+    minutes = MockMinuteFactory()
+    t = UTCDateTime("2020-01-01T00:00:00Z")
+    args = dict(observatory="BOU", channels=["H"], type="variation", interval="day")
+    factory = AggregateFactory(
+        minutes,
+        cache=WaveformCache(directory=str(tmp_path), immutable_age=0),
+        fetch_interval=86400,
+    )
+    days = factory.get_timeseries(t, t + 3 * 86400, **args)
+    assert_equal(len(minutes.requests), 3)
+    # another process reads stored aggregates
+    minutes = MockMinuteFactory()
+    factory = AggregateFactory(
+        minutes, cache=WaveformCache(directory=str(tmp_path), immutable_age=0)
+    )
+    stored = factory.get_timeseries(t - 86400, t + 3 * 86400, **args)
+    assert_equal(minutes.requests, [(t - 86400, t - 60, "minute")])
+    assert_equal(stored[0].stats.starttime, t - 86400 + 43170)
+    assert_equal(stored[0].stats.data_type, "variation")
+    assert_almost_equal(stored[0].data[1:], days[0].data)
@@ -1,12 +1,18 @@
 #! /usr/bin/env python
 from geomagio import Controller, TimeseriesFactory
-from geomagio.algorithm import Algorithm
+from geomagio.algorithm import Algorithm, FilterAlgorithm
 
 # needed to read outputs generated by Controller and test data
-from geomagio.iaga2002 import IAGA2002Factory
+from geomagio.iaga2002 import IAGA2002Factory, StreamIAGA2002Factory
 
 # needed to emulate geomag.py script
-from geomagio.Controller import _main, parse_args
+from geomagio.Controller import (
+    _main,
+    main,
+    parse_args,
+    parse_duration,
+    run_observatories,
+)
 
 # needed to copy SqDistAlgorithm statefile
 from shutil import copy
@@ -14,8 +20,12 @@ from shutil import copy
 # needed to determine a valid (and writable) temp folder
 from tempfile import gettempdir
 
+from argparse import ArgumentTypeError
+from threading import Barrier
+import numpy
 from numpy.testing import assert_allclose, assert_equal
-from obspy.core import UTCDateTime
+from obspy.core import Stream, Trace, UTCDateTime
+import pytest
 
 
 def test_controller():
@@ -211,3 +221,179 @@ def test_controller_update_sqdist():
     )
     expected = expected_factory.get_timeseries(starttime=starttime1, endtime=endtime6)
     assert_allclose(actual, expected)
+
+
+class MemoryFactory(TimeseriesFactory):
+    """Factory that reads from and writes to an in memory stream.
+
+    Like other factories, missing data is padded with NaN.
+    """
+
+    def __init__(self, timeseries=None):
+        super().__init__()
+        self.timeseries = timeseries or Stream()
+        self.puts = []
+
+    def get_timeseries(self, starttime, endtime, channels=None, **kwargs):
+        timeseries = Stream()
+        for channel in channels:
+            timeseries += self.timeseries.select(channel=channel).slice(
+                starttime, endtime
+            )
+        return timeseries.trim(starttime, endtime, pad=True, fill_value=numpy.nan)
+
+    def put_timeseries(self, timeseries, starttime=None, endtime=None, **kwargs):
+        self.puts.append((starttime, endtime))
+        self.timeseries += timeseries
+        self.timeseries.merge()
+
+
+def test_controller_run_chunk_size():
+    """Controller_test.test_controller_run_chunk_size()
+
+    Output processed in chunks matches output processed at once.
+    """
+    with open("etc/filter/BOU20200101vsec.sec") as f:
+        bou = StreamIAGA2002Factory(stream=f).get_timeseries(
+            starttime=None, endtime=None, observatory="BOU"
+        )
+    starttime = UTCDateTime("2020-01-01T00:01:00Z")
+    endtime = UTCDateTime("2020-01-01T00:14:00Z")
+    outputs = []
+    for chunk_size in [None, 300]:
+        output_factory = MemoryFactory()
+        controller = Controller(
+            inputFactory=MemoryFactory(bou),
+            outputFactory=output_factory,
+            algorithm=FilterAlgorithm(input_sample_period=1, output_sample_period=60),
+            inputInterval="second",
+            outputInterval="minute",
+        )
+        controller.run(
+            observatory=("BOU",),
+            starttime=starttime,
+            endtime=endtime,
+            input_channels=("H", "E"),
+            output_channels=("H", "E"),
+            chunk_size=chunk_size,
+        )
+        outputs.append(output_factory)
+    whole, chunked = outputs
+    assert_equal(
+        chunked.puts,
+        [
+            (starttime, UTCDateTime("2020-01-01T00:04:00Z")),
+            (UTCDateTime("2020-01-01T00:05:00Z"), UTCDateTime("2020-01-01T00:09:00Z")),
+            (UTCDateTime("2020-01-01T00:10:00Z"), endtime),
+        ],
+    )
+    for trace in whole.timeseries:
+        actual = chunked.timeseries.select(channel=trace.stats.channel)[0]
+        assert_equal(actual.stats.starttime, starttime)
+        assert_equal(actual.stats.endtime, endtime)
+        assert_allclose(actual.data, trace.data)
+
+
+def test_controller_run_as_update_batch():
+    """Controller_test.test_controller_run_as_update_batch()
+
+    Gaps in consecutive update intervals are filled oldest first,
+    using one output request.
+    """
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    header = {"station": "BOU", "channel": "H", "delta": 1, "starttime": starttime}
+    input_factory = MemoryFactory(Stream(Trace(numpy.arange(60.0), header)))
+    output_trace = Trace(numpy.arange(33.0, 36.0), dict(header))
+    output_trace.stats.starttime = starttime + 33
+    output_factory = MemoryFactory(Stream(output_trace))
+    gets = []
+    get_timeseries = output_factory.get_timeseries
+    output_factory.get_timeseries = lambda **kwargs: gets.append(
+        kwargs
+    ) or get_timeseries(**kwargs)
+    controller = Controller(
+        inputFactory=input_factory,
+        outputFactory=output_factory,
+        algorithm=Algorithm(inchannels=["H"], outchannels=["H"]),
+    )
+    # intervals [40, 50], [30, 39], [21, 29]
+    controller.run_as_update(
+        observatory=("BOU",),
+        output_observatory=("BOU",),
+        starttime=starttime + 40,
+        endtime=starttime + 50,
+        input_channels=("H",),
+        output_channels=("H",),
+        update_limit=3,
+        workers=2,
+    )
+    assert_equal(len(gets), 1)
+    assert_equal(
+        output_factory.puts,
+        [(starttime + 21, starttime + 32), (starttime + 36, starttime + 50)],
+    )
+    output = output_factory.timeseries.select(channel="H")[0]
+    assert_equal(output.stats.starttime, starttime + 21)
+    assert_equal(output.data, numpy.arange(21.0, 51.0))
+
+
+def test_parse_duration():
+    """Controller_test.test_parse_duration()"""
+    assert_equal(parse_duration("90"), 90)
+    assert_equal(parse_duration("30m"), 1800)
+    assert_equal(parse_duration("1d"), 86400)
+    assert_equal(parse_duration("1.5h"), 5400)
+    with pytest.raises(ArgumentTypeError):
+        parse_duration("1w")
+    with pytest.raises(ArgumentTypeError):
+        parse_duration("0")
+
+
+def test_run_observatories():
+    """Controller_test.test_run_observatories()
+
+    Observatories are processed concurrently, and exceptions are isolated.
+    """
+    barrier = Barrier(3, timeout=5)
+    processed = []
+
+    def process(observatory):
+        # fails unless all three observatories run at the same time
+        barrier.wait()
+        if observatory == "FRD":
+            raise ValueError("no data")
+        processed.append(observatory)
+
+    exceptions = run_observatories(["BOU", "FRD", "TUC"], process, workers=3)
+    assert_equal(sorted(processed), ["BOU", "TUC"])
+    assert_equal(list(exceptions.keys()), ["FRD"])
+    assert isinstance(exceptions["FRD"], ValueError)
+
+
+def test_main_observatory_workers():
+    """Controller_test.test_main_observatory_workers()
+
+    Invalid combinations with --observatory-workers raise exceptions.
+    """
+    argv = [
+        "--input",
+        "iaga2002",
+        "--input-file",
+        "etc/filter/BOU20200101vsec.sec",
+        "--observatory",
+        "BOU",
+        "FRD",
+        "--output",
+        "iaga2002",
+        "--output-file",
+        "out.sec",
+        "--observatory-workers",
+        "2",
+    ]
+    with pytest.raises(Exception, match="--observatory-foreach"):
+        main(parse_args(argv))
+    argv.append("--observatory-foreach")
+    with pytest.raises(Exception, match="--filter-statefile"):
+        main(parse_args(argv + ["--filter-statefile", "state.json"]))
+    with pytest.raises(Exception, match="--sqdist-statefile"):
+        main(parse_args(argv + ["--sqdist-statefile", "state.json"]))
@@ -1,6 +1,8 @@
 #! /usr/bin/env python
 from __future__ import absolute_import
 
+from datetime import datetime
+
 from numpy.testing import assert_equal
 from .StreamConverter_test import __create_trace
 import numpy
@@ -100,6 +102,57 @@ def test_create_empty_trace():
     assert_equal(short_trace.stats.endtime, short_trace.stats.starttime)
 
 
+def test_decimate_trace():
+    """TimeseriesUtility_test.test_decimate_trace()
+
+    Blocks are reduced to min and max in order, mean, or one sample.
+    """
+    t = UTCDateTime("2018-01-01")
+    trace = _create_trace(
+        [1, 5, 2, 3, numpy.nan, numpy.nan, 9, 0, 4, numpy.nan], "H", t, delta=1
+    )
+    # traces with at most max_points are not changed
+    assert_equal(TimeseriesUtility.decimate_trace(trace, 10) is trace, True)
+    minmax = TimeseriesUtility.decimate_trace(trace, 6, "minmax")
+    assert_array_equal(minmax.data, [1, 5, 9, 0, 4, 4])
+    assert_equal(minmax.stats.starttime, t)
+    assert_equal(minmax.stats.delta, 2)
+    # the last block is shorter, its time is the center of its samples
+    mean = TimeseriesUtility.decimate_trace(trace, 4, "mean")
+    assert_array_equal(mean.data, [8 / 3, 3, 13 / 3, numpy.nan])
+    assert_equal(mean.stats.starttime, t + 1)
+    assert_equal(mean.stats.endtime, trace.stats.endtime)
+    # first and last valid samples are kept
+    lttb = TimeseriesUtility.decimate_trace(trace, 4, "lttb")
+    assert_array_equal(lttb.data, [1, 5, 9, 4])
+    assert_equal(lttb.stats.starttime, t)
+    assert_equal(lttb.stats.endtime, t + 8)
+    # leading gaps are only missing in blocks without values
+    data = numpy.sin(numpy.arange(1000) / 50)
+    data[:20] = numpy.nan
+    gap_trace = _create_trace(data, "H", t, delta=1)
+    for method, missing in [("minmax", 0), ("mean", 1), ("lttb", 0)]:
+        decimated = TimeseriesUtility.decimate_trace(gap_trace, 50, method)
+        assert_equal(numpy.isnan(decimated.data).sum(), missing)
+        assert_equal(len(decimated.data) <= 50, True)
+        assert_equal(decimated.stats.endtime <= gap_trace.stats.endtime, True)
+
+
+def test_decimate_trace_lttb_endpoints():
+    """TimeseriesUtility_test.test_decimate_trace_lttb_endpoints()
+
+    The first and last samples are kept by lttb.
+    """
+    t = UTCDateTime("2018-01-01")
+    trace = _create_trace(numpy.arange(10.0), "H", t, delta=1)
+    lttb = TimeseriesUtility.decimate_trace(trace, 4, "lttb")
+    assert_equal(len(lttb.data), 4)
+    assert_equal(lttb.data[0], 0)
+    assert_equal(lttb.data[-1], 9)
+    assert_equal(lttb.stats.starttime, t)
+    assert_equal(lttb.stats.endtime, t + 9)
+
+
 def test_get_stream_gaps():
     """TimeseriesUtility_test.test_get_stream_gaps()
 
@@ -171,6 +224,52 @@ def test_get_trace_gaps():
     assert_equal(gap[1], UTCDateTime("2015-01-01T00:03:00Z"))
 
 
+def test_get_trace_gap_indices():
+    """TimeseriesUtility_test.test_get_trace_gap_indices()
+
+    confirm that gaps at the start and end of a trace are found
+    """
+    trace = __create_trace("H", [numpy.nan, 1, numpy.nan, numpy.nan, 0, 1, numpy.nan])
+    trace.stats.starttime = UTCDateTime("2015-01-01T00:00:00Z")
+    trace.stats.delta = 60
+    assert_array_equal(
+        TimeseriesUtility.get_trace_gap_indices(trace), [[0, 0], [2, 3], [6, 6]]
+    )
+    gaps = TimeseriesUtility.get_trace_gaps(trace)
+    assert_equal(len(gaps), 3)
+    assert_equal(
+        gaps[2],
+        [
+            UTCDateTime("2015-01-01T00:06:00Z"),
+            UTCDateTime("2015-01-01T00:06:00Z"),
+            UTCDateTime("2015-01-01T00:07:00Z"),
+        ],
+    )
+    # no gaps
+    trace = __create_trace("H", [1, 2, 3])
+    assert_equal(TimeseriesUtility.get_trace_gap_indices(trace).shape, (0, 2))
+    assert_equal(TimeseriesUtility.get_trace_gaps(trace), [])
+
+
+def test_get_trace_millisecond_times():
+    """TimeseriesUtility_test.test_get_trace_millisecond_times()
+
+    confirm times match datetime.utcfromtimestamp, truncated to milliseconds
+    """
+    for starttime, delta in [
+        (UTCDateTime("2020-01-01T00:00:00Z"), 1),
+        (UTCDateTime("2020-12-31T23:59:59.0005Z"), 0.1),
+        (UTCDateTime("1999-02-28T23:59:00.123456Z"), 0.001),
+    ]:
+        trace = _create_trace(numpy.zeros(2000), "H", starttime, delta)
+        times = TimeseriesUtility.get_trace_millisecond_times(trace)
+        expected = []
+        for i in range(trace.stats.npts):
+            time = datetime.utcfromtimestamp(float(starttime) + i * delta)
+            expected.append(time.replace(microsecond=time.microsecond // 1000 * 1000))
+        assert_equal(times.astype("datetime64[us]").tolist(), expected)
+
+
 def test_get_merged_gaps():
     """TimeseriesUtility_test.test_get_merged_gaps()
 
@@ -376,6 +475,31 @@ def test_merge_streams():
     assert_almost_equal(merged4.select(channel="H")[0].data, [1, 2, 2, 2, 1, 1])
 
 
+def test_merge_streams_aligned():
+    """TimeseriesUtility_test.test_merge_streams_aligned()
+
+    confirm aligned and misaligned traces merge the same as obspy
+    """
+    starttime = UTCDateTime("2018-01-01T00:00:00Z")
+    for offset in [0, 0.5]:
+        trace1 = _create_trace([1, 1, numpy.nan, 1, 1, 1], "H", starttime, 1)
+        trace2 = _create_trace([2, 2, 2], "H", starttime + 2 + offset, 1)
+        trace3 = _create_trace([3, numpy.nan], "E", starttime + 4 + offset, 1)
+        stream = Stream(traces=[trace3, trace1, trace2])
+        expected = TimeseriesUtility._merge_split_stream(stream.copy())
+        merged = TimeseriesUtility.merge_streams(stream)
+        assert_equal(len(merged), 2)
+        for trace in merged:
+            other = expected.select(channel=trace.stats.channel)[0]
+            assert_equal(trace.stats.starttime, other.stats.starttime)
+            assert_almost_equal(trace.data, other.data)
+    # aligned traces are sorted by id, segments ending later win overlaps
+    trace2 = _create_trace([2, 2, 2], "H", starttime + 2, 1)
+    merged = TimeseriesUtility.merge_streams(Stream(traces=[trace3, trace1, trace2]))
+    assert_equal([trace.stats.channel for trace in merged], ["E", "H"])
+    assert_almost_equal(merged[1].data, [1, 1, 2, 1, 1, 1])
+
+
 def test_pad_timeseries():
     """TimeseriesUtility_test.test_pad_timeseries()"""
     trace1 = _create_trace([1, 1, 1, 1, 1], "H", UTCDateTime("2018-01-01"))
@@ -1,7 +1,10 @@
 #! /usr/bin/env python
 import os.path
+import sys
 import shutil
+import time
 from numpy.testing import assert_equal
+import pytest
 from geomagio import Util
 from obspy.core import UTCDateTime
 
@@ -37,6 +40,39 @@ def test_get_file_for_url__creates_directories():
     assert_equal(f, "/tmp/_geomag_algorithms_test_/somefile")
 
 
+def test_map_concurrent():
+    """Util_test.test_map_concurrent()"""
+    # results are in item order, even when items finish out of order
+    def square(value):
+        time.sleep(0.01 * (5 - value))
+        return value * value
+
+    assert_equal(Util.map_concurrent(square, range(5), max_workers=5), [0, 1, 4, 9, 16])
+    assert_equal(Util.map_concurrent(square, range(5)), [0, 1, 4, 9, 16])
+
+    # first exception in item order is raised
+    def fail(value):
+        raise ValueError(value)
+
+    with pytest.raises(ValueError, match="0"):
+        Util.map_concurrent(fail, range(5), max_workers=5)
+
+
+def test_stdout_to_stderr():
+    """Util_test.test_stdout_to_stderr()"""
+    stdout = sys.stdout
+    # contexts from different threads may exit in any order
+    first = Util.stdout_to_stderr()
+    second = Util.stdout_to_stderr()
+    first.__enter__()
+    assert sys.stdout is sys.stderr
+    second.__enter__()
+    first.__exit__(None, None, None)
+    assert sys.stdout is sys.stderr
+    second.__exit__(None, None, None)
+    assert sys.stdout is stdout
+
+
 def test_get_interval__defaults():
     """Util_test.test_get_interval()"""
     starttime = UTCDateTime("2015-01-01T00:00:00Z")
@@ -2,7 +2,7 @@ import json
 
 from numpy.testing import assert_almost_equal, assert_equal
 import numpy as np
-from obspy import read, UTCDateTime
+from obspy import read, Stream, UTCDateTime
 import pytest
 
 from geomagio.algorithm.FilterAlgorithm import FilterAlgorithm, get_nearest_time
@@ -280,6 +280,48 @@ def test_starttime_shift():
     assert_equal(filtered[0].stats.endtime, UTCDateTime("2020-01-01T00:13:00Z"))
 
 
+def test_streaming(tmp_path):
+    """algorithm_test.FilterAlgorithm_test.test_streaming()
+    Tests filtering chunks with a statefile matches filtering all data.
+    """
+    statefile = str(tmp_path / "filter.npz")
+    llo = read("etc/filter/10HZ_filter_sec.mseed")
+    for trace in llo:
+        trace.data = trace.data.astype(float)
+    llo.trim(endtime=UTCDateTime("2020-01-06T00:20:00Z"))
+    expected = FilterAlgorithm(input_sample_period=0.1, output_sample_period=1).process(
+        llo
+    )
+    filtered = Stream()
+    # uneven chunks, not aligned with output
+    chunk_start = llo[0].stats.starttime
+    for chunk_length in [6.3, 107.2, 0.5, 451.9, 800]:
+        chunk_end = chunk_start + chunk_length
+        # reload state for each chunk
+        f = FilterAlgorithm(
+            input_sample_period=0.1, output_sample_period=1, statefile=statefile
+        )
+        if f.get_next_starttime() is not None:
+            # only new data is needed
+            start, _ = f.get_input_interval(
+                start=f.get_next_starttime(),
+                end=chunk_end,
+                observatory="LLO",
+                channels=("U", "V", "W"),
+            )
+            assert_equal(start, chunk_start)
+        filtered += f.process(llo.slice(chunk_start, chunk_end - 0.05))
+        chunk_start = chunk_end
+    filtered.merge()
+    for trace in expected:
+        actual = filtered.select(channel=trace.stats.channel)[0]
+        assert_equal(actual.stats.starttime, trace.stats.starttime)
+        assert_equal(actual.stats.npts, trace.stats.npts)
+        assert_almost_equal(actual.data, trace.data, 8)
+    # next output follows last output
+    assert_equal(f.get_next_starttime(), expected[0].stats.endtime + 1)
+
+
 def test_align_trace():
     """algorithm_test.FilterAlgorithm_test.test_align_trace()
     Tests algorithm for minute to hour with expected behavior, trailing samples, and missing samples
@@ -305,6 +347,43 @@ def test_align_trace():
     assert_equal(starttime, UTCDateTime("2020-08-31T02:29:30"))
 
 
+def test_firfilter():
+    """algorithm_test.FilterAlgorithm_test.test_firfilter()
+    Tests filter output is decimated, and renormalized when samples are missing.
+    """
+    window = np.array([1.0, 2.0, 4.0, 2.0, 1.0]) / 10
+    data = np.arange(23, dtype=float)
+    filtered = FilterAlgorithm.firfilter(data, window, 3)
+    assert_almost_equal(filtered, np.arange(2, 21, 3))
+    # missing samples within allowed_bad are renormalized
+    data[[5, 9]] = np.nan
+    filtered = FilterAlgorithm.firfilter(data, window, 3)
+    assert_almost_equal(filtered[0], 2)
+    assert_equal(np.isnan(filtered[1:3]), [True, True])
+    assert_almost_equal(filtered[3], (0.2 * 10 + 0.4 * 11 + 0.2 * 12 + 0.1 * 13) / 0.9)
+    assert_almost_equal(filtered[4:], np.arange(14, 21, 3))
+    filtered = FilterAlgorithm.firfilter(data, window, 3, allowed_bad=0.3)
+    assert_almost_equal(filtered[2], (0.1 * 6 + 0.2 * 7 + 0.4 * 8 + 0.1 * 10) / 0.8)
+    # not enough data for one output
+    assert_equal(len(FilterAlgorithm.firfilter(data[:4], window, 3)), 0)
+
+
+def test_average():
+    """algorithm_test.FilterAlgorithm_test.test_average()
+    Tests block average matches firfilter with a boxcar window.
+    """
+    data = np.arange(600, dtype=float)
+    # one block within allowed_bad, one block exceeding allowed_bad
+    data[65:71] = np.nan
+    data[130:137] = np.nan
+    averaged = FilterAlgorithm.average(data, 60)
+    assert_equal(len(averaged), 10)
+    assert_equal(np.isnan(averaged), [False, False, True] + [False] * 7)
+    assert_almost_equal(averaged[1], np.nanmean(data[60:120]))
+    filtered = FilterAlgorithm.firfilter(data, np.ones(60) / 60, 60)
+    assert_almost_equal(averaged, filtered)
+
+
 def test_get_nearest__oneday_average():
     """algorithm_test.FilterAlgorithm_test.test_get_nearest__oneday_average()
     Tests get_nearest_time for minute to day
@@ -1,11 +1,14 @@
-from geomagio.algorithm import SqDistAlgorithm as sq
+from geomagio.algorithm import AlgorithmException, SqDistAlgorithm as sq
 import numpy as np
+from obspy.core import Stream, Trace, UTCDateTime
+import pytest
 from numpy.testing import (
     assert_allclose,
     assert_almost_equal,
     assert_array_less,
     assert_equal,
 )
+from scipy.optimize import fmin_l_bfgs_b
 
 
 def test_sqdistalgorithm_additive1():
@@ -694,3 +697,119 @@ def test_sqdistalgorithm_additive2():
         8,
         "Additive output should have average of 20.006...",
     )
+
+
+def test_sqdistalgorithm_additive_engines():
+    """SqDistAlgorithm_test.test_sqdistalgorithm_additive_engines()
+
+    Verify the numba and python engines produce identical results,
+    including gaps, spikes, forecasts and hstep predictions.
+    """
+    pytest.importorskip("numba")
+    m = 50
+    t = np.arange(5000)
+    np.random.seed(123456789)
+    yobs = 20 + 10.0 * np.sin(t * (2 * np.pi) / m) + np.random.randn(t.size)
+    yobs[100:160] = np.nan
+    yobs[1000] = 1e4
+    kwargs = dict(
+        m=m,
+        alpha=1.0 / m / 3.0,
+        beta=0.1,
+        gamma=0.3,
+        phi=0.9,
+        fc=25,
+        hstep=3,
+        smooth=7,
+    )
+    python = sq.additive(yobs, engine="python", **kwargs)
+    numba = sq.additive(yobs, engine="numba", **kwargs)
+    for expected, actual in zip(python, numba):
+        assert_equal(actual, expected)
+
+
+def test_sqdistalgorithm_additive_unknown_engine():
+    """SqDistAlgorithm_test.test_sqdistalgorithm_additive_unknown_engine()
+
+    Verify an unknown engine raises an AlgorithmException.
+    """
+    with pytest.raises(AlgorithmException):
+        sq.additive(np.zeros(10), 1, 0.1, 0, 0, engine="fortran")
+
+
+def test_sqdistalgorithm_multichannel(tmp_path):
+    """SqDistAlgorithm_test.test_sqdistalgorithm_multichannel()
+
+    Verify multichannel processing matches processing each channel
+    separately, and that state for all channels is kept in one statefile.
+    """
+    m = 10
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    splittime = starttime + 49 * 60
+    stream = Stream()
+    for channel, offset in (("H", 20000), ("Z", 45000)):
+        data = offset + 10.0 * np.sin(np.arange(100) * (2 * np.pi) / m)
+        stream += Trace(
+            data,
+            {
+                "channel": channel,
+                "delta": 60,
+                "starttime": starttime,
+                "station": "BOU",
+            },
+        )
+    kwargs = dict(alpha=0.1, beta=0, gamma=0.3, m=m, smooth=3)
+    statefile = str(tmp_path / "sqdist_state.json")
+    multi = sq(multichannel=True, statefile=statefile, **kwargs)
+    out = multi.process(stream.slice(endtime=splittime))
+    for trace in stream:
+        single = sq(**kwargs)
+        expected = single.process(Stream([trace]).slice(endtime=splittime))
+        for expected_trace in expected:
+            actual = out.select(channel=expected_trace.stats.channel)[0]
+            assert_equal(actual.data, expected_trace.data)
+    # state for all channels is loaded from one statefile
+    loaded = sq(multichannel=True, statefile=statefile, **kwargs)
+    assert_equal(loaded.last_channel, ["H", "Z"])
+    assert_equal(np.array(loaded.s0).shape, (2, m))
+    assert_equal(loaded.next_starttime, splittime + 60)
+    # and processing continues from state
+    out = loaded.process(stream.slice(starttime=splittime + 60))
+    assert_equal(len(out), 8)
+    assert_equal(out.select(channel="Z_SQ")[0].stats.npts, 50)
+    # inconsistent channels raise an exception
+    with pytest.raises(AlgorithmException):
+        loaded.process(stream.select(channel="H").slice(starttime=splittime + 60))
+
+
+def test_sqdistalgorithm_estimate_parameters():
+    """SqDistAlgorithm_test.test_sqdistalgorithm_estimate_parameters()
+
+    Verify estimated parameters match those found by fmin_l_bfgs_b with an
+    approximated gradient, and that fit information is returned.
+    """
+    m = 10
+    t = np.arange(500)
+    np.random.seed(123456789)
+    yobs = (
+        20
+        + 10.0 * np.sin(t * (2 * np.pi) / m)
+        + np.cumsum(np.random.randn(t.size)) * 0.5
+        + np.random.randn(t.size)
+    )
+
+    def rmse(params):
+        yhat = sq.additive(yobs, m, *params)[0]
+        return np.sqrt(np.nanmean(np.square(np.subtract(yobs, yhat))))
+
+    expected = fmin_l_bfgs_b(
+        rmse, x0=[0.3, 0.1, 0.1], bounds=[(0, 1)] * 3, approx_grad=True
+    )
+    alpha, beta, gamma, error, info = sq.estimate_parameters(yobs, m, full_output=True)
+    assert_allclose([alpha, beta, gamma], expected[0], atol=1e-3)
+    assert_allclose(error, expected[1], rtol=1e-6)
+    assert_array_less(0, info["elapsed"])
+    # fixed parameters are not estimated
+    alpha, beta, gamma, error = sq.estimate_parameters(yobs, m, beta=0, workers=1)
+    assert_equal(beta, 0)
+    assert_array_less(error, rmse([0.3, 0, 0.1]))
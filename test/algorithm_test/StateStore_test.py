@@ -0,0 +1,103 @@
+import json
+import os
+
+from geomagio.algorithm import AdjustedAlgorithm, SqDistAlgorithm, StateStore
+import numpy as np
+from numpy.testing import assert_equal
+import pytest
+
+
+def test_json(tmp_path):
+    """algorithm_test.StateStore_test.test_json()
+
+    Files not ending in .npz are stored as JSON.
+    """
+    filename = str(tmp_path / "state.json")
+    store = StateStore(filename)
+    store.save({"s0": np.array([1.0, 2.0]), "l0": np.float64(3), "channel": "H"})
+    with open(filename) as f:
+        assert_equal(json.load(f), {"s0": [1.0, 2.0], "l0": 3.0, "channel": "H"})
+    assert_equal(store.load(), {"s0": [1.0, 2.0], "l0": 3.0, "channel": "H"})
+
+
+def test_npz(tmp_path):
+    """algorithm_test.StateStore_test.test_npz()
+
+    Files ending in .npz store arrays in binary format.
+    """
+    filename = str(tmp_path / "state.npz")
+    s0 = np.random.rand(1440)
+    StateStore(filename).save(
+        {"s0": s0, "l0": 3.5, "last_channel": ["H", "Z"], "last_delta": None}
+    )
+    data = StateStore(filename).load()
+    assert isinstance(data["s0"], np.ndarray)
+    assert_equal(data["s0"], s0)
+    assert_equal(data["l0"], 3.5)
+    assert_equal(data["last_channel"], ["H", "Z"])
+    assert_equal(data["last_delta"], None)
+
+
+def test_history(tmp_path):
+    """algorithm_test.StateStore_test.test_history()
+
+    Previous states are retained as snapshots, and used when the current
+    state cannot be read.
+    """
+    filename = str(tmp_path / "state.npz")
+    store = StateStore(filename, history=2)
+    for i in range(4):
+        store.save({"count": np.array([i])})
+    assert_equal(store.load()["count"], [3])
+    assert_equal(StateStore(filename + ".1").load()["count"], [2])
+    assert_equal(StateStore(filename + ".2").load()["count"], [1])
+    assert not os.path.exists(filename + ".3")
+    # no temporary files remain
+    assert_equal(
+        sorted(os.listdir(tmp_path)), ["state.npz", "state.npz.1", "state.npz.2"]
+    )
+    # corrupt state falls back to newest snapshot
+    with open(filename, "wb") as f:
+        f.write(b"corrupt")
+    assert_equal(store.load()["count"], [2])
+
+
+def test_missing(tmp_path):
+    """algorithm_test.StateStore_test.test_missing()
+
+    Loading a state file that does not exist raises FileNotFoundError.
+    """
+    with pytest.raises(FileNotFoundError):
+        StateStore(str(tmp_path / "state.npz")).load()
+
+
+def test_sqdist_state(tmp_path):
+    """algorithm_test.StateStore_test.test_sqdist_state()
+
+    SqDistAlgorithm state is equivalent in JSON and npz formats.
+    """
+    expected = SqDistAlgorithm(
+        statefile="etc/controller/sqdistBOU_h_state.json", m=1440
+    )
+    for extension in ["json", "npz"]:
+        expected.statefile = str(tmp_path / ("state." + extension))
+        expected.save_state()
+        actual = SqDistAlgorithm(statefile=expected.statefile, m=1440)
+        assert_equal(actual.s0, expected.s0)
+        assert_equal(actual.l0, expected.l0)
+        assert_equal(actual.sigma0, expected.sigma0)
+        assert_equal(actual.next_starttime, expected.next_starttime)
+        assert_equal(actual.last_channel, expected.last_channel)
+
+
+def test_adjusted_state(tmp_path):
+    """algorithm_test.StateStore_test.test_adjusted_state()
+
+    AdjustedAlgorithm state is equivalent in JSON and npz formats.
+    """
+    expected = AdjustedAlgorithm(statefile="etc/adjusted/adjbou_state_.json")
+    expected.statefile = str(tmp_path / "state.npz")
+    expected.save_state()
+    actual = AdjustedAlgorithm(statefile=expected.statefile)
+    assert_equal(actual.matrix, expected.matrix)
+    assert_equal(actual.pier_correction, expected.pier_correction)
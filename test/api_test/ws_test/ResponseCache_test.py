@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from numpy.testing import assert_equal
+from obspy import UTCDateTime
+
+from geomagio.api.ws.ResponseCache import ResponseCache, get_ttl
+
+
+def test_get_ttl():
+    now = UTCDateTime("2020-09-02T00:00:00Z")
+    assert_equal(get_ttl(now + 60, now), 30)
+    assert_equal(get_ttl(now - 1800, now), 30)
+    assert_equal(get_ttl(now - 7200, now), 300)
+    assert_equal(get_ttl(now - 7 * 86400, now), 3600)
+    assert_equal(get_ttl(now - 365 * 86400, now), 86400)
+
+
+def test_get__coalesced():
+    """Concurrent requests for the same key share one create call."""
+    cache = ResponseCache()
+    calls = []
+
+    async def create():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return b"body"
+
+    async def run():
+        bodies = await asyncio.gather(
+            *[asyncio.shield(cache.get("key", 60, create)) for _ in range(5)]
+        )
+        assert_equal(bodies, [b"body"] * 5)
+        assert_equal(await cache.get("key", 60, create), b"body")
+        assert_equal(await cache.get("other", 60, create), b"body")
+
+    asyncio.run(run())
+    assert_equal(len(calls), 2)
+    metrics = cache.get_metrics()
+    assert_equal(metrics["misses"], 2)
+    assert_equal(metrics["coalesced"], 4)
+    assert_equal(metrics["hits"], 1)
+    assert_equal(metrics["entries"], 2)
+    assert_equal(metrics["size"], 8)
+    assert_equal(metrics["pending"], 0)
+
+
+def test_get__expired():
+    """Expired entries, and failed creates, are not cached."""
+    cache = ResponseCache()
+    calls = []
+
+    async def create():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("upstream error")
+        return b"body"
+
+    async def run():
+        try:
+            await cache.get("key", 0.05, create)
+        except ValueError:
+            pass
+        assert_equal(await cache.get("key", 0.05, create), b"body")
+        time.sleep(0.1)
+        assert_equal(await cache.get("key", 0.05, create), b"body")
+
+    asyncio.run(run())
+    assert_equal(len(calls), 3)
+    assert_equal(cache.get_metrics()["hits"], 0)
+
+
+def test_get__max_size():
+    """Least recently used entries are removed."""
+    cache = ResponseCache(max_size=10)
+
+    async def create():
+        return b"1234"
+
+    async def run():
+        for key in ["a", "b", "a", "c"]:
+            await cache.get(key, 60, create)
+
+    asyncio.run(run())
+    metrics = cache.get_metrics()
+    assert_equal(metrics["entries"], 2)
+    assert_equal(metrics["evictions"], 1)
+    assert_equal(metrics["hits"], 1)
+    # "b" was least recently used
+    assert_equal(list(cache._entries), ["a", "c"])
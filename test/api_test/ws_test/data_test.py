@@ -1,8 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+
+import numpy
+import pytest
+from fastapi.testclient import TestClient
 from numpy.testing import assert_equal
-from obspy import UTCDateTime
+from obspy import Stream, Trace, UTCDateTime
+from starlette.requests import ClientDisconnect
+
+from geomagio.api.ws.app import app
+from geomagio.api.ws import data
+from geomagio.api.ws.data import get_data_factory, get_data_query, run_data_function
+from geomagio.api.ws.DataApiQuery import DecimateMethod, OutputFormat, SamplingPeriod
+from geomagio.api.ws.ResponseCache import ResponseCache
+from geomagio.binary import BinaryFactory, BinaryParser
+
 
-from geomagio.api.ws.data import get_data_query
-from geomagio.api.ws.DataApiQuery import OutputFormat, SamplingPeriod
+class MockFactory(object):
+    """Factory returning one value per sample, and nan for the last sample."""
+
+    def get_timeseries(self, starttime, endtime, observatory, channels, **kwargs):
+        stream = Stream()
+        for channel in channels:
+            npts = int((endtime - starttime) // 60) + 1
+            data = numpy.arange(npts, dtype=numpy.float64)
+            data[-1] = numpy.nan
+            stream += Trace(
+                data,
+                {
+                    "network": "NT",
+                    "station": observatory,
+                    "channel": channel,
+                    "location": "R0",
+                    "starttime": starttime,
+                    "delta": 60,
+                    "data_type": "variation",
+                },
+            )
+        return stream
 
 
 def test_get_data_query():
@@ -14,6 +52,8 @@ def test_get_data_query():
         data_type="R1",
         sampling_period=60,
         format="iaga2002",
+        max_points=None,
+        decimate="minmax",
     )
     assert_equal(query.id, "BOU")
     assert_equal(query.starttime, UTCDateTime("2020-09-01T00:00:01"))
@@ -22,3 +62,231 @@ def test_get_data_query():
     assert_equal(query.sampling_period, SamplingPeriod.MINUTE)
     assert_equal(query.format, OutputFormat.IAGA2002)
     assert_equal(query.data_type, "R1")
+    assert_equal(query.max_points, None)
+    assert_equal(query.decimate, DecimateMethod.MINMAX)
+
+
+def test_get_data__streaming():
+    """Formatted data is streamed, and matches a single document."""
+    app.dependency_overrides[get_data_factory] = lambda: MockFactory()
+    try:
+        client = TestClient(app)
+        url = "/data/?id=BOU&starttime=2020-09-01&elements=H,Z&type=variation"
+        response = client.get(url + "&format=json")
+        assert_equal(response.status_code, 200)
+        data = json.loads(response.content)
+        assert_equal(len(data["times"]), 1440)
+        assert_equal(data["times"][-1], "2020-09-01T23:59:00.000Z")
+        assert_equal(data["values"][1]["id"], "Z")
+        assert_equal(data["values"][1]["values"][-2:], [1438, None])
+        response = client.get(url + "&format=iaga2002")
+        assert_equal(response.status_code, 200)
+        lines = response.text.splitlines()
+        assert_equal(
+            lines[-1].split()[:4], ["2020-09-01", "23:59:00.000", "245", "99999.00"]
+        )
+        assert_equal(len([line for line in lines if not line.endswith("|")]), 1440)
+        response = client.get(url + "&format=binary")
+        assert_equal(response.status_code, 200)
+        assert_equal(response.headers["content-type"], "application/octet-stream")
+        stream = BinaryFactory().parse_string(response.content)
+        assert_equal([trace.stats.channel for trace in stream], ["H", "Z"])
+        assert_equal(stream[1].data[-2], 1438)
+        assert_equal(numpy.isnan(stream[1].data[-1]), True)
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_get_data__max_points():
+    """Elements are reduced to max_points, using decimate method."""
+    app.dependency_overrides[get_data_factory] = lambda: MockFactory()
+    try:
+        client = TestClient(app)
+        url = (
+            "/data/?id=BOU&starttime=2020-09-01&endtime=2020-09-30T23:59:59"
+            "&sampling_period=1&elements=H&type=variation&format=binary"
+        )
+        # too many samples without max_points
+        response = TestClient(app, raise_server_exceptions=False).get(url)
+        assert_equal(response.status_code, 500)
+        response = client.get(url + "&max_points=1000")
+        stream = BinaryFactory().parse_string(response.content)
+        # mock has 43200 minute values, in blocks of 87 minutes
+        assert_equal(stream[0].stats.npts, 994)
+        assert_equal(stream[0].stats.delta, 87 * 60 / 2)
+        assert_equal(stream[0].data[:4], [0, 86, 87, 173])
+        assert_equal(stream[0].data[-2:], [43152, 43198])
+        response = client.get(url + "&max_points=1000&decimate=mean")
+        stream = BinaryFactory().parse_string(response.content)
+        assert_equal(stream[0].stats.npts, 982)
+        assert_equal(stream[0].data[0], 21.5)
+    finally:
+        app.dependency_overrides = {}
+
+
+class MockBatchFactory(MockFactory):
+    """Factory that fails for FRD."""
+
+    def get_timeseries(self, observatory, **kwargs):
+        if observatory == "FRD":
+            raise Exception("FRD is not available")
+        return super().get_timeseries(observatory=observatory, **kwargs)
+
+
+def test_get_batch_data():
+    """Observatories are returned in order, with errors."""
+    app.dependency_overrides[get_data_factory] = lambda: MockBatchFactory()
+    try:
+        client = TestClient(app)
+        url = "/data/batch/?id=BOU,FRD,TUC&starttime=2020-09-01&elements=H,Z"
+        response = client.get(url + "&format=json")
+        assert_equal(response.status_code, 200)
+        data = json.loads(response.content)
+        assert_equal(data["type"], "TimeseriesCollection")
+        assert_equal(
+            [t["type"] for t in data["timeseries"]],
+            ["Timeseries", "Error", "Timeseries"],
+        )
+        assert_equal(
+            [
+                t["metadata"]["intermagnet"]["imo"]["iaga_code"]
+                for t in data["timeseries"]
+            ],
+            ["BOU", "FRD", "TUC"],
+        )
+        assert_equal(data["timeseries"][1]["metadata"]["error"], "FRD is not available")
+        assert_equal(data["timeseries"][2]["values"][1]["values"][-2:], [1438, None])
+        response = client.get(url + "&format=binary")
+        assert_equal(response.status_code, 200)
+        factory = BinaryFactory()
+        stream = factory.parse_string(response.content)
+        assert_equal(
+            [trace.id for trace in stream],
+            ["NT.BOU.R0.H", "NT.BOU.R0.Z", "NT.TUC.R0.H", "NT.TUC.R0.Z"],
+        )
+        assert_equal(factory.errors, {"FRD": "FRD is not available"})
+        parser = BinaryParser()
+        parser.parse(response.content, parser.parse(response.content))
+        assert_equal(parser.header["error"], "FRD is not available")
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_get_batch_data__workers(monkeypatch):
+    """Observatories for all batch requests share BATCH_EXECUTOR threads."""
+
+    class CountingFactory(MockFactory):
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.active = 0
+            self.max_active = 0
+
+        def get_timeseries(self, *args, **kwargs):
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.05)
+            with self.lock:
+                self.active -= 1
+            return super().get_timeseries(*args, **kwargs)
+
+    factory = CountingFactory()
+    monkeypatch.setattr(data, "BATCH_EXECUTOR", ThreadPoolExecutor(max_workers=2))
+    app.dependency_overrides[get_data_factory] = lambda: factory
+    try:
+        client = TestClient(app)
+        url = "/data/batch/?id=BOU,FRD,TUC,BRW&starttime=2020-09-01&format=json"
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(client.get, [url, url]))
+        assert_equal([response.status_code for response in responses], [200, 200])
+        assert_equal(factory.max_active, 2)
+    finally:
+        app.dependency_overrides = {}
+        data.BATCH_EXECUTOR.shutdown()
+
+
+class MockRequest(object):
+    """Request that receives a disconnect after delay seconds."""
+
+    def __init__(self, delay=None):
+        self.delay = delay
+
+    async def receive(self):
+        if self.delay is None:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay)
+        return {"type": "http.disconnect"}
+
+
+def test_run_data_function():
+    """Blocking functions run concurrently, until timeout or disconnect."""
+
+    async def run_all():
+        start = time.time()
+        results = await asyncio.gather(
+            *[
+                run_data_function(MockRequest(), time.sleep, 0.2, timeout=5)
+                for _ in range(4)
+            ]
+        )
+        assert_equal(results, [None] * 4)
+        assert time.time() - start < 0.6
+        with pytest.raises(asyncio.TimeoutError):
+            await run_data_function(MockRequest(), time.sleep, 0.5, timeout=0.1)
+        with pytest.raises(ClientDisconnect):
+            await run_data_function(MockRequest(0.1), time.sleep, 0.5, timeout=5)
+
+    asyncio.run(run_all())
+
+
+def test_get_data__timeout(monkeypatch):
+    """Data that is not available before DATA_TIMEOUT is a 504 error."""
+
+    class SlowFactory(MockFactory):
+        def get_timeseries(self, *args, **kwargs):
+            time.sleep(0.5)
+            return super().get_timeseries(*args, **kwargs)
+
+    monkeypatch.setattr(data, "DATA_TIMEOUT", 0.1)
+    app.dependency_overrides[get_data_factory] = lambda: SlowFactory()
+    try:
+        client = TestClient(app)
+        response = client.get("/data/?id=BOU&starttime=2020-09-01&format=json")
+        assert_equal(response.status_code, 504)
+        assert_equal(response.json()["metadata"]["title"], "Gateway Timeout")
+    finally:
+        app.dependency_overrides = {}
+
+
+def test_get_data__cached(monkeypatch):
+    """Identical requests use the response cache."""
+    factory = MockFactory()
+    calls = []
+    get_timeseries = factory.get_timeseries
+
+    def counted_get_timeseries(*args, **kwargs):
+        calls.append(1)
+        return get_timeseries(*args, **kwargs)
+
+    factory.get_timeseries = counted_get_timeseries
+    monkeypatch.setattr(data, "RESPONSE_CACHE", ResponseCache())
+    app.dependency_overrides[get_data_factory] = lambda: factory
+    try:
+        client = TestClient(app)
+        url = "/data/?id=BOU&starttime=2020-09-01&elements=H,Z&format=json"
+        first = client.get(url)
+        second = client.get(url)
+        assert_equal(second.content, first.content)
+        assert_equal(second.headers["content-type"], "application/json")
+        client.get(url + "&type=R0")
+        client.get(url.replace("/data/", "/algorithms/dbdt/"))
+        assert_equal(len(calls), 3)
+        metrics = client.get("/data/cache/").json()
+        assert_equal(metrics["hits"], 1)
+        assert_equal(metrics["misses"], 3)
+        # larger requests are not cached
+        monkeypatch.setattr(data, "RESPONSE_CACHE_MAX_SAMPLES", 100)
+        client.get(url)
+        assert_equal(len(calls), 4)
+    finally:
+        app.dependency_overrides = {}
@@ -0,0 +1,122 @@
+"""Tests for BinaryFactory class"""
+from io import BytesIO
+
+import numpy
+import pytest
+from numpy.testing import assert_almost_equal, assert_equal
+from obspy.core import Stream, Trace, UTCDateTime
+
+from geomagio.binary import BinaryFactory, BinaryWriter
+from geomagio.binary.BinaryParser import ALIGNMENT
+from geomagio.TimeseriesFactoryException import TimeseriesFactoryException
+
+
+def _create_stream():
+    stream = Stream()
+    for channel, data in [
+        ("H", numpy.array([1.0, 2.0, numpy.nan, 4.0])),
+        ("D", numpy.array([0.01, 0.02, 0.03, 0.04])),
+    ]:
+        stream += Trace(
+            data,
+            {
+                "network": "NT",
+                "station": "BOU",
+                "location": "R0",
+                "channel": channel,
+                "starttime": UTCDateTime("2020-01-01T00:00:00Z"),
+                "delta": 60.0,
+                "data_type": "variation",
+                "geodetic_latitude": 40.137,
+            },
+        )
+    return stream
+
+
+def test_write_parse():
+    """binary_test.BinaryFactory_test.test_write_parse()
+
+    Verify written data parses to the same stream.
+    """
+    stream = _create_stream()
+    out = BytesIO()
+    BinaryFactory().write_file(out, stream, ["H", "D"])
+    parsed = BinaryFactory().parse_string(out.getvalue())
+    assert_equal([t.stats.channel for t in parsed], ["H", "D"])
+    for trace in stream:
+        parsed_trace = parsed.select(channel=trace.stats.channel)[0]
+        assert_equal(parsed_trace.stats.starttime, trace.stats.starttime)
+        assert_equal(parsed_trace.stats.delta, trace.stats.delta)
+        assert_equal(parsed_trace.stats.endtime, trace.stats.endtime)
+        assert_equal(parsed_trace.stats.station, "BOU")
+        assert_equal(parsed_trace.stats.location, "R0")
+        assert_equal(parsed_trace.stats.data_type, "variation")
+        assert_equal(parsed_trace.stats.geodetic_latitude, 40.137)
+        assert_almost_equal(parsed_trace.data, trace.data)
+
+
+def test_write_chunks():
+    """binary_test.BinaryFactory_test.test_write_chunks()
+
+    Verify values are aligned, and not copied when already float64.
+    """
+    stream = _create_stream()
+    chunks = list(BinaryWriter().write_chunks(stream, ["H"], chunk_size=3))
+    assert_equal(len(chunks[0]) % ALIGNMENT, 0)
+    assert_equal([chunk.nbytes for chunk in chunks[1:]], [24, 8])
+    assert_equal(numpy.frombuffer(chunks[1], dtype="<f8")[0], 1.0)
+    assert_equal(chunks[1].obj is stream[0].data, True)
+    # D is converted to minutes
+    data = b"".join(BinaryWriter().write_chunks(stream, ["D"]))
+    assert_almost_equal(
+        numpy.frombuffer(data[-32:], dtype="<f8")[0], 0.01 * 180 / numpy.pi * 60
+    )
+
+
+def test_write_chunks_mismatch():
+    """binary_test.BinaryFactory_test.test_write_chunks_mismatch()
+
+    Verify missing and mismatched channels raise before output is generated.
+    """
+    stream = _create_stream()
+    with pytest.raises(TimeseriesFactoryException):
+        BinaryWriter().write_chunks(stream, ["Z"])
+    stream[1].stats.starttime += 60
+    with pytest.raises(TimeseriesFactoryException):
+        BinaryWriter().write_chunks(stream, ["H", "D"])
+
+
+def test_parse_truncated():
+    """binary_test.BinaryFactory_test.test_parse_truncated()
+
+    Verify truncated and non-binary data raise exceptions.
+    """
+    data = BinaryWriter.format(_create_stream(), ["H", "D"])
+    with pytest.raises(TimeseriesFactoryException):
+        BinaryFactory().parse_string(data[:-8])
+    with pytest.raises(TimeseriesFactoryException):
+        BinaryFactory().parse_string(b"IAGA2002")
+
+
+def test_parse_errors():
+    """binary_test.BinaryFactory_test.test_parse_errors()
+
+    Verify errors in concatenated documents are available by station.
+    """
+    writer = BinaryWriter()
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    data = (
+        writer.format_error("FRD", "FRD is not available", starttime, 60.0)
+        + BinaryWriter.format(_create_stream(), ["H", "D"])
+        + writer.format_error("TUC", "TUC is not available", starttime, 60.0)
+    )
+    factory = BinaryFactory()
+    stream = factory.parse_string(data)
+    assert_equal([t.stats.station for t in stream], ["BOU", "BOU"])
+    assert_equal(
+        factory.errors,
+        {"FRD": "FRD is not available", "TUC": "TUC is not available"},
+    )
+    # errors are for the last parsed data
+    factory.parse_string(BinaryWriter.format(_create_stream(), ["H", "D"]))
+    assert_equal(factory.errors, {})
@@ -1,5 +1,8 @@
 """Tests for MiniSeedFactory.py"""
 
+import time
+from threading import Barrier, Lock
+
 import numpy
 from numpy.testing import assert_equal
 from obspy.core import Stats, Stream, Trace, UTCDateTime
@@ -67,6 +70,84 @@ class MockMiniSeedInputClient(object):
         self.last_sent = stream
 
 
+class MockMiniSeedClient:
+    """Mock client that requires concurrent requests."""
+
+    def __init__(self, parties):
+        self.barrier = Barrier(parties, timeout=5)
+
+    def get_waveforms(self, network, station, location, channel, starttime, endtime):
+        # fails unless all requests are made at the same time
+        self.barrier.wait()
+        stats = Stats()
+        stats.network = network
+        stats.station = station
+        stats.location = location
+        stats.channel = channel
+        stats.starttime = starttime
+        stats.npts = 10
+        return Stream(Trace(numpy.arange(10, dtype=float), stats))
+
+
+def test_get_timeseries__concurrent():
+    """edge_test.MiniSeedFactory_test.test_get_timeseries__concurrent()"""
+    factory = MiniSeedFactory()
+    factory.client = MockMiniSeedClient(parties=4)
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    timeseries = factory.get_timeseries(
+        starttime,
+        starttime + 9,
+        "BOU",
+        ("H", "E", "Z", "F"),
+        "variation",
+        "second",
+    )
+    # traces are in channel order
+    assert_equal([t.stats.channel for t in timeseries], ["H", "E", "Z", "F"])
+    assert_equal(timeseries[0].data, numpy.arange(10))
+
+
+class CountingMiniSeedClient:
+    """Mock client that records the number of concurrent requests."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def get_waveforms(self, network, station, location, channel, starttime, endtime):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return MockMiniSeedClient(parties=1).get_waveforms(
+            network, station, location, channel, starttime, endtime
+        )
+
+
+def test_get_timeseries__concurrent_components():
+    """edge_test.MiniSeedFactory_test.test_get_timeseries__concurrent_components()"""
+    # U is calculated from U_Volt and U_Bin, all requests share one pool
+    factory = MiniSeedFactory(convert_channels=("U",), max_workers=3)
+    factory.client = MockMiniSeedClient(parties=3)
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    timeseries = factory.get_timeseries(
+        starttime, starttime + 9, "BRT", ("U", "F"), "variation", "tenhertz"
+    )
+    assert_equal([t.stats.channel for t in timeseries], ["U", "F"])
+    # mock data is 1Hz, and padded to the 10Hz request
+    assert_equal(timeseries[0].data[:10], numpy.arange(10) * 606)
+    # requests are limited to max_workers
+    factory = MiniSeedFactory(convert_channels=("U", "V", "W"), max_workers=2)
+    factory.client = CountingMiniSeedClient()
+    factory.get_timeseries(
+        starttime, starttime + 9, "BRT", ("U", "V", "W"), "variation", "tenhertz"
+    )
+    assert_equal(factory.client.max_active, 2)
+
+
 def test__put_timeseries():
     """edge_test.MiniSeedFactory_test.test__put_timeseries()"""
     trace1 = __create_trace([0, 1, 2, 3, numpy.nan, 5, 6, 7, 8, 9], channel="H")
@@ -0,0 +1,180 @@
+"""Tests for WaveformCache.py"""
+import numpy
+from numpy.testing import assert_equal
+from obspy.core import Stats, Stream, Trace, UTCDateTime
+
+from geomagio.edge import WaveformCache
+from geomagio.edge.WaveformCache import get_missing_intervals, merge_intervals
+
+
+class MockFetch:
+    """Mock client get_waveforms, with one sample per second.
+
+    Sample values are the timestamp.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, network, station, location, channel, starttime, endtime):
+        self.requests.append((starttime, endtime))
+        stats = Stats()
+        stats.network = network
+        stats.station = station
+        stats.location = location
+        stats.channel = channel
+        stats.starttime = starttime
+        stats.delta = 1
+        data = numpy.arange(starttime.timestamp, endtime.timestamp + 1, dtype=">i4")
+        stats.npts = len(data)
+        return Stream(Trace(data, stats))
+
+
+def test_get_missing_intervals():
+    """edge_test.WaveformCache_test.test_get_missing_intervals()"""
+    t = UTCDateTime("2020-01-01T00:00:00Z")
+    coverage = [(t + 10, t + 20), (t + 30, t + 40)]
+    assert_equal(get_missing_intervals(t, t + 50, []), [(t, t + 50)])
+    assert_equal(
+        get_missing_intervals(t, t + 50, coverage),
+        [(t, t + 10), (t + 20, t + 30), (t + 40, t + 50)],
+    )
+    assert_equal(get_missing_intervals(t + 12, t + 18, coverage), [])
+    assert_equal(get_missing_intervals(t + 15, t + 35, coverage), [(t + 20, t + 30)])
+    assert_equal(
+        merge_intervals([(t + 30, t + 40), (t, t + 10), (t + 10, t + 20)]),
+        [(t, t + 20), (t + 30, t + 40)],
+    )
+
+
+def test_get_waveforms():
+    """edge_test.WaveformCache_test.test_get_waveforms()
+
+    Only uncached data is requested.
+    """
+    cache = WaveformCache()
+    fetch = MockFetch()
+    t = UTCDateTime("2020-01-01T00:00:00Z")
+    args = ("NT", "BOU", "R0", "LFH")
+    data = cache.get_waveforms(fetch, *args, t + 10, t + 20)
+    assert_equal(fetch.requests, [(t + 10, t + 20)])
+    # fully cached
+    data = cache.get_waveforms(fetch, *args, t + 12, t + 18)
+    assert_equal(len(fetch.requests), 1)
+    assert_equal(data[0].data, numpy.arange((t + 12).timestamp, (t + 19).timestamp))
+    # partially cached, only remainder is requested
+    data = cache.get_waveforms(fetch, *args, t, t + 30)
+    assert_equal(fetch.requests[1:], [(t, t + 10), (t + 20, t + 30)])
+    assert_equal(len(data), 1)
+    assert_equal(data[0].stats.starttime, t)
+    assert_equal(data[0].data, numpy.arange(t.timestamp, (t + 31).timestamp))
+    # other channels are cached separately
+    cache.get_waveforms(fetch, "NT", "BOU", "R0", "LFE", t + 12, t + 18)
+    assert_equal(len(fetch.requests), 4)
+
+
+def test_get_waveforms__no_data():
+    """edge_test.WaveformCache_test.test_get_waveforms__no_data()
+
+    Requests without data are not cached, data may be added later.
+    """
+    cache = WaveformCache()
+    t = UTCDateTime("2020-01-01T00:00:00Z")
+    args = ("NT", "BOU", "R0", "LFH")
+    requests = []
+
+    def fetch_missing(network, station, location, channel, starttime, endtime):
+        requests.append((starttime, endtime))
+        if len(requests) == 1:
+            return Stream()
+        trace = MockFetch()(network, station, location, channel, starttime, endtime)[0]
+        trace.data = numpy.full(len(trace.data), numpy.nan)
+        return Stream(trace)
+
+    cache.get_waveforms(fetch_missing, *args, t, t + 10)
+    cache.get_waveforms(fetch_missing, *args, t, t + 10)
+    assert_equal(len(requests), 2)
+    fetch = MockFetch()
+    cache.get_waveforms(fetch, *args, t, t + 10)
+    cache.get_waveforms(fetch, *args, t, t + 10)
+    assert_equal(fetch.requests, [(t, t + 10)])
+
+
+def test_get_waveforms__recent():
+    """edge_test.WaveformCache_test.test_get_waveforms__recent()
+
+    Data newer than immutable_age is always requested.
+    """
+    cache = WaveformCache(immutable_age=3600)
+    fetch = MockFetch()
+    now = UTCDateTime(int(UTCDateTime().timestamp))
+    args = ("NT", "BOU", "R0", "LFH")
+    cache.get_waveforms(fetch, *args, now - 7200, now - 60)
+    cache.get_waveforms(fetch, *args, now - 7200, now - 60)
+    assert_equal(len(fetch.requests), 2)
+    # older data was cached
+    assert fetch.requests[1][0] > now - 3601
+
+
+def test_get_waveforms__max_size():
+    """edge_test.WaveformCache_test.test_get_waveforms__max_size()
+
+    Least recently used channels are removed.
+    """
+    # 11 samples of 4 bytes, room for two channels
+    cache = WaveformCache(max_size=100)
+    fetch = MockFetch()
+    t = UTCDateTime("2020-01-01T00:00:00Z")
+    for channel in ["LFH", "LFE", "LFH", "LFZ"]:
+        cache.get_waveforms(fetch, "NT", "BOU", "R0", channel, t, t + 10)
+    assert_equal(len(fetch.requests), 3)
+    # LFE was least recently used
+    cache.get_waveforms(fetch, "NT", "BOU", "R0", "LFH", t, t + 10)
+    assert_equal(len(fetch.requests), 3)
+    cache.get_waveforms(fetch, "NT", "BOU", "R0", "LFE", t, t + 10)
+    assert_equal(len(fetch.requests), 4)
+
+
+def test_get_waveforms__directory(tmp_path):
+    """edge_test.WaveformCache_test.test_get_waveforms__directory()
+
+    Data cached in a directory is used by other caches.
+    """
+    fetch = MockFetch()
+    t = UTCDateTime("2020-01-01T00:00:00Z")
+    args = ("NT", "BOU", "R0", "LFH")
+    WaveformCache(directory=str(tmp_path)).get_waveforms(fetch, *args, t, t + 10)
+    cache = WaveformCache(directory=str(tmp_path))
+    data = cache.get_waveforms(fetch, *args, t + 5, t + 20)
+    assert_equal(fetch.requests, [(t, t + 10), (t + 10, t + 20)])
+    assert_equal(data[0].data, numpy.arange((t + 5).timestamp, (t + 21).timestamp))
+
+
+def test_get_waveforms__directory_size(tmp_path):
+    """edge_test.WaveformCache_test.test_get_waveforms__directory_size()
+
+    Data is appended to files, and the directory is only scanned
+    when it may exceed max_size.
+    """
+    fetch = MockFetch()
+    t = UTCDateTime("2020-01-01T00:00:00Z")
+    args = ("NT", "BOU", "R0", "LFH")
+    cache = WaveformCache(directory=str(tmp_path), max_size=20000)
+    scans = []
+    trim_directory = cache._trim_directory
+    cache._trim_directory = lambda: scans.append(1) or trim_directory()
+    cache.get_waveforms(fetch, *args, t, t + 10)
+    cache.get_waveforms(fetch, *args, t + 20, t + 30)
+    cache.get_waveforms(fetch, *args, t, t + 30)
+    assert_equal(len(scans), 1)
+    # appended data is read by other caches
+    data = WaveformCache(directory=str(tmp_path)).get_waveforms(fetch, *args, t, t + 30)
+    assert_equal(len(fetch.requests), 3)
+    assert_equal(len(data), 1)
+    assert_equal(data[0].data, numpy.arange(t.timestamp, (t + 31).timestamp))
+    # each write appends one 4096 byte record, LFZ exceeds max_size
+    for channel in ["LFE", "LFZ", "LFF"]:
+        cache.get_waveforms(fetch, "NT", "BOU", "R0", channel, t, t + 10)
+    assert_equal(len(scans), 2)
+    assert sum(f.stat().st_size for f in tmp_path.glob("*.mseed")) <= 20000
+    assert not (tmp_path / "NT.BOU.R0.LFH.json").exists()
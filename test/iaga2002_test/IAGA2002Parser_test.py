@@ -1,5 +1,7 @@
 """Tests for the IAGA2002 Parser class."""
 
+from datetime import datetime
+
 from numpy.testing import assert_equal
 from geomagio.iaga2002 import IAGA2002Parser
 
@@ -110,3 +112,27 @@ def test_parse_decbas():
     parser = IAGA2002Parser()
     parser.parse(IAGA2002_EXAMPLE)
     assert_equal(parser.metadata["declination_base"], 5527)
+
+
+def test_parse_data_block():
+    """iaga2002_test.IAGA2002Parser_test.test_parse_data_block()
+
+    Call the parse method with evenly spaced, and irregular, data.
+    Verify data lines are parsed as one block only when evenly spaced,
+    and both produce the same values as parsing each line.
+    """
+    lines = IAGA2002_EXAMPLE.splitlines()
+    irregular = "\n".join(lines[:-2] + lines[-1:])
+    for data, is_block in [(IAGA2002_EXAMPLE, True), (irregular, False)]:
+        parser = IAGA2002Parser()
+        parser.parse(data)
+        line_parser = IAGA2002Parser()
+        line_parser._parse_data_block = lambda lines: False
+        line_parser.parse(data)
+        assert_equal(parser.times, line_parser.times)
+        assert_equal(parser.data, line_parser.data)
+        assert_equal(
+            IAGA2002Parser()._parse_data_block(data.splitlines()[25:]), is_block
+        )
+    assert_equal(parser.times[-1], datetime(2013, 9, 1, 0, 9))
+    assert_equal(parser.data["H"][-1], 21515.04)
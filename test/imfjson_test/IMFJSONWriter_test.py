@@ -1,7 +1,10 @@
 """Tests for the IMFJSON Writer class."""
 
-from numpy.testing import assert_equal
+import json
+
+from numpy.testing import assert_equal, assert_raises
 from geomagio.iaga2002 import IAGA2002Factory
+from geomagio.TimeseriesFactoryException import TimeseriesFactoryException
 from geomagio.imfjson import IMFJSONWriter
 import numpy as np
 
@@ -97,3 +100,23 @@ def test_values():
     #  tolist required to prevent ValueError in comparison
     assert_equal(vals_H.tolist(), test_val_H.tolist())
     assert_equal(vals_D.tolist(), test_val_D.tolist())
+
+
+def test_write_chunks():
+    """imfjson.IMFJSONWriter_test.test_write_chunks()
+
+    Call the write_chunks method with a small chunk size.
+    Verify, chunks combine to the same document as format,
+    and missing channels raise before any chunks are generated.
+    """
+    writer = IMFJSONWriter()
+    chunks = list(
+        writer.write_chunks(EXAMPLE_DATA.copy(), EXAMPLE_CHANNELS, chunk_size=100)
+    )
+    assert_equal(len(chunks) > 30, True)
+    document = json.loads(b"".join(chunks))
+    expected = json.loads(IMFJSONWriter.format(EXAMPLE_DATA.copy(), EXAMPLE_CHANNELS))
+    del document["metadata"]["generated"]
+    del expected["metadata"]["generated"]
+    assert_equal(document, expected)
+    assert_raises(TimeseriesFactoryException, writer.write_chunks, EXAMPLE_DATA, ["X"])
@@ -0,0 +1,172 @@
+"""Tests for daemon.py"""
+import json
+import threading
+import time
+
+import pytest
+from numpy.testing import assert_equal
+
+from geomagio.processing import daemon
+from geomagio.processing.daemon import Scheduler, Task
+
+
+class FakeClock(object):
+    """Replaces the daemon time module, time only changes when set."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock(1000.0)
+    monkeypatch.setattr(daemon, "time", clock)
+    return clock
+
+
+def test_task_schedule():
+    """processing_test.daemon_test.test_task_schedule()
+
+    Runs are aligned to cadence, and missed runs are counted.
+    """
+    task = Task("test", "BOU", lambda interval: None, cadence=60, realtime_interval=600)
+    task.schedule(125)
+    assert_equal(task.next_run, 180)
+    assert_equal(task.skipped, 0)
+    task.schedule(180)
+    assert_equal(task.next_run, 240)
+    assert_equal(task.skipped, 0)
+    # run at 240 started late, run at 300 was missed
+    task.schedule(305)
+    assert_equal(task.next_run, 360)
+    assert_equal(task.skipped, 1)
+    # run at 360 started late, runs at 420 through 600 were missed
+    task.schedule(600)
+    assert_equal(task.next_run, 660)
+    assert_equal(task.skipped, 5)
+
+
+def test_task_get_realtime_interval():
+    """processing_test.daemon_test.test_task_get_realtime_interval()
+
+    Tasks that are behind process more data, up to max_realtime_interval.
+    """
+    task = Task(
+        "test",
+        "BOU",
+        lambda interval: None,
+        cadence=60,
+        realtime_interval=600,
+        max_realtime_interval=3600,
+    )
+    assert_equal(task.get_realtime_interval(1000), 600)
+    task.last_success = 1000
+    assert_equal(task.get_realtime_interval(1060), 600)
+    assert_equal(task.get_realtime_interval(1300.5), 841)
+    assert_equal(task.get_realtime_interval(1000 + 86400), 3600)
+
+
+def test_task_run_failure(clock):
+    """processing_test.daemon_test.test_task_run_failure()
+
+    Exceptions are recorded, and the task is scheduled again.
+    """
+
+    def fail(interval):
+        raise Exception("no data")
+
+    task = Task("test", "BOU", fail, cadence=60, realtime_interval=600)
+    task.run(clock.now)
+    assert_equal(task.runs, 1)
+    assert_equal(task.failures, 1)
+    assert_equal(task.last_error, "no data")
+    assert_equal(task.last_run, 1000)
+    assert_equal(task.last_success, None)
+    assert_equal(task.next_run, 1020)
+    status = task.get_status()
+    assert_equal(status["failures"], 1)
+    assert_equal(status["last_error"], "no data")
+
+
+def test_scheduler_run_pending(clock, tmp_path):
+    """processing_test.daemon_test.test_scheduler_run_pending()
+
+    Tasks for an observatory run in order, and record when they started.
+    """
+    calls = []
+
+    def step(name, duration):
+        def run(interval):
+            calls.append((name, clock.now, interval))
+            clock.now += duration
+
+        return run
+
+    tasks = [
+        Task("first", "BOU", step("first", 10), cadence=60, realtime_interval=600),
+        Task("second", "BOU", step("second", 5), cadence=60, realtime_interval=600),
+        Task("hour", "BOU", step("hour", 1), cadence=600, realtime_interval=7200),
+    ]
+    status_file = tmp_path / "status.json"
+    scheduler = Scheduler(tasks, status_file=str(status_file))
+    next_run = scheduler.run_pending()
+    assert_equal(
+        calls, [("first", 1000, 600), ("second", 1010, 600), ("hour", 1015, 7200)]
+    )
+    assert_equal([task.last_run for task in tasks], [1000, 1010, 1015])
+    assert_equal(next_run, 1020)
+    # only due tasks run
+    clock.now = 1020
+    scheduler.run_pending()
+    assert_equal([call[0] for call in calls[3:]], ["first", "second"])
+    assert_equal(tasks[2].runs, 1)
+    # status is written after tasks run
+    status = json.loads(status_file.read_text())
+    assert_equal([task["runs"] for task in status["tasks"]], [2, 2, 1])
+    assert_equal(list(tmp_path.iterdir()), [status_file])
+
+
+def test_scheduler_independent_observatories(clock):
+    """processing_test.daemon_test.test_scheduler_independent_observatories()
+
+    A slow observatory does not delay other observatories.
+    """
+    release = threading.Event()
+    fast_runs = []
+
+    def slow(interval):
+        release.wait(5)
+
+    tasks = [
+        Task("slow", "BOU", slow, cadence=60, realtime_interval=600),
+        Task("fast", "FRD", fast_runs.append, cadence=60, realtime_interval=600),
+    ]
+    scheduler = Scheduler(tasks, workers=2)
+    try:
+        scheduler.run_pending()
+        _wait_for(lambda: "FRD" not in scheduler._running)
+        assert_equal(fast_runs, [600])
+        clock.now = 1020
+        # slow observatory is running, fast observatory is not delayed
+        scheduler.run_pending()
+        _wait_for(lambda: "FRD" not in scheduler._running)
+        assert_equal(fast_runs, [600, 600])
+        assert_equal(tasks[1].next_run, 1080)
+        assert "BOU" in scheduler._running
+        assert_equal(tasks[0].runs, 0)
+        assert_equal(tasks[1].skipped, 0)
+    finally:
+        release.set()
+        scheduler.stop()
+        scheduler.run()
+    assert_equal(tasks[0].runs, 1)
+
+
+def _wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
@@ -0,0 +1,350 @@
+"""Tests for processing/factory.py"""
+import numpy
+from numpy.testing import assert_allclose, assert_equal
+from obspy.core import Stream, Trace, UTCDateTime
+
+from geomagio import TimeseriesUtility
+from geomagio.processing import obsrio
+from geomagio.processing.factory import CascadeFactory, _get_data_intervals
+from geomagio.TimeseriesFactory import TimeseriesFactory
+
+
+class MemoryFactory(TimeseriesFactory):
+    """Factory that reads from and writes to in memory streams,
+    with one stream for each sample period.
+
+    Like other factories, missing data is padded with NaN,
+    and missing values are not written.
+    """
+
+    def __init__(self, timeseries=None):
+        TimeseriesFactory.__init__(self, interval="second")
+        self.streams = {}
+        self.gets = []
+        self.puts = []
+        for trace in timeseries or []:
+            self._add(trace)
+
+    def get_timeseries(
+        self,
+        starttime,
+        endtime,
+        observatory=None,
+        channels=None,
+        type=None,
+        interval=None,
+    ):
+        interval = interval or self.interval
+        self.gets.append((starttime, endtime, tuple(channels), interval))
+        stream = self.streams.get(
+            TimeseriesUtility.get_delta_from_interval(interval), Stream()
+        )
+        timeseries = Stream()
+        for channel in channels:
+            traces = stream.select(channel=channel).slice(starttime, endtime).copy()
+            if not traces:
+                traces += TimeseriesUtility.create_empty_trace(
+                    starttime,
+                    endtime,
+                    observatory,
+                    channel,
+                    type,
+                    interval,
+                    "NT",
+                    observatory,
+                    "",
+                )
+            timeseries += traces
+        TimeseriesUtility.pad_timeseries(timeseries, starttime, endtime)
+        return timeseries
+
+    def put_timeseries(
+        self,
+        timeseries,
+        starttime=None,
+        endtime=None,
+        channels=None,
+        type=None,
+        interval=None,
+    ):
+        for trace in timeseries:
+            if channels and trace.stats.channel not in channels:
+                continue
+            trace = trace.slice(starttime, endtime).copy()
+            self.puts.append((trace.stats.channel, trace.stats.delta))
+            trace.data = numpy.ma.masked_invalid(trace.data)
+            for data in trace.split():
+                self._add(data)
+
+    def _add(self, trace):
+        delta = trace.stats.delta
+        stream = self.streams.setdefault(delta, Stream())
+        existing = stream.select(channel=trace.stats.channel)
+        if not existing:
+            stream += trace.copy()
+            return
+        trace = trace.copy()
+        trace.stats.network = existing[0].stats.network
+        trace.stats.station = existing[0].stats.station
+        trace.stats.location = existing[0].stats.location
+        merged = TimeseriesUtility.merge_streams(existing, Stream(trace))[0]
+        # written values replace existing values
+        index = int(round((trace.stats.starttime - merged.stats.starttime) / delta))
+        values = merged.data[index : index + len(trace.data)]
+        values[:] = trace.data
+        for existing_trace in existing:
+            stream.remove(existing_trace)
+        stream += merged
+
+
+def create_trace(channel, starttime, data, delta=1.0):
+    return Trace(
+        numpy.array(data, dtype=numpy.float64),
+        {
+            "network": "NT",
+            "station": "BOU",
+            "channel": channel,
+            "starttime": starttime,
+            "delta": delta,
+        },
+    )
+
+
+def test_get_data_intervals():
+    """processing_test.factory_test.test_get_data_intervals()
+
+    Intervals exclude missing values.
+    """
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    trace = create_trace("H", starttime, [numpy.nan, 1, 2, numpy.nan, numpy.nan, 5])
+    assert_equal(
+        _get_data_intervals(trace),
+        [(starttime + 1, starttime + 2), (starttime + 5, starttime + 5)],
+    )
+    trace = create_trace("H", starttime, [numpy.nan, numpy.nan])
+    assert_equal(_get_data_intervals(trace), [])
+    trace = create_trace("H", starttime, [0, 1, 2])
+    assert_equal(_get_data_intervals(trace), [(starttime, starttime + 2)])
+
+
+def test_cascade_factory_partial_coverage():
+    """processing_test.factory_test.test_cascade_factory_partial_coverage()
+
+    Only data not in memory is read, using one request for all channels.
+    """
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    wrapped = MemoryFactory(
+        [
+            create_trace("H", starttime, numpy.arange(100.0)),
+            create_trace("E", starttime, -numpy.arange(100.0)),
+        ]
+    )
+    factory = CascadeFactory(wrapped)
+    written = create_trace("H", starttime + 50, 100 + numpy.arange(10.0))
+    factory.put_timeseries(
+        Stream(written), starttime=starttime + 50, endtime=starttime + 59
+    )
+    timeseries = factory.get_timeseries(
+        starttime=starttime + 40,
+        endtime=starttime + 69,
+        observatory="BOU",
+        channels=("H",),
+    )
+    assert_equal(wrapped.gets, [(starttime + 40, starttime + 69, ("H",), "second")])
+    assert_equal(
+        timeseries[0].data,
+        numpy.concatenate(
+            (numpy.arange(40.0, 50), 100 + numpy.arange(10.0), numpy.arange(60.0, 70))
+        ),
+    )
+    # all H data is in memory, only E is read
+    wrapped.gets = []
+    timeseries = factory.get_timeseries(
+        starttime=starttime + 45,
+        endtime=starttime + 65,
+        observatory="BOU",
+        channels=("H", "E"),
+    )
+    assert_equal(wrapped.gets, [(starttime + 45, starttime + 65, ("E",), "second")])
+    assert_equal(timeseries.select(channel="H")[0].data[5], 100)
+    assert_equal(timeseries.select(channel="E")[0].data[0], -45)
+    # nothing is read once data is in memory
+    wrapped.gets = []
+    factory.get_timeseries(
+        starttime=starttime + 45,
+        endtime=starttime + 65,
+        observatory="BOU",
+        channels=("H", "E"),
+    )
+    assert_equal(wrapped.gets, [])
+
+
+def test_cascade_factory_put_missing_values():
+    """processing_test.factory_test.test_cascade_factory_put_missing_values()
+
+    Missing values that are written are read from the wrapped factory.
+    """
+    starttime = UTCDateTime("2020-01-01T00:00:00Z")
+    wrapped = MemoryFactory([create_trace("H", starttime, numpy.arange(20.0))])
+    factory = CascadeFactory(wrapped)
+    written = create_trace("H", starttime, 100 + numpy.arange(20.0))
+    written.data[5:8] = numpy.nan
+    factory.put_timeseries(Stream(written), starttime=starttime, endtime=starttime + 19)
+    timeseries = factory.get_timeseries(
+        starttime=starttime,
+        endtime=starttime + 19,
+        observatory="BOU",
+        channels=("H",),
+    )
+    # one request spanning the missing values
+    assert_equal(len(wrapped.gets), 1)
+    assert_equal(wrapped.gets[0][:2], (starttime + 4, starttime + 8))
+    expected = 100 + numpy.arange(20.0)
+    expected[5:8] = numpy.arange(5.0, 8)
+    assert_equal(timeseries[0].data, expected)
+
+
+def test_obsrio_filter_cascade(monkeypatch):
+    """processing_test.factory_test.test_obsrio_filter_cascade()
+
+    Cascade and non-cascade runs write identical output.
+    """
+    endtime = UTCDateTime("2020-01-01T01:00:00Z")
+    monkeypatch.setattr(
+        obsrio,
+        "get_realtime_interval",
+        lambda interval_seconds: (endtime - interval_seconds, endtime),
+    )
+    starttime = endtime - 1800
+    times = numpy.arange(0, 1900, 0.1)
+    inputs = [
+        create_trace(
+            channel, starttime, 20000 + 10 * i + numpy.sin(times / 60 + i), 0.1
+        )
+        for i, channel in enumerate(("U", "V", "W"))
+    ] + [
+        create_trace("F", starttime, 50000 + numpy.cos(times[::10] / 60)),
+        create_trace("LK1", starttime, 20 + numpy.sin(times[::10] / 600)),
+    ]
+    outputs = []
+    for cascade in (False, True):
+        # output is read back from the same store, like edge
+        factory = MemoryFactory([trace.copy() for trace in inputs])
+        obsrio.obsrio_filter(
+            observatory="BOU",
+            input_factory=factory,
+            output_factory=factory,
+            realtime_interval=600,
+            update_limit=1,
+            cascade=cascade,
+        )
+        outputs.append(factory)
+    expected, actual = outputs
+    assert_equal(sorted(actual.puts), sorted(expected.puts))
+    for delta, stream in expected.streams.items():
+        assert_equal(len(actual.streams[delta]), len(stream))
+        for trace in stream:
+            actual_trace = actual.streams[delta].select(channel=trace.stats.channel)[0]
+            assert_equal(actual_trace.stats.starttime, trace.stats.starttime)
+            assert_allclose(actual_trace.data, trace.data)
+    # every step wrote output, second F is already in the shared store
+    assert_equal(
+        sorted(set(expected.puts)),
+        [
+            ("E", 1.0),
+            ("E", 60.0),
+            ("F", 60.0),
+            ("H", 1.0),
+            ("H", 60.0),
+            ("UK1", 60.0),
+            ("Z", 1.0),
+            ("Z", 60.0),
+        ],
+    )
+
+
+def test_run_filter_per_channel_gaps(monkeypatch):
+    """processing_test.factory_test.test_run_filter_per_channel_gaps()
+
+    Gaps in one output channel do not update other channels.
+    """
+    endtime = UTCDateTime("2020-01-01T01:00:00Z")
+    monkeypatch.setattr(
+        obsrio,
+        "get_realtime_interval",
+        lambda interval_seconds: (endtime - interval_seconds, endtime),
+    )
+    starttime = endtime - 1800
+    times = numpy.arange(0, 1900.0)
+    input_factory = MemoryFactory(
+        [
+            create_trace(channel, starttime, 20000 + i + numpy.sin(times / 60))
+            for i, channel in enumerate(("H", "E", "Z", "F"))
+        ]
+    )
+    output_factory = MemoryFactory(
+        [
+            create_trace(channel, starttime, numpy.arange(31.0), 60.0)
+            for channel in ("H", "Z", "F")
+        ]
+        + [create_trace("E", starttime, numpy.arange(25.0), 60.0)]
+    )
+    obsrio.obsrio_minute(
+        observatory="BOU",
+        input_factory=input_factory,
+        output_factory=output_factory,
+        realtime_interval=600,
+        update_limit=1,
+    )
+    assert_equal(output_factory.puts, [("E", 60.0)])
+    output = output_factory.streams[60.0].select(channel="E")[0]
+    assert_equal(output.stats.endtime, endtime)
+    assert_equal(numpy.isnan(output.data).any(), False)
+
+
+def test_obsrio_hour_day_one_pass(monkeypatch):
+    """processing_test.factory_test.test_obsrio_hour_day_one_pass()
+
+    Hour and day filters read input once for all channels,
+    and only write channels with gaps.
+    """
+    for filter, delta, renames in [
+        (obsrio.obsrio_hour, 3600.0, (("E", "V"), ("H", "U"))),
+        (obsrio.obsrio_day, 86400.0, (("Z", "W"), ("F", "F"))),
+    ]:
+        endtime = UTCDateTime("2020-01-10T00:00:00Z")
+        monkeypatch.setattr(
+            obsrio,
+            "get_realtime_interval",
+            lambda interval_seconds: (endtime - 2 * delta, endtime),
+        )
+        # input from one day before first output to one day after last
+        starttime = endtime - 3 * 86400
+        times = numpy.arange(0, 4 * 86400, 60.0)
+        input_factory = MemoryFactory(
+            [
+                create_trace(channel, starttime, 20000 + i + numpy.sin(times), 60.0)
+                for i, channel in enumerate(("H", "E", "Z", "F"))
+            ]
+        )
+        gap_channel, other_channel = renames[0][1], renames[1][1]
+        output_factory = MemoryFactory(
+            [
+                create_trace(channel, endtime - 2 * delta, [1.0, 2.0, 3.0], delta)
+                for channel in ("U", "V", "W", "F")
+                if channel != gap_channel
+            ]
+            + [create_trace(gap_channel, endtime - 2 * delta, [1.0, 2.0], delta)]
+        )
+        filter(
+            observatory="BOU",
+            input_factory=input_factory,
+            output_factory=output_factory,
+            update_limit=1,
+        )
+        assert_equal(len(input_factory.gets), 1)
+        assert_equal(input_factory.gets[0][2], ("H", "E", "Z", "F"))
+        assert_equal(output_factory.puts, [(gap_channel, delta)])
+        output = output_factory.streams[delta]
+        assert_equal(output.select(channel=gap_channel)[0].stats.endtime, endtime)
+        assert_equal(output.select(channel=other_channel)[0].data[-1], 3)